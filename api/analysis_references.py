@@ -0,0 +1,70 @@
+# backend/analysis_references.py
+# 설명 분석의 비교 대상(참고 자료): 채팅방의 AI 설명 + 설명으로 검색한 PDF 청크
+#
+# 실시간 채점, 평가 단계에서 이전 버전 분석 갱신, 배치 재채점이 같은 참고 자료로 점수를 내도록 여기서 구성합니다.
+# (참고 자료 없이 분석하면 일관성/커버리지가 휴리스틱 값으로 바뀌어 실시간 채점 결과와 비교할 수 없음)
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import models
+from feynman_prompts import LearningPhase
+from rag_system import get_rag_system
+
+# 실시간 채점과 같은 검색 청크 수
+REFERENCE_CHUNKS = 3
+
+def latest_ai_explanation(db, room_id: str, before: Optional[datetime] = None) -> Optional[str]:
+    """채팅방의 마지막 AI 설명 (before: 이 시각 이전에 나온 설명만)"""
+    query = db.query(models.Message.content).filter(
+        models.Message.room_id == room_id,
+        models.Message.role == "assistant",
+        models.Message.phase == LearningPhase.AI_EXPLANATION.value
+    )
+    if before is not None:
+        query = query.filter(models.Message.created_at <= before)
+    row = query.order_by(models.Message.created_at.desc()).first()
+    return row[0] if row and row[0] else None
+
+def ai_explanation_history(db, room_ids: Iterable[str]) -> Dict[str, List[Tuple[datetime, str]]]:
+    """채팅방별 AI 설명 (작성 시각 순, 여러 메시지의 참고 자료를 한 번의 쿼리로 구성할 때 사용)"""
+    room_ids = list(room_ids)
+    history: Dict[str, List[Tuple[datetime, str]]] = {}
+    if not room_ids:
+        return history
+    rows = db.query(models.Message.room_id, models.Message.created_at, models.Message.content).filter(
+        models.Message.room_id.in_(room_ids),
+        models.Message.role == "assistant",
+        models.Message.phase == LearningPhase.AI_EXPLANATION.value
+    ).order_by(models.Message.created_at).all()
+    for room_id, created_at, content in rows:
+        if content and created_at is not None:
+            history.setdefault(room_id, []).append((created_at, content))
+    return history
+
+def ai_explanation_before(history: List[Tuple[datetime, str]], before: Optional[datetime]) -> Optional[str]:
+    """ai_explanation_history의 한 채팅방 목록에서 before 이전의 마지막 AI 설명 (latest_ai_explanation과 같은 기준)"""
+    if not history:
+        return None
+    if before is None:
+        return history[-1][1]
+    index = bisect_right([created_at for created_at, _ in history], before)
+    return history[index - 1][1] if index else None
+
+def build_references(ai_explanation: Optional[str], contexts: List[Dict]) -> List[str]:
+    """AI 설명을 맨 앞에, 그 뒤에 검색된 청크 본문"""
+    references = [context['content'] for context in contexts]
+    if ai_explanation:
+        references.insert(0, ai_explanation)
+    return references
+
+def search_references(room_id: str, explanation: str, ai_explanation: Optional[str], query_embedding=None) -> List[str]:
+    """설명으로 PDF 청크를 검색해 참고 자료 구성 (동기 호출, 스레드/배치 작업에서 사용)
+
+    query_embedding: 미리 배치로 계산한 질의 임베딩 (없으면 검색할 때 계산)
+    """
+    rag = get_rag_system()
+    contexts = []
+    if rag.has_pdf(room_id):
+        contexts = rag.search(room_id, explanation, n_results=REFERENCE_CHUNKS, query_embedding=query_embedding)
+    return build_references(ai_explanation, contexts)
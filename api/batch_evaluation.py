@@ -0,0 +1,305 @@
+# backend/batch_evaluation.py
+# 저장된 설명 메시지 전체 재채점 (채점 규칙 변경 후)
+#
+# 사용법:
+#   python batch_evaluation.py [--room ROOM_ID] [--workers 8] [--chunk-size 500]
+#                              [--checkpoint rescore_checkpoint.json] [--restart]
+#
+# is_explanation 메시지를 id 순서로 chunk-size개씩 읽어(키셋 페이지네이션) 프로세스 풀에 나눠 채점하고,
+# 결과를 bulk update로 한 번에 기록합니다. 청크를 커밋할 때마다 마지막 id를 체크포인트 파일에 남기므로
+# 중단되어도 같은 명령으로 다시 실행하면 이어서 처리합니다.
+#
+# 실시간 채점과 같은 점수가 나오도록 참고 자료(당시의 AI 설명 + 설명으로 검색한 PDF 청크)를 청크 단위로 구성해 넘기고
+# (AI 설명은 청크당 쿼리 한 번, 검색 질의 임베딩은 청크당 배치 한 번, 검색은 스레드로 병렬),
+# 워커는 같은 임베딩 백엔드(EMBEDDING_BACKEND)를 로드해 채점합니다.
+# torch/onnx 백엔드는 워커마다 모델을 올리므로 --workers로 메모리에 맞게 조절하세요.
+#
+# 작업 상태는 상태 파일(RESCORE_STATUS_PATH)에 기록되고 잠금 파일로 한 번에 하나만 실행됩니다.
+# 서버(/api/admin/rescore)도 이 스크립트를 별도 프로세스로 실행하므로, 멀티 워커(cluster.py)에서 어느 워커로
+# 조회하든 같은 상태를 봅니다.
+#
+# 풀은 spawn으로 시작하고, spawn 워커는 실행한 메인 모듈(이 파일)을 다시 가져오므로
+# DB/RAG 모듈은 모듈 수준에서 가져오지 않고 부모 프로세스에서만 쓰는 함수 안에서 가져옵니다.
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from evaluation_system import ANALYSIS_VERSION
+from log_config import get_logger
+from rescore_worker import analyze_rows, init_worker
+
+rescore_log = get_logger("rescore")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CHECKPOINT = "rescore_checkpoint.json"
+# 서버 워커와 작업 프로세스가 같은 파일을 보도록 기본값은 이 디렉토리 기준
+DEFAULT_STATUS = os.getenv("RESCORE_STATUS_PATH", os.path.join(BASE_DIR, "rescore_status.json"))
+# 이미 다른 작업이 실행 중이라 시작하지 않음
+EXIT_ALREADY_RUNNING = 3
+# 참고 자료 검색 스레드 수 상한
+SEARCH_THREADS = 8
+
+def load_checkpoint(path: str, room_id: Optional[str]) -> Dict:
+    """같은 채점 버전/범위의 체크포인트만 이어서 사용"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+    if checkpoint.get("analysis_version") != ANALYSIS_VERSION or checkpoint.get("room_id") != room_id:
+        return {}
+    return checkpoint
+
+def save_checkpoint(path: str, checkpoint: Dict):
+    # 임시 파일에 쓴 뒤 교체 (쓰는 도중 중단되어도 이전 체크포인트 유지)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+def process_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def read_job_status(path: str = DEFAULT_STATUS) -> Dict:
+    """재채점 작업 상태 (실행하던 프로세스가 사라졌으면 interrupted)"""
+    try:
+        with open(path, encoding="utf-8") as status_file:
+            status = json.load(status_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"status": "idle"}
+    if status.get("status") == "running" and not process_alive(status.get("pid")):
+        status["status"] = "interrupted"
+    return status
+
+def write_job_status(status: Dict, path: str = DEFAULT_STATUS):
+    save_checkpoint(path, status)
+
+def claim_job(status: Dict, path: str = DEFAULT_STATUS) -> bool:
+    """실행 중인 작업이 없으면 상태 파일에 이 작업을 기록하고 True
+
+    잠금 파일(O_EXCL)로 여러 서버 워커가 동시에 요청해도 하나만 시작됩니다.
+    잠금을 잡은 프로세스가 죽었으면 잠금을 치우고 다시 시도합니다.
+    """
+    lock_path = f"{path}.lock"
+    for _ in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                with open(lock_path, encoding="utf-8") as lock_file:
+                    owner = int(lock_file.read().strip() or 0)
+            except (FileNotFoundError, ValueError):
+                owner = 0
+            if process_alive(owner):
+                return False
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            continue
+        with os.fdopen(fd, "w", encoding="utf-8") as lock_file:
+            lock_file.write(str(os.getpid()))
+        status.update({"status": "running", "pid": os.getpid()})
+        write_job_status(status, path)
+        return True
+    return False
+
+def release_job(status: Dict, path: str = DEFAULT_STATUS):
+    """최종 상태를 기록하고 잠금 해제"""
+    write_job_status(status, path)
+    try:
+        os.remove(f"{path}.lock")
+    except FileNotFoundError:
+        pass
+
+def iter_explanation_chunks(db, chunk_size: int, after_id: Optional[str] = None, room_id: Optional[str] = None):
+    """설명 메시지를 (id, room_id, content, created_at) 청크로 스트리밍 (OFFSET 없이 id 기준 키셋 페이지네이션)"""
+    import models
+
+    while True:
+        query = db.query(
+            models.Message.id, models.Message.room_id, models.Message.content, models.Message.created_at
+        ).filter(models.Message.is_explanation.is_(True))
+        if room_id:
+            query = query.filter(models.Message.room_id == room_id)
+        if after_id is not None:
+            query = query.filter(models.Message.id > after_id)
+        rows = [tuple(row) for row in query.order_by(models.Message.id).limit(chunk_size).all()]
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][0]
+
+def with_references(db, rows: List[Tuple], search_pool: ThreadPoolExecutor) -> List[Tuple[str, str, List[str]]]:
+    """청크의 채점 입력 (message_id, content, references)
+
+    메시지마다 쿼리/임베딩을 하지 않도록 방별 AI 설명은 한 번에 읽고, 질의 임베딩은 한 번의 배치로 계산한 뒤
+    검색(ChromaDB 조회 + BM25)만 스레드로 나눠 실행
+    """
+    from analysis_references import ai_explanation_before, ai_explanation_history, search_references
+    from rag_system import get_rag_system
+
+    rag = get_rag_system()
+    history = ai_explanation_history(db, {room_id for _, room_id, _, _ in rows})
+    searchable = [index for index, row in enumerate(rows) if rag.has_pdf(row[1])]
+    query_embeddings = dict(zip(
+        searchable,
+        rag.embedder.encode([rows[index][2] or "" for index in searchable], kind="query")
+    ))
+
+    def build(index: int) -> Tuple[str, str, List[str]]:
+        message_id, room_id, content, created_at = rows[index]
+        content = content or ""
+        ai_explanation = ai_explanation_before(history.get(room_id, []), created_at)
+        return message_id, content, search_references(room_id, content, ai_explanation, query_embeddings.get(index))
+
+    return list(search_pool.map(build, range(len(rows))))
+
+def split_rows(rows: List[Tuple], parts: int) -> List[List[Tuple]]:
+    """청크를 워커 수만큼 고르게 나눔"""
+    size = max(1, -(-len(rows) // parts))
+    return [rows[i:i + size] for i in range(0, len(rows), size)]
+
+def rescore_explanations(
+    room_id: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 500,
+    checkpoint_path: Optional[str] = DEFAULT_CHECKPOINT,
+    restart: bool = False,
+    progress: Optional[Callable[[Dict], None]] = None
+) -> Dict:
+    """설명 메시지 전체 재채점 후 통계 반환"""
+    workers = workers or os.cpu_count() or 1
+    checkpoint = {} if restart else load_checkpoint(checkpoint_path, room_id)
+    stats = {
+        "room_id": room_id,
+        "analysis_version": ANALYSIS_VERSION,
+        "last_id": checkpoint.get("last_id"),
+        "processed": checkpoint.get("processed", 0),
+        "resumed": bool(checkpoint),
+        "workers": workers,
+        "seconds": 0.0,
+    }
+    if stats["resumed"]:
+        rescore_log.info(f"↩️ 체크포인트에서 재개: {stats['processed']}개 처리됨 (마지막 id {stats['last_id']})", extra={"room_id": room_id})
+
+    import models
+    from database import SessionLocal
+
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        # fork 대신 spawn (부모의 DB 연결/RAG 스레드 상태를 복제하지 않음)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker
+        ) as pool, ThreadPoolExecutor(max_workers=min(workers, SEARCH_THREADS)) as search_pool:
+            # 다음 청크를 읽고 채점하는 동안 이전 청크 결과를 기록하도록 최대 2청크를 미리 제출
+            pending = deque()
+
+            def write_oldest():
+                last_id, futures = pending.popleft()
+                mappings = [mapping for future in futures for mapping in future.result()]
+                db.bulk_update_mappings(models.Message, mappings)
+                db.commit()
+                stats["last_id"] = last_id
+                stats["processed"] += len(mappings)
+                stats["seconds"] = round(time.perf_counter() - start, 3)
+                if checkpoint_path:
+                    save_checkpoint(checkpoint_path, {
+                        key: stats[key] for key in ("room_id", "analysis_version", "last_id", "processed")
+                    })
+                if progress:
+                    progress(dict(stats))
+
+            for rows in iter_explanation_chunks(db, chunk_size, stats["last_id"], room_id):
+                futures = [pool.submit(analyze_rows, part) for part in split_rows(with_references(db, rows, search_pool), workers)]
+                pending.append((rows[-1][0], futures))
+                if len(pending) >= 2:
+                    write_oldest()
+            while pending:
+                write_oldest()
+    finally:
+        db.close()
+
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    # 끝까지 처리했으면 체크포인트 삭제 (다음 실행은 처음부터)
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return stats
+
+def run_job(
+    job_id: Optional[str] = None,
+    status_path: str = DEFAULT_STATUS,
+    progress: Optional[Callable[[Dict], None]] = None,
+    **options
+) -> int:
+    """상태 파일에 작업을 등록하고 재채점 실행 (종료 코드 반환, 이미 실행 중이면 EXIT_ALREADY_RUNNING)"""
+    job = {
+        "job_id": job_id or str(uuid.uuid4()),
+        "started_at": datetime.utcnow().isoformat(),
+        "request": options,
+        "worker_id": os.getenv("WORKER_ID"),
+    }
+    if not claim_job(job, status_path):
+        rescore_log.warning("⚠️ 이미 실행 중인 재채점 작업이 있습니다", extra={"job_id": job["job_id"]})
+        return EXIT_ALREADY_RUNNING
+
+    def report(stats: Dict):
+        write_job_status({**job, "progress": stats}, status_path)
+        if progress:
+            progress(stats)
+
+    exit_code = 0
+    try:
+        job.update({"status": "completed", "result": rescore_explanations(progress=report, **options)})
+    except KeyboardInterrupt:
+        job.update({"status": "interrupted"})
+        exit_code = 130
+    except Exception as e:
+        job.update({"status": "failed", "error": str(e)})
+        rescore_log.error(f"❌ 재채점 실패: {e}", extra={"job_id": job["job_id"], "room_id": options.get("room_id")})
+        exit_code = 1
+    job["finished_at"] = datetime.utcnow().isoformat()
+    release_job(job, status_path)
+    return exit_code
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="설명 메시지 재채점")
+    parser.add_argument("--room", help="특정 채팅방만 재채점")
+    parser.add_argument("--workers", type=int, default=None, help="프로세스 수 (기본: CPU 코어 수)")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true", help="체크포인트를 무시하고 처음부터")
+    parser.add_argument("--job-id", help="상태 파일에 기록할 작업 id (서버에서 실행할 때 지정)")
+    parser.add_argument("--status", default=DEFAULT_STATUS, help="작업 상태 파일")
+    args = parser.parse_args()
+
+    sys.exit(run_job(
+        job_id=args.job_id,
+        status_path=args.status,
+        progress=lambda stats: rescore_log.info(
+            f"📊 {stats['processed']}개 재채점 ({stats['seconds']}s)", extra={"room_id": stats["room_id"]}
+        ),
+        room_id=args.room,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        checkpoint_path=args.checkpoint,
+        restart=args.restart
+    ))
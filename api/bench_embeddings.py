@@ -0,0 +1,119 @@
+# backend/bench_embeddings.py
+# 임베딩 백엔드 처리량 / 검색 재현율 비교 (기준: PyTorch 백엔드)
+#
+# 사용법:
+#   python bench_embeddings.py --pdf lecture.pdf --threads 4
+#   python bench_embeddings.py --corpus passages.txt --configs torch,onnx,onnx-int8
+#
+# 재현율(recall@k)은 같은 질의에 대해 기준 백엔드가 찾은 상위 k개 문서를
+# 비교 대상 백엔드가 얼마나 똑같이 찾는지로 계산합니다.
+import argparse
+import json
+import time
+from typing import Dict, List
+import numpy as np
+from embedding_backends import EMBEDDING_MODELS, create_embedding_backend
+
+# 설정 이름 → create_embedding_backend 인자
+CONFIGS = {
+    "torch": {"backend": "torch", "quantize": False},
+    "onnx": {"backend": "onnx", "quantize": False},
+    "onnx-int8": {"backend": "onnx", "quantize": True},
+}
+
+def load_passages(args) -> List[str]:
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as corpus:
+            return [line.strip() for line in corpus if line.strip()]
+
+    from rag_chunks import split_into_chunks
+    import PyPDF2
+    passages = []
+    with open(args.pdf, "rb") as file:
+        for page in PyPDF2.PdfReader(file).pages:
+            passages.extend(split_into_chunks(page.extract_text() or ""))
+    return passages
+
+def top_k(query_vectors: np.ndarray, passage_vectors: np.ndarray, k: int) -> np.ndarray:
+    """정규화된 벡터의 내적(코사인 유사도) 기준 상위 k개 인덱스"""
+    scores = query_vectors @ passage_vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def measure(name: str, model_key: str, threads: int, passages: List[str], queries: List[str], repeats: int) -> Dict:
+    config = CONFIGS[name]
+    start = time.perf_counter()
+    backend = create_embedding_backend(config["backend"], model_key, config["quantize"], threads)
+    load_seconds = time.perf_counter() - start
+
+    backend.encode(passages[:8])  # 워밍업
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        passage_vectors = backend.encode(passages, kind="passage")
+    ingest_seconds = (time.perf_counter() - start) / repeats
+
+    # 질의는 실제 서비스처럼 한 개씩 임베딩
+    query_latencies = []
+    query_vectors = []
+    for query in queries:
+        query_start = time.perf_counter()
+        query_vectors.append(backend.encode_query(query))
+        query_latencies.append((time.perf_counter() - query_start) * 1000)
+
+    return {
+        "config": name,
+        "model": model_key,
+        "threads": threads,
+        "load_s": round(load_seconds, 2),
+        "passages_per_s": round(len(passages) / ingest_seconds, 1),
+        "query_p50_ms": round(float(np.percentile(query_latencies, 50)), 2),
+        "query_p95_ms": round(float(np.percentile(query_latencies, 95)), 2),
+        "_passages": passage_vectors,
+        "_queries": np.stack(query_vectors),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="임베딩 백엔드 벤치마크")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--pdf", help="문단을 추출할 PDF 파일")
+    source.add_argument("--corpus", help="한 줄에 문단 하나씩 있는 텍스트 파일")
+    parser.add_argument("--model", default="minilm", choices=sorted(EMBEDDING_MODELS))
+    parser.add_argument("--configs", default="torch,onnx,onnx-int8")
+    parser.add_argument("--threads", type=int, default=0, help="intra-op 스레드 수 (0이면 기본값)")
+    parser.add_argument("--queries", type=int, default=100, help="질의로 사용할 문단 수")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    passages = load_passages(args)
+    # 문단 앞부분을 질의로 사용 (짧은 질문과 비슷하게)
+    queries = [passage[:80] for passage in passages[:args.queries]]
+    print(f"📄 문단 {len(passages)}개, 질의 {len(queries)}개")
+
+    results = []
+    baseline = None
+    for name in args.configs.split(","):
+        print(f"⏱️ {name} 측정 중...")
+        result = measure(name, args.model, args.threads or None, passages, queries, args.repeats)
+        if baseline is None:
+            baseline = result
+        expected = top_k(baseline["_queries"], baseline["_passages"], args.k)
+        actual = top_k(result["_queries"], result["_passages"], args.k)
+        overlap = [len(set(e) & set(a)) / args.k for e, a in zip(expected, actual)]
+        result[f"recall@{args.k}"] = round(float(np.mean(overlap)), 4)
+        result["mean_cosine_vs_baseline"] = round(float(np.mean(np.sum(result["_passages"] * baseline["_passages"], axis=1))), 4)
+        result["speedup"] = round(result["passages_per_s"] / baseline["passages_per_s"], 2)
+        results.append({key: value for key, value in result.items() if not key.startswith("_")})
+        print(f"  {results[-1]}")
+
+    print("\n" + "=" * 100)
+    header = ["config", "passages_per_s", "speedup", "query_p50_ms", "query_p95_ms", f"recall@{args.k}", "mean_cosine_vs_baseline"]
+    print(" | ".join(f"{name:>14}" for name in header))
+    for result in results:
+        print(" | ".join(f"{str(result[name]):>14}" for name in header))
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(results, output, indent=2)
+        print(f"💾 결과 저장: {args.json}")
@@ -0,0 +1,158 @@
+# backend/bench_rag_storage.py
+# 저장 방식(per_room / shared) 별 메모리, 디스크, 검색 지연 시간 비교
+#
+# 사용법:
+#   python bench_rag_storage.py --rooms 1000,10000,100000 --pages 5 --shards 8
+#
+# 임베딩 모델 비용을 빼기 위해 무작위 벡터(384차원)를 직접 넣고,
+# 각 측정은 별도 프로세스에서 실행해 메모리가 섞이지 않게 합니다.
+# 클라이언트 생성과 청크 id/메타데이터(page, room_id, doc_id, chunk_hash)는 서버 색인 경로와 같은 코드를 사용합니다.
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+EMBEDDING_DIM = 384
+
+def current_rss_mb() -> float:
+    """현재 프로세스 RSS (MB)"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def directory_size_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total / (1024 * 1024)
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def random_vector(rng: random.Random) -> list:
+    return [rng.uniform(-1, 1) for _ in range(EMBEDDING_DIM)]
+
+def bench_pages(room_id: str, pages: int) -> list:
+    """채팅방 하나의 가짜 PDF 페이지 (페이지마다 청크 하나가 되도록 짧게)"""
+    return [{"page": page, "text": f"{room_id} 문서 {page}쪽 내용입니다."} for page in range(1, pages + 1)]
+
+def run_case(mode: str, rooms: int, pages: int, shards: int, queries: int) -> dict:
+    """한 가지 설정을 새 ChromaDB 디렉토리에 적재하고 측정"""
+    from chroma_client import create_chroma_client
+    from rag_chunks import document_chunks, shard_name_for_room
+
+    rng = random.Random(42)
+    path = tempfile.mkdtemp(prefix=f"bench_{mode}_")
+    try:
+        # 서버와 같은 클라이언트 (CHROMA_HOST가 있어도 운영 Chroma 서버가 아닌 임시 디렉토리에 적재)
+        client = create_chroma_client(path, use_server=False)
+        rss_before = current_rss_mb()
+        room_ids = [f"bench-{i:06d}" for i in range(rooms)]
+
+        def room_batch(room_id: str) -> dict:
+            chunks = list(document_chunks(room_id, f"doc-{room_id}", bench_pages(room_id, pages)))
+            return {
+                "ids": [chunk[0] for chunk in chunks],
+                "documents": [chunk[1] for chunk in chunks],
+                "metadatas": [chunk[2] for chunk in chunks],
+                "embeddings": [random_vector(rng) for _ in chunks],
+            }
+
+        start = time.perf_counter()
+        if mode == "shared":
+            # 샤드별로 모아서 한 번에 적재
+            pending = {}
+            for room_id in room_ids:
+                batch = pending.setdefault(shard_name_for_room(room_id, shards), {"ids": [], "embeddings": [], "metadatas": [], "documents": []})
+                for key, values in room_batch(room_id).items():
+                    batch[key].extend(values)
+            for name, batch in pending.items():
+                collection = client.get_or_create_collection(name, embedding_function=None)
+                for offset in range(0, len(batch["ids"]), 5000):
+                    collection.add(**{key: value[offset:offset + 5000] for key, value in batch.items()})
+        else:
+            for room_id in room_ids:
+                collection = client.get_or_create_collection(f"room_{room_id}", embedding_function=None)
+                collection.add(**room_batch(room_id))
+        ingest_seconds = time.perf_counter() - start
+
+        latencies = []
+        for _ in range(queries):
+            room_id = rng.choice(room_ids)
+            query_start = time.perf_counter()
+            if mode == "shared":
+                collection = client.get_collection(shard_name_for_room(room_id, shards), embedding_function=None)
+                collection.query(query_embeddings=[random_vector(rng)], n_results=3, where={"room_id": room_id})
+            else:
+                collection = client.get_collection(f"room_{room_id}", embedding_function=None)
+                collection.query(query_embeddings=[random_vector(rng)], n_results=3)
+            latencies.append((time.perf_counter() - query_start) * 1000)
+
+        return {
+            "mode": mode,
+            "rooms": rooms,
+            "chunks": rooms * pages,
+            "ingest_s": round(ingest_seconds, 2),
+            "rss_delta_mb": round(current_rss_mb() - rss_before, 1),
+            "disk_mb": round(directory_size_mb(path), 1),
+            "query_p50_ms": round(percentile(latencies, 50), 2),
+            "query_p95_ms": round(percentile(latencies, 95), 2),
+            "query_p99_ms": round(percentile(latencies, 99), 2),
+        }
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+def _run_case_in_child(queue, *args):
+    queue.put(run_case(*args))
+
+def run_isolated(*args) -> dict:
+    """별도 프로세스에서 측정 (메모리 측정이 이전 실행에 영향받지 않도록)"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run_case_in_child, args=(queue, *args))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAG 저장 방식 벤치마크")
+    parser.add_argument("--rooms", default="1000,10000,100000", help="쉼표로 구분한 채팅방 수 목록")
+    parser.add_argument("--pages", type=int, default=5, help="채팅방당 청크 수")
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--modes", default="per_room,shared")
+    parser.add_argument("--json", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    results = []
+    for rooms in [int(value) for value in args.rooms.split(",")]:
+        for mode in args.modes.split(","):
+            print(f"⏱️ {mode} / {rooms}개 채팅방 측정 중...")
+            result = run_isolated(mode, rooms, args.pages, args.shards, args.queries)
+            results.append(result)
+            print(f"  {result}")
+
+    print("\n" + "=" * 100)
+    header = ["mode", "rooms", "chunks", "ingest_s", "rss_delta_mb", "disk_mb", "query_p50_ms", "query_p95_ms", "query_p99_ms"]
+    print(" | ".join(f"{name:>12}" for name in header))
+    for result in results:
+        print(" | ".join(f"{str(result[name]):>12}" for name in header))
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(results, output, indent=2)
+        print(f"💾 결과 저장: {args.json}")
@@ -0,0 +1,26 @@
+# backend/chroma_client.py
+# ChromaDB 클라이언트 생성 (서버, 마이그레이션/벤치마크 도구가 같은 방식으로 연결하도록 한 곳에서 만듦)
+import os
+
+import chromadb
+from chromadb.config import Settings
+
+# 내장 저장소 경로 (cluster.py가 chroma run으로 띄우는 Chroma 서버도 같은 경로 사용)
+DEFAULT_CHROMA_PATH = "./chroma_db"
+
+def create_chroma_client(path: str = DEFAULT_CHROMA_PATH, use_server: bool = True):
+    """벡터 저장소 클라이언트 (CHROMA_HOST가 있으면 여러 워커가 공유하는 Chroma 서버에 연결)
+
+    use_server=False면 CHROMA_HOST와 관계없이 path의 내장 저장소 사용 (벤치마크처럼 임시 디렉토리에 적재할 때)
+    """
+    host = os.getenv("CHROMA_HOST") if use_server else None
+    if host:
+        return chromadb.HttpClient(
+            host=host,
+            port=int(os.getenv("CHROMA_PORT", "8001")),
+            settings=Settings(anonymized_telemetry=False)
+        )
+    return chromadb.Client(Settings(
+        persist_directory=path,
+        anonymized_telemetry=False
+    ))
@@ -0,0 +1,144 @@
+# backend/cluster.py
+# 멀티 워커 실행기: 임베딩 사이드카 1개 + Chroma 서버 1개 + 서버 워커 N개
+#
+# 사용법:
+#   python cluster.py --workers 4 [--base-port 8100] [--chroma-port 8001]
+#
+# - 임베딩 모델은 사이드카 프로세스에만 로드되고 워커들은 Unix 소켓으로 공유합니다 (EMBEDDING_BACKEND=remote).
+# - 벡터 저장소는 모든 워커가 같은 Chroma 서버를 사용합니다 (CHROMA_HOST가 없으면 chroma run으로 직접 실행).
+# - 워커는 각자 다른 포트로 뜨고, 앞단 nginx(deploy/nginx.conf)가 room_id 해시로 라우팅해
+#   같은 채팅방의 WebSocket/업로드/조회 요청과 방별 캐시가 항상 같은 워커에 머뭅니다.
+#   (uvicorn --workers는 한 포트를 커널이 임의로 나눠 받으므로 방 단위 고정이 안 됨)
+#   이 스크립트가 deploy/feynman_upstream.conf에 워커 목록을 기록합니다.
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import List
+
+from embedding_backends import DEFAULT_EMBEDDING_SOCKET
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+UPSTREAM_CONF = os.path.join(BASE_DIR, "deploy", "feynman_upstream.conf")
+# deploy/nginx.conf에 upstream 목록의 절대 경로를 채워 넣은 설정 (nginx http 블록에서 이 파일을 include)
+NGINX_TEMPLATE = os.path.join(BASE_DIR, "deploy", "nginx.conf")
+NGINX_CONF = os.path.join(BASE_DIR, "deploy", "feynman_nginx.conf")
+
+def wait_for(check, timeout: float, what: str):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if check():
+            return
+        time.sleep(0.5)
+    raise RuntimeError(f"{what} 시작 대기 시간 초과")
+
+def unix_socket_ready(path: str) -> bool:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+        return True
+    except OSError:
+        return False
+
+def tcp_port_ready(host: str, port: int) -> bool:
+    try:
+        with socket.create_connection((host, port), timeout=1):
+            return True
+    except OSError:
+        return False
+
+def write_upstream_conf(ports: List[int]):
+    """nginx upstream에 include할 워커 목록"""
+    os.makedirs(os.path.dirname(UPSTREAM_CONF), exist_ok=True)
+    with open(UPSTREAM_CONF, "w", encoding="utf-8") as conf:
+        conf.write("# cluster.py가 생성 (직접 수정하지 마세요)\n")
+        for port in ports:
+            conf.write(f"server 127.0.0.1:{port} max_fails=0;\n")
+
+def write_nginx_conf():
+    """nginx.conf 템플릿의 upstream include 경로를 이 위치 기준 절대 경로로 바꿔 기록"""
+    with open(NGINX_TEMPLATE, encoding="utf-8") as template:
+        conf = template.read().replace("__FEYNMAN_UPSTREAM_CONF__", UPSTREAM_CONF)
+    with open(NGINX_CONF, "w", encoding="utf-8") as output:
+        output.write(conf)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="파인만 학습 서버 멀티 워커 실행")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--base-port", type=int, default=8100)
+    parser.add_argument("--chroma-port", type=int, default=int(os.getenv("CHROMA_PORT", "8001")))
+    parser.add_argument("--socket", default=os.getenv("EMBEDDING_SOCKET", DEFAULT_EMBEDDING_SOCKET))
+    args = parser.parse_args()
+
+    processes: List[subprocess.Popen] = []
+
+    def shutdown(*_):
+        for process in reversed(processes):
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    try:
+        # 1) 임베딩 사이드카 (모델 로드에 시간이 걸릴 수 있음)
+        print(f"🧠 임베딩 사이드카 시작: {args.socket}")
+        processes.append(subprocess.Popen([sys.executable, "embedding_sidecar.py", "--socket", args.socket], cwd=BASE_DIR))
+        wait_for(lambda: unix_socket_ready(args.socket), 600, "임베딩 사이드카")
+
+        # 2) 공유 벡터 저장소
+        chroma_host = os.getenv("CHROMA_HOST")
+        chroma_port = args.chroma_port
+        if not chroma_host:
+            chroma_host = "localhost"
+            print(f"🗄️ Chroma 서버 시작: {chroma_host}:{chroma_port}")
+            processes.append(subprocess.Popen(
+                ["chroma", "run", "--path", os.path.join(BASE_DIR, "chroma_db"), "--port", str(chroma_port)],
+                cwd=BASE_DIR
+            ))
+            wait_for(lambda: tcp_port_ready(chroma_host, chroma_port), 120, "Chroma 서버")
+
+        # 3) 서버 워커 (모두 사이드카와 Chroma 서버를 공유)
+        ports = [args.base_port + index for index in range(args.workers)]
+        peers = ",".join(f"http://127.0.0.1:{port}" for port in ports)
+        for index, port in enumerate(ports):
+            env = {
+                **os.environ,
+                "EMBEDDING_BACKEND": "remote",
+                "EMBEDDING_SOCKET": args.socket,
+                "CHROMA_HOST": chroma_host,
+                "CHROMA_PORT": str(chroma_port),
+                "WORKER_ID": str(index),
+                # 여러 채팅방 삭제처럼 room_id로 라우팅되지 않는 요청이 모든 워커의 방 캐시를 정리할 때 사용
+                "CLUSTER_PEERS": peers,
+                # 생성 슬롯(OLLAMA_CONCURRENCY)은 워커 수로 나눠 배정 (rate_limit.worker_concurrency)
+                "CLUSTER_WORKERS": str(args.workers),
+                # 워커는 127.0.0.1에만 열리고 nginx를 거쳐서만 접근되므로 X-Real-IP를 신뢰
+                "RATE_LIMIT_TRUST_PROXY": "1",
+            }
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+                 "--ws-per-message-deflate", os.getenv("WS_PER_MESSAGE_DEFLATE", "true")],
+                cwd=BASE_DIR,
+                env=env
+            ))
+        write_upstream_conf(ports)
+        write_nginx_conf()
+        print(f"🚀 워커 {args.workers}개 실행 (포트 {ports[0]}-{ports[-1]}), upstream 목록: {UPSTREAM_CONF}")
+        print(f"🧭 nginx 설정: {NGINX_CONF} (http 블록에서 include)")
+
+        # 하나라도 종료되면 전체 종료
+        while all(process.poll() is None for process in processes):
+            time.sleep(1)
+        print("❌ 프로세스 하나가 종료되어 클러스터를 중지합니다")
+    finally:
+        shutdown()
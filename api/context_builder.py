@@ -0,0 +1,123 @@
+# backend/context_builder.py
+# 검색된 청크에서 질문과 관련된 문장만 골라 예산 안에서 프롬프트용 참고 자료 구성
+import asyncio
+import os
+import re
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from embedding_backends import EmbeddingBackend
+from rag_cache import MemoryBoundedLRU
+from rag_system import rag_system
+
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?。])\s+|\n+")
+HANGUL_RE = re.compile(r"[가-힣]")
+
+def split_sentences(text: str, min_chars: int = 10) -> List[str]:
+    """청크를 문장 단위로 분리 (너무 짧은 조각은 제외)"""
+    sentences = []
+    for sentence in SENTENCE_SPLIT_RE.split(text):
+        sentence = " ".join(sentence.split())
+        if len(sentence) >= min_chars:
+            sentences.append(sentence)
+    return sentences
+
+def estimate_tokens(text: str) -> int:
+    """LLM 토큰 수 근사치 (한글은 글자당 약 1토큰, 그 외는 4글자당 1토큰)"""
+    hangul = len(HANGUL_RE.findall(text))
+    return hangul + max(0, len(text) - hangul) // 4 + 1
+
+class ContextBuilder:
+    """질문 관련 문장 선택 + 중복 제거 + 예산 채우기"""
+
+    def __init__(
+        self,
+        embedder: EmbeddingBackend,
+        query_encoder: Optional[Callable[[str], np.ndarray]] = None,
+        budget: Optional[int] = None,
+        budget_unit: Optional[str] = None,
+        dedup_threshold: float = 0.92
+    ):
+        self.embedder = embedder
+        self.query_encoder = query_encoder or embedder.encode_query
+        self.budget = budget or int(os.getenv("RAG_CONTEXT_BUDGET", "1200"))
+        self.budget_unit = budget_unit or os.getenv("RAG_CONTEXT_BUDGET_UNIT", "chars")
+        if self.budget_unit not in ("chars", "tokens"):
+            raise ValueError(f"지원하지 않는 예산 단위: {self.budget_unit}")
+        self.dedup_threshold = dedup_threshold
+        # 같은 PDF 청크의 문장은 질문이 바뀌어도 다시 나오므로 문장 임베딩을 캐시
+        self.sentence_cache = MemoryBoundedLRU("sentence_embedding", int(float(os.getenv("RAG_SENTENCE_CACHE_MB", "32")) * 1024 * 1024))
+
+    def _cost(self, text: str) -> int:
+        return len(text) if self.budget_unit == "chars" else estimate_tokens(text)
+
+    def _encode_sentences(self, sentences: List[str]) -> np.ndarray:
+        """문장 임베딩 (캐시에 없는 문장만 한 번의 배치로 계산)"""
+        vectors: List[Optional[np.ndarray]] = [
+            self.sentence_cache.get((self.embedder.model_key, sentence)) for sentence in sentences
+        ]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = self.embedder.encode([sentences[i] for i in missing], kind="passage")
+            for row, i in enumerate(missing):
+                vectors[i] = encoded[row]
+                self.sentence_cache.put((self.embedder.model_key, sentences[i]), encoded[row])
+        return np.stack(vectors)
+
+    def select(self, query: str, contexts: List[Dict]) -> List[Dict]:
+        """예산 안에 들어가는 문장 목록 ({'page', 'order', 'text', 'score'})"""
+        candidates = []
+        for context_index, context in enumerate(contexts):
+            for sentence_index, sentence in enumerate(split_sentences(context['content'])):
+                candidates.append({
+                    'page': context.get('page', 'Unknown'),
+                    'order': (context_index, sentence_index),
+                    'text': sentence,
+                })
+        if not candidates:
+            return []
+
+        # 정규화된 벡터이므로 내적이 곧 코사인 유사도
+        sentence_vectors = self._encode_sentences([candidate['text'] for candidate in candidates])
+        query_vector = self.query_encoder(query)
+        scores = sentence_vectors @ query_vector
+
+        # 문장 간 유사도 행렬 (중복 제거용)
+        similarity = sentence_vectors @ sentence_vectors.T
+
+        selected = []
+        selected_indices = []
+        remaining = self.budget
+        for index in np.argsort(-scores):
+            candidate = candidates[index]
+            cost = self._cost(candidate['text'])
+            if cost > remaining:
+                continue
+            # 이미 고른 문장과 거의 같은 문장은 제외
+            if selected_indices and float(similarity[index, selected_indices].max()) >= self.dedup_threshold:
+                continue
+            candidate['score'] = float(scores[index])
+            selected.append(candidate)
+            selected_indices.append(index)
+            remaining -= cost
+            if remaining <= 0:
+                break
+
+        return selected
+
+    def build(self, query: str, contexts: List[Dict]) -> str:
+        """페이지별로 묶은 참고 자료 문자열 (페이지 안에서는 원래 문장 순서 유지)"""
+        selected = self.select(query, contexts)
+        by_page: Dict = {}
+        for sentence in sorted(selected, key=lambda item: item['order']):
+            by_page.setdefault(sentence['page'], []).append(sentence['text'])
+        return "\n\n".join(f"[Page {page}] {' '.join(texts)}" for page, texts in by_page.items())
+
+    async def abuild(self, query: str, contexts: List[Dict]) -> str:
+        """build()를 스레드에서 실행 (임베딩 계산이 이벤트 루프를 막지 않도록)
+
+        to_thread는 contextvars를 넘겨주므로 스레드 안의 트레이스 구간/로그 컨텍스트가 유지됨
+        """
+        return await asyncio.to_thread(self.build, query, contexts)
+
+# 전역 인스턴스 (RAG 시스템의 임베딩 모델과 질의 임베딩 캐시를 그대로 사용)
+context_builder = ContextBuilder(rag_system.embedder, rag_system.embed_query)
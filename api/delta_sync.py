@@ -0,0 +1,90 @@
+# backend/delta_sync.py
+# 채팅방 목록/메시지 기록 증분 동기화
+#
+# - 채팅방마다 version 카운터를 두고, 메시지 추가/삭제나 방 정보가 바뀌어 flush될 때마다 1씩 올림 (track_room_versions)
+# - 목록 응답에 ETag를 붙이고, 클라이언트가 If-None-Match로 같은 값을 보내면 목록을 읽거나 직렬화하지 않고 304
+#   · 메시지: 채팅방 id + version (기본 키 조회 한 번)
+#   · 채팅방 목록: 방 개수 / version 합계 / 최근 생성·수정 시각 (집계 한 번)
+# - updated_since / after_id 로 바뀐 부분만 받아감 (messages (room_id, created_at) 인덱스 사용)
+import hashlib
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from fastapi import Response
+from sqlalchemy import event, inspect
+
+import models
+
+# 메시지 목록 응답에 들어가는 필드 (analysis 재채점 등 나머지 필드 변경은 version을 올리지 않음)
+LISTED_MESSAGE_FIELDS = ("role", "content", "created_at")
+
+def make_etag(*parts) -> str:
+    """ETag 값 (따옴표 포함, 조회 조건도 넣어 표현마다 다른 값)"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+    return f'"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 헤더(여러 값, W/ 접두어, * 가능)가 etag와 맞는지"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+def not_modified(etag: str) -> Response:
+    """본문 없는 304"""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+def normalize_since(value: Optional[datetime]) -> Optional[datetime]:
+    """updated_since → DB와 같은 UTC naive datetime (타임존이 붙어 오면 UTC로 변환)"""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _listed_fields_changed(message) -> bool:
+    attrs = inspect(message).attrs
+    return any(attrs[field].history.has_changes() for field in LISTED_MESSAGE_FIELDS)
+
+def changed_room_ids(session) -> set:
+    """이번 flush에서 목록 내용이 바뀌는 채팅방 id"""
+    room_ids = set()
+    for message in session.new:
+        if isinstance(message, models.Message):
+            room_ids.add(message.room_id)
+    for message in session.deleted:
+        if isinstance(message, models.Message):
+            room_ids.add(message.room_id)
+    for obj in session.dirty:
+        if isinstance(obj, models.Message):
+            if _listed_fields_changed(obj):
+                room_ids.add(obj.room_id)
+        elif isinstance(obj, models.ChatRoom) and session.is_modified(obj):
+            room_ids.add(obj.id)
+    room_ids.discard(None)
+    return room_ids
+
+def bump_room_versions(connection, room_ids: Iterable[str]):
+    """채팅방 version += 1 (updated_at은 그대로 두어 목록 정렬이 바뀌지 않게)"""
+    room_ids = list(room_ids)
+    if not room_ids:
+        return
+    table = models.ChatRoom.__table__
+    connection.execute(
+        table.update()
+        .where(table.c.id.in_(room_ids))
+        .values(version=table.c.version + 1, updated_at=table.c.updated_at)
+    )
+
+def track_room_versions(session_factory):
+    """ORM flush마다 바뀐 채팅방의 version을 같은 트랜잭션 안에서 올림
+
+    Core INSERT/UPDATE(메시지 일괄 저장 등)는 flush를 거치지 않으므로 bump_room_versions를 직접 호출합니다.
+    세션에 이미 올라온 ChatRoom 객체의 version 속성은 갱신하지 않으므로, ETag는 항상 컬럼을 직접 조회해 만듭니다.
+    """
+    def after_flush(session, flush_context):
+        # after_flush 시점에는 new/dirty/deleted가 아직 flush 이전 상태
+        bump_room_versions(session.connection(), changed_room_ids(session))
+
+    event.listen(session_factory, "after_flush", after_flush)
@@ -0,0 +1,297 @@
+# backend/embedding_backends.py
+# RAG 시스템용 임베딩 백엔드 (PyTorch / ONNX Runtime / 사이드카 프로세스)
+import json
+import os
+import socket
+import struct
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+
+# 사용 가능한 임베딩 모델 목록
+# - tag: 컬렉션 이름 접미사 (모델마다 벡터 공간이 다르므로 컬렉션을 분리)
+# - query_prefix / passage_prefix: e5 계열처럼 입력 접두사가 필요한 모델용
+EMBEDDING_MODELS: Dict[str, Dict] = {
+    "minilm": {
+        "name": "sentence-transformers/all-MiniLM-L6-v2",
+        "dim": 384,
+        "max_length": 256,
+        "tag": "",
+    },
+    "multilingual-minilm": {
+        "name": "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+        "dim": 384,
+        "max_length": 128,
+        "tag": "mml12",
+    },
+    "multilingual-e5-small": {
+        "name": "intfloat/multilingual-e5-small",
+        "dim": 384,
+        "max_length": 512,
+        "tag": "me5s",
+        "query_prefix": "query: ",
+        "passage_prefix": "passage: ",
+    },
+}
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "remote")
+
+# 임베딩 사이드카 Unix 소켓 (EMBEDDING_BACKEND=remote일 때 사용)
+DEFAULT_EMBEDDING_SOCKET = "/tmp/feynman-embedding.sock"
+
+# 사이드카 프로토콜: 모든 프레임은 4바이트 길이(big-endian) + 본문
+# 요청은 JSON({"op": "info"} 또는 {"op": "encode", "texts": [...]}),
+# 응답은 JSON 헤더 프레임 뒤에 (encode인 경우) float32 벡터 바이트 프레임
+FRAME_HEADER = struct.Struct(">I")
+
+def send_frame(sock: socket.socket, payload: bytes):
+    sock.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
+def recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionError("임베딩 사이드카 연결이 끊어졌습니다")
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+def recv_frame(sock: socket.socket) -> bytes:
+    (size,) = FRAME_HEADER.unpack(recv_exact(sock, FRAME_HEADER.size))
+    return recv_exact(sock, size)
+
+class EmbeddingBackend:
+    """임베딩 백엔드 공통 인터페이스 (L2 정규화된 float32 벡터 반환)"""
+
+    def __init__(self, model_key: str, batch_size: int = 32):
+        if model_key not in EMBEDDING_MODELS:
+            raise ValueError(f"등록되지 않은 임베딩 모델: {model_key}")
+        self.model_key = model_key
+        self.spec = EMBEDDING_MODELS[model_key]
+        self.dim = self.spec["dim"]
+        self.batch_size = batch_size
+
+    @property
+    def name(self) -> str:
+        return f"{self.__class__.__name__}({self.model_key})"
+
+    def encode(self, texts: List[str], kind: str = "passage") -> np.ndarray:
+        """텍스트 목록 임베딩 (kind: 'query' 또는 'passage')"""
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        prefix = self.spec.get(f"{kind}_prefix", "")
+        if prefix:
+            texts = [prefix + text for text in texts]
+        return self._encode(texts)
+
+    def encode_query(self, query: str) -> np.ndarray:
+        return self.encode([query], kind="query")[0]
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+class TorchEmbeddingBackend(EmbeddingBackend):
+    """SentenceTransformer (PyTorch) 백엔드 - 기존 방식"""
+
+    def __init__(self, model_key: str, batch_size: int = 32, threads: Optional[int] = None):
+        super().__init__(model_key, batch_size)
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(self.spec["name"], device="cpu")
+        self.model.max_seq_length = self.spec["max_length"]
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return embeddings.astype(np.float32, copy=False)
+
+class OnnxEmbeddingBackend(EmbeddingBackend):
+    """ONNX Runtime CPU 백엔드 (선택적으로 int8 동적 양자화)
+
+    첫 실행 시 HuggingFace 모델을 ONNX로 내보내 model_dir에 저장하고,
+    이후에는 저장된 파일을 그대로 사용합니다.
+    """
+
+    def __init__(
+        self,
+        model_key: str,
+        batch_size: int = 32,
+        threads: Optional[int] = None,
+        quantize: bool = False,
+        model_dir: str = "./onnx_models"
+    ):
+        super().__init__(model_key, batch_size)
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.quantize = quantize
+        self.tokenizer = AutoTokenizer.from_pretrained(self.spec["name"])
+        model_path = self._prepare_model(os.path.join(model_dir, model_key))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    @property
+    def name(self) -> str:
+        return f"{self.__class__.__name__}({self.model_key}{', int8' if self.quantize else ''})"
+
+    def _prepare_model(self, target_dir: str) -> str:
+        """ONNX 모델 파일 준비 (없으면 내보내기/양자화)"""
+        os.makedirs(target_dir, exist_ok=True)
+        fp32_path = os.path.join(target_dir, "model.onnx")
+        int8_path = os.path.join(target_dir, "model_int8.onnx")
+
+        if not os.path.exists(fp32_path):
+            self._export(fp32_path)
+
+        if not self.quantize:
+            return fp32_path
+
+        if not os.path.exists(int8_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            print(f"⚙️ int8 동적 양자화 중: {int8_path}")
+            quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        return int8_path
+
+    def _export(self, path: str):
+        """HuggingFace 트랜스포머 본체를 ONNX로 내보내기 (풀링은 numpy에서 수행)"""
+        import torch
+        from transformers import AutoModel
+
+        print(f"⚙️ ONNX 내보내기 중: {self.spec['name']} → {path}")
+        model = AutoModel.from_pretrained(self.spec["name"])
+        model.eval()
+
+        sample = self.tokenizer(["sample text"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[name] for name in input_names),
+                path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        # 길이순으로 정렬해 배치 내 패딩을 줄이고, 끝나면 원래 순서로 복원
+        order = np.argsort([len(text) for text in texts])
+        output = np.empty((len(texts), self.dim), dtype=np.float32)
+
+        for start in range(0, len(texts), self.batch_size):
+            indices = order[start:start + self.batch_size]
+            encoded = self.tokenizer(
+                [texts[i] for i in indices],
+                padding=True,
+                truncation=True,
+                max_length=self.spec["max_length"],
+                return_tensors="np"
+            )
+            feeds = {name: encoded[name].astype(np.int64) for name in self.input_names if name in encoded}
+            hidden = self.session.run(None, feeds)[0]
+
+            # mean pooling + L2 정규화 (sentence-transformers와 동일)
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            output[indices] = pooled
+
+        return output
+
+class RemoteEmbeddingBackend(EmbeddingBackend):
+    """임베딩 사이드카(embedding_sidecar.py)에 Unix 소켓으로 요청하는 백엔드
+
+    여러 서버 워커가 모델을 각자 메모리에 올리지 않고 사이드카 프로세스의 모델 하나를 공유합니다.
+    모델 종류는 사이드카에서 받아오며, 접두사(query:/passage:) 처리는 기존과 같이 이쪽에서 합니다.
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, timeout: float = 60.0):
+        self.socket_path = socket_path or os.getenv("EMBEDDING_SOCKET", DEFAULT_EMBEDDING_SOCKET)
+        self.timeout = timeout
+        # 스레드마다 연결 하나 (배처/컨텍스트 빌더/평가가 서로 다른 스레드에서 호출)
+        self._local = threading.local()
+        info = self._request({"op": "info"})
+        super().__init__(info["model_key"], batch_size=info.get("batch_size", 32))
+        self.remote_name = info["name"]
+
+    @property
+    def name(self) -> str:
+        return f"{self.__class__.__name__}({self.remote_name} @ {self.socket_path})"
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _request(self, payload: Dict, expect_vectors: bool = False):
+        """요청 하나 (사이드카 재시작 등으로 연결이 끊겼으면 한 번 다시 연결)"""
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                send_frame(sock, json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+                header = json.loads(recv_frame(sock))
+                if not header.get("ok"):
+                    raise RuntimeError(f"임베딩 사이드카 오류: {header.get('error')}")
+                if not expect_vectors:
+                    return header
+                vectors = np.frombuffer(recv_frame(sock), dtype=np.float32)
+                return vectors.reshape(header["shape"])
+            except (ConnectionError, OSError):
+                self._close()
+                if attempt:
+                    raise
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self._request({"op": "encode", "texts": texts}, expect_vectors=True)
+
+def create_embedding_backend(
+    backend: Optional[str] = None,
+    model_key: Optional[str] = None,
+    quantize: Optional[bool] = None,
+    threads: Optional[int] = None
+) -> EmbeddingBackend:
+    """환경 변수(EMBEDDING_*) 또는 인자에 따라 임베딩 백엔드 생성"""
+    backend = backend or os.getenv("EMBEDDING_BACKEND", "torch")
+    model_key = model_key or os.getenv("EMBEDDING_MODEL", "minilm")
+    if quantize is None:
+        quantize = os.getenv("EMBEDDING_QUANTIZE", "0") == "1"
+    if threads is None:
+        threads = int(os.getenv("EMBEDDING_THREADS", "0")) or None
+    batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+
+    if backend == "torch":
+        return TorchEmbeddingBackend(model_key, batch_size=batch_size, threads=threads)
+    if backend == "onnx":
+        return OnnxEmbeddingBackend(model_key, batch_size=batch_size, threads=threads, quantize=quantize)
+    if backend == "remote":
+        # 모델 종류는 사이드카 설정을 따름
+        return RemoteEmbeddingBackend()
+    raise ValueError(f"지원하지 않는 임베딩 백엔드: {backend} (가능: {', '.join(EMBEDDING_BACKENDS)})")
@@ -0,0 +1,88 @@
+# backend/embedding_service.py
+# 동시 요청의 질의 임베딩을 모아 한 번의 배치로 계산하는 마이크로 배처
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from embedding_backends import EmbeddingBackend
+
+class EmbeddingBatcher:
+    """질의 임베딩 마이크로 배칭
+
+    - 대기 요청이 max_batch_size개가 되거나 첫 요청 후 max_wait_ms가 지나면 한 번에 계산
+    - 이전 배치를 계산하는 동안 들어온 요청은 계산이 끝나는 즉시 다음 배치로 처리
+    - 모델 계산은 전용 스레드에서 실행되어 이벤트 루프를 막지 않음
+    """
+
+    def __init__(
+        self,
+        backend: EmbeddingBackend,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None
+    ):
+        self.backend = backend
+        self.max_batch_size = max_batch_size or int(os.getenv("EMBEDDING_MAX_BATCH", "32"))
+        if max_wait_ms is None:
+            max_wait_ms = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+        self.max_wait = max_wait_ms / 1000
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._busy = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-batcher")
+
+        self.stats: Dict[str, int] = {"requests": 0, "batches": 0, "encoded": 0, "max_batch": 0}
+
+    async def encode_query(self, text: str) -> np.ndarray:
+        """질의 하나의 임베딩 (다른 요청과 함께 배치로 계산됨)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        self.stats["requests"] += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush(loop)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush, loop)
+
+        return await future
+
+    def _flush(self, loop: asyncio.AbstractEventLoop):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # 계산 중이면 끝난 뒤 _on_batch_done에서 이어서 처리
+        if self._busy or not self._pending:
+            return
+
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+
+        # 같은 질의는 한 번만 계산
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        self._busy = True
+        self.stats["batches"] += 1
+        self.stats["encoded"] += len(unique_texts)
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+
+        done = loop.run_in_executor(self._executor, self.backend.encode, unique_texts, "query")
+        done.add_done_callback(lambda result: self._on_batch_done(loop, batch, unique_texts, result))
+
+    def _on_batch_done(self, loop, batch, unique_texts, result: asyncio.Future):
+        self._busy = False
+        error = result.exception()
+        if error is None:
+            vectors = result.result()
+            index = {text: i for i, text in enumerate(unique_texts)}
+
+        for text, future in batch:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(vectors[index[text]])
+
+        if self._pending:
+            self._flush(loop)
@@ -0,0 +1,128 @@
+# backend/embedding_sidecar.py
+# 임베딩 모델을 한 번만 로드해 여러 서버 워커가 Unix 소켓으로 공유하는 사이드카 프로세스
+#
+# 사용법 (cluster.py가 자동으로 실행):
+#   python embedding_sidecar.py [--socket /tmp/feynman-embedding.sock]
+#
+# 모델 설정은 서버와 같은 EMBEDDING_BACKEND(torch/onnx) / EMBEDDING_MODEL / EMBEDDING_QUANTIZE 환경 변수를 따릅니다.
+import argparse
+import asyncio
+import json
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from dotenv import load_dotenv
+
+from embedding_backends import DEFAULT_EMBEDDING_SOCKET, FRAME_HEADER, create_embedding_backend
+
+load_dotenv()
+
+class EmbeddingSidecar:
+    """요청을 모아 한 번에 계산하는 임베딩 서버
+
+    모델 계산은 전용 스레드 하나에서 하고, 계산 중에 여러 워커에서 들어온 요청은
+    다음 계산 때 하나의 배치로 묶어 처리합니다.
+    """
+
+    def __init__(self, backend, max_batch_texts: int = 256):
+        self.backend = backend
+        self.max_batch_texts = max_batch_texts
+        self._queue: asyncio.Queue = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-sidecar")
+        self.stats = {"requests": 0, "batches": 0, "texts": 0}
+
+    def info(self) -> dict:
+        return {
+            "ok": True,
+            "model_key": self.backend.model_key,
+            "name": self.backend.name,
+            "dim": self.backend.dim,
+            "batch_size": self.backend.batch_size,
+            "stats": self.stats,
+        }
+
+    async def encode(self, texts: list) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            while not self._queue.empty() and size < self.max_batch_texts:
+                item = self._queue.get_nowait()
+                batch.append(item)
+                size += len(item[0])
+
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                vectors = await loop.run_in_executor(self._executor, self.backend._encode, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.stats["batches"] += 1
+            self.stats["texts"] += len(texts)
+            offset = 0
+            for item_texts, future in batch:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+    async def _read_frame(self, reader: asyncio.StreamReader) -> bytes:
+        (size,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+        return await reader.readexactly(size)
+
+    def _write_frame(self, writer: asyncio.StreamWriter, payload: bytes):
+        writer.write(FRAME_HEADER.pack(len(payload)) + payload)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = json.loads(await self._read_frame(reader))
+                self.stats["requests"] += 1
+                if request.get("op") == "info":
+                    self._write_frame(writer, json.dumps(self.info()).encode("utf-8"))
+                elif request.get("op") == "encode":
+                    try:
+                        vectors = np.ascontiguousarray(await self.encode(request.get("texts", [])), dtype=np.float32)
+                    except Exception as e:
+                        self._write_frame(writer, json.dumps({"ok": False, "error": str(e)}).encode("utf-8"))
+                    else:
+                        self._write_frame(writer, json.dumps({"ok": True, "shape": list(vectors.shape)}).encode("utf-8"))
+                        self._write_frame(writer, vectors.tobytes())
+                else:
+                    self._write_frame(writer, json.dumps({"ok": False, "error": f"unknown op: {request.get('op')}"}).encode("utf-8"))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, struct.error):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path: str):
+        self._queue = asyncio.Queue()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = await asyncio.start_unix_server(self.handle_connection, path=socket_path)
+        print(f"✅ 임베딩 사이드카 시작: {self.backend.name} @ {socket_path}")
+        async with server:
+            await asyncio.gather(server.serve_forever(), self._batch_loop())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="임베딩 사이드카")
+    parser.add_argument("--socket", default=os.getenv("EMBEDDING_SOCKET", DEFAULT_EMBEDDING_SOCKET))
+    args = parser.parse_args()
+
+    if os.getenv("EMBEDDING_BACKEND") == "remote":
+        raise SystemExit("사이드카에는 실제 모델 백엔드(torch/onnx)를 지정하세요")
+    sidecar = EmbeddingSidecar(create_embedding_backend())
+    try:
+        asyncio.run(sidecar.serve(args.socket))
+    except KeyboardInterrupt:
+        pass
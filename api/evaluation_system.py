@@ -1,29 +1,134 @@
 # backend/evaluation_system.py (새 파일)
+import hashlib
+import os
 from typing import Dict, List, Optional
-import re
+import numpy as np
+from metrics import evaluation_analyze_seconds
+from rag_cache import MemoryBoundedLRU
+from text_analyzer import SENTENCE_BOUNDARY_RE, TextAnalyzer, TextFeatures, text_analyzer
+
+# 채점 규칙 버전 (규칙을 바꾸면 올리고 batch_evaluation.py로 전체 재채점)
+# 3: 채점 방식(method) 저장, 재채점도 실시간 채점과 같은 참고 자료/임베딩 사용
+ANALYSIS_VERSION = 3
+
+# 참고 자료 문장과 이 값 이상 유사하면 "다룬 내용"으로 봄 (정규화된 임베딩의 코사인 유사도)
+COVERAGE_SIMILARITY = 0.5
+# 너무 짧은 참고 자료 조각은 비교에서 제외
+MIN_REFERENCE_CHARS = 10
+
+# 수준 순서 (비교용, 뒤로 갈수록 좋음)
+UNDERSTANDING_LEVELS = ["low", "medium", "high"]
+# 복잡도는 적당할 때가 가장 좋음
+COMPLEXITY_SCORES = {"simple": 1, "moderate": 2, "complex": 0}
+# 메시지에 저장하는 전문 용어 최대 개수
+MAX_STORED_TERMS = 20
+# 임베딩 기반 항목 (채점 방식이 다른 분석끼리는 비교하지 않음)
+SEMANTIC_METRICS = ("coherence", "coverage", "clear_concepts")
 
 class FeynmanEvaluator:
     """파인만 학습법 평가 시스템"""
     
-    def analyze_explanation(self, explanation: str) -> Dict:
-        """사용자 설명 분석"""
+    def __init__(self, analyzer: Optional[TextAnalyzer] = None, embedder=None):
+        self.analyzer = analyzer or text_analyzer
+        # 임베딩 백엔드가 없으면 휴리스틱 점수 사용 (저장된 분석에 method로 기록)
+        self.embedder = embedder
+        cache_bytes = int(float(os.getenv("EVALUATION_CACHE_MB", "16")) * 1024 * 1024)
+        # 참고 자료(AI 설명, PDF 청크) 문장은 매 턴 반복되므로 문장 임베딩을 캐시
+        self.sentence_cache = MemoryBoundedLRU("evaluation_sentence", cache_bytes)
+        # 같은 메시지(설명 + 참고 자료)는 다시 계산하지 않음
+        self.analysis_cache = MemoryBoundedLRU("evaluation_analysis", cache_bytes)
+    
+    def use_embedder(self, embedder):
+        """임베딩 기반 일관성/커버리지 점수 사용 (서버에서 RAG 시스템의 모델을 공유)"""
+        self.embedder = embedder
+        self.sentence_cache.clear()
+        self.analysis_cache.clear()
+    
+    def analyze_explanation(self, explanation: str, references: Optional[List[str]] = None) -> Dict:
+        """사용자 설명 분석 (references: 비교할 AI 설명/PDF 청크 텍스트)"""
+        with evaluation_analyze_seconds.time():
+            return self._analyze_explanation(explanation, references)
+    
+    def _analyze_explanation(self, explanation: str, references: Optional[List[str]]) -> Dict:
+        cache_key = self._analysis_cache_key(explanation, references)
+        cached = self.analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # 문장 분리/표지어/토큰 특징을 한 번에 계산해 모든 항목이 공유
+        features = self.analyzer.analyze(explanation)
+        semantic = self._semantic_scores(features, references or [])
         
         analysis = {
-            "understanding": self._analyze_understanding(explanation),
-            "expression": self._analyze_expression(explanation),
+            "understanding": self._analyze_understanding(features, semantic),
+            "expression": self._analyze_expression(features),
             "application": self._analyze_application(explanation),
             "metacognition": self._analyze_metacognition(explanation),
             "knowledge_level": self._analyze_knowledge_level(explanation)
         }
         
+        self.analysis_cache.put(cache_key, analysis)
         return analysis
     
-    def _analyze_understanding(self, text: str) -> Dict:
+    def _analysis_cache_key(self, explanation: str, references: Optional[List[str]]) -> str:
+        digest = hashlib.sha256(explanation.encode("utf-8"))
+        for reference in references or []:
+            digest.update(b"\x00" + reference.encode("utf-8"))
+        model_key = self.embedder.model_key if self.embedder is not None else "heuristic"
+        return f"{model_key}:{digest.hexdigest()}"
+    
+    def _encode_sentences(self, sentences: List[str]) -> np.ndarray:
+        """문장 임베딩 (캐시에 없는 문장만 한 번의 배치로 계산)"""
+        vectors: List[Optional[np.ndarray]] = [
+            self.sentence_cache.get((self.embedder.model_key, sentence)) for sentence in sentences
+        ]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = self.embedder.encode([sentences[i] for i in missing], kind="passage")
+            for row, i in enumerate(missing):
+                vectors[i] = encoded[row]
+                self.sentence_cache.put((self.embedder.model_key, sentences[i]), encoded[row])
+        return np.stack(vectors)
+    
+    def _semantic_scores(self, features: TextFeatures, references: List[str]) -> Optional[Dict]:
+        """임베딩 기반 점수: 인접 문장 유사도(일관성), 참고 자료 커버리지, 명확한 개념 문장 수"""
+        if self.embedder is None or not features.sentences:
+            return None
+        
+        reference_sentences = list(dict.fromkeys(
+            sentence.strip()
+            for reference in references
+            for sentence in SENTENCE_BOUNDARY_RE.split(reference)
+            if len(sentence.strip()) >= MIN_REFERENCE_CHARS
+        ))
+        
+        # 설명 문장과 참고 자료 문장을 한 번에 임베딩 (정규화된 벡터이므로 내적이 곧 코사인 유사도)
+        sentence_count = len(features.sentences)
+        vectors = self._encode_sentences(features.sentences + reference_sentences)
+        explanation_vectors, reference_vectors = vectors[:sentence_count], vectors[sentence_count:]
+        
+        scores = {"coherence": None, "coverage": None, "clear_concepts": 0}
+        if sentence_count > 1:
+            adjacent = np.einsum("ij,ij->i", explanation_vectors[:-1], explanation_vectors[1:])
+            scores["coherence"] = round(float(np.clip(adjacent.mean(), 0.0, 1.0)), 3)
+        
+        if len(reference_vectors):
+            similarity = explanation_vectors @ reference_vectors.T
+            # 커버리지: 참고 자료 문장 중 설명에서 다룬 비율
+            scores["coverage"] = round(float((similarity.max(axis=0) >= COVERAGE_SIMILARITY).mean()), 3)
+            # 명확한 개념: 참고 자료와 맞닿는 설명 문장 수
+            scores["clear_concepts"] = int((similarity.max(axis=1) >= COVERAGE_SIMILARITY).sum())
+        
+        return scores
+    
+    def _analyze_understanding(self, features: TextFeatures, semantic: Optional[Dict] = None) -> Dict:
         """이해도 분석"""
         indicators = {
-            "clear_concepts": self._count_clear_concepts(text),
-            "confusion_markers": self._find_confusion_markers(text),
-            "coherence": self._check_coherence(text)
+            "clear_concepts": self._count_clear_concepts(features, semantic),
+            "confusion_markers": self._find_confusion_markers(features),
+            "coherence": self._check_coherence(features, semantic),
+            "coverage": semantic["coverage"] if semantic else None,
+            "method": "embedding" if semantic else "heuristic"
         }
         
         return {
@@ -31,17 +136,17 @@ class FeynmanEvaluator:
             "details": indicators
         }
     
-    def _analyze_expression(self, text: str) -> Dict:
+    def _analyze_expression(self, features: TextFeatures) -> Dict:
         """표현력 분석"""
         
         # 전문 용어 감지
-        technical_terms = self._detect_technical_terms(text)
+        technical_terms = self._detect_technical_terms(features)
         
         # 비유/예시 사용
-        analogies = self._find_analogies(text)
+        analogies = self._find_analogies(features)
         
         # 문장 복잡도
-        complexity = self._calculate_complexity(text)
+        complexity = self._calculate_complexity(features)
         
         return {
             "technical_terms": technical_terms,
@@ -50,41 +155,18 @@ class FeynmanEvaluator:
             "suggestions": self._generate_expression_suggestions(technical_terms, complexity)
         }
     
-    def _detect_technical_terms(self, text: str) -> List[str]:
-        """전문 용어 감지"""
+    def _detect_technical_terms(self, features: TextFeatures) -> List[str]:
+        """전문 용어 감지 (약어, -tion/-ity 단어)"""
         # 실제로는 더 정교한 NLP 처리 필요
-        technical_patterns = [
-            r'\b[A-Z]{2,}\b',  # 약어
-            r'\b\w+tion\b',    # -tion으로 끝나는 단어
-            r'\b\w+ity\b',     # -ity로 끝나는 단어
-        ]
-        
-        found_terms = []
-        for pattern in technical_patterns:
-            matches = re.findall(pattern, text)
-            found_terms.extend(matches)
-        
-        return list(set(found_terms))
+        return features.technical_terms
     
-    def _find_analogies(self, text: str) -> List[str]:
-        """비유 표현 찾기"""
-        analogy_markers = ['처럼', '같이', '마치', '예를 들어', '비유하자면']
-        analogies = []
-        
-        for marker in analogy_markers:
-            if marker in text:
-                # 마커 주변 문장 추출
-                sentences = text.split('.')
-                for sent in sentences:
-                    if marker in sent:
-                        analogies.append(sent.strip())
-        
-        return analogies
+    def _find_analogies(self, features: TextFeatures) -> List[str]:
+        """비유 표현 찾기 (비유 표지어가 있는 문장, 중복 없이)"""
+        return features.marker_sentences("analogy")
     
-    def _calculate_complexity(self, text: str) -> str:
+    def _calculate_complexity(self, features: TextFeatures) -> str:
         """문장 복잡도 계산"""
-        sentences = text.split('.')
-        avg_length = sum(len(s.split()) for s in sentences) / max(len(sentences), 1)
+        avg_length = features.average_sentence_length
         
         if avg_length < 10:
             return "simple"
@@ -152,27 +234,135 @@ class FeynmanEvaluator:
         
         return feedback
     
+    def compact_analysis(self, analysis: Dict) -> Dict:
+        """메시지에 저장할 간결한 분석 결과 (비교에 필요한 값만, 제안 문장은 저장하지 않음)"""
+        understanding = analysis.get("understanding", {})
+        details = understanding.get("details", {})
+        expression = analysis.get("expression", {})
+        return {
+            "understanding": understanding.get("level"),
+            "method": details.get("method"),
+            "confusion_markers": details.get("confusion_markers", []),
+            "coherence": details.get("coherence"),
+            "coverage": details.get("coverage"),
+            "clear_concepts": details.get("clear_concepts", 0),
+            "technical_terms": expression.get("technical_terms", [])[:MAX_STORED_TERMS],
+            "analogies_count": expression.get("analogies_count", 0),
+            "complexity": expression.get("complexity"),
+            "application": analysis.get("application", {}).get("level"),
+            "metacognition": analysis.get("metacognition", {}).get("level"),
+            "knowledge_level": analysis.get("knowledge_level", {}).get("level"),
+        }
+    
+    def compare_analyses(self, first: Dict, second: Dict) -> Dict:
+        """첫 번째/두 번째 설명의 저장된 분석 비교 (improved/regressed/unchanged/incomparable 항목과 변화량)"""
+        changes = {}
+        
+        def record(name: str, before, after, delta: float):
+            status = "improved" if delta > 0 else "regressed" if delta < 0 else "unchanged"
+            changes[name] = {"before": before, "after": after, "status": status}
+        
+        def level_index(levels: List[str], level: Optional[str]) -> int:
+            return levels.index(level) if level in levels else -1
+        
+        # 임베딩 점수와 휴리스틱 기본값(일관성 0.7, 커버리지 없음)의 차이는 실제 변화가 아니므로
+        # 임베딩 기반 항목과 그 값으로 정하는 이해도는 두 분석의 채점 방식이 같을 때만 비교
+        comparable = first.get("method") is not None and first.get("method") == second.get("method")
+        
+        def incomparable(name: str, before, after):
+            changes[name] = {"before": before, "after": after, "status": "incomparable"}
+        
+        if comparable:
+            record("understanding", first.get("understanding"), second.get("understanding"),
+                   level_index(UNDERSTANDING_LEVELS, second.get("understanding")) - level_index(UNDERSTANDING_LEVELS, first.get("understanding")))
+        else:
+            incomparable("understanding", first.get("understanding"), second.get("understanding"))
+        
+        # 혼란 표현과 전문 용어는 줄어들수록 개선
+        before_confusion, after_confusion = len(first.get("confusion_markers", [])), len(second.get("confusion_markers", []))
+        record("confusion_markers", before_confusion, after_confusion, before_confusion - after_confusion)
+        before_terms, after_terms = len(first.get("technical_terms", [])), len(second.get("technical_terms", []))
+        record("technical_terms", before_terms, after_terms, before_terms - after_terms)
+        
+        record("analogies", first.get("analogies_count", 0), second.get("analogies_count", 0),
+               second.get("analogies_count", 0) - first.get("analogies_count", 0))
+        record("complexity", first.get("complexity"), second.get("complexity"),
+               COMPLEXITY_SCORES.get(second.get("complexity"), 0) - COMPLEXITY_SCORES.get(first.get("complexity"), 0))
+        for name in SEMANTIC_METRICS:
+            before, after = first.get(name), second.get(name)
+            if comparable and before is not None and after is not None:
+                record(name, before, after, round(after - before, 3))
+            else:
+                incomparable(name, before, after)
+        
+        # 두 번째 설명에서 쉬운 말로 바꾼 용어 / 새로 등장한 용어
+        first_terms, second_terms = set(first.get("technical_terms", [])), set(second.get("technical_terms", []))
+        
+        return {
+            "changes": changes,
+            "improved": [name for name, change in changes.items() if change["status"] == "improved"],
+            "regressed": [name for name, change in changes.items() if change["status"] == "regressed"],
+            "resolved_terms": sorted(first_terms - second_terms),
+            "new_terms": sorted(second_terms - first_terms),
+            "resolved_confusion": sorted(set(first.get("confusion_markers", [])) - set(second.get("confusion_markers", []))),
+            "methods": [first.get("method"), second.get("method")],
+        }
+    
+    def format_comparison(self, comparison: Dict) -> str:
+        """비교 결과를 평가 프롬프트에 넣을 문장으로 변환"""
+        labels = {
+            "understanding": "이해도",
+            "confusion_markers": "혼란 표현 수",
+            "technical_terms": "전문 용어 수",
+            "analogies": "비유/예시 수",
+            "complexity": "문장 복잡도",
+            "coherence": "논리적 일관성",
+            "coverage": "참고 자료 커버리지",
+            "clear_concepts": "명확한 개념 문장 수",
+        }
+        status_labels = {"improved": "개선", "regressed": "후퇴", "unchanged": "변화 없음"}
+        
+        lines = [
+            f"- {labels[name]}: {change['before']} → {change['after']} ({status_labels[change['status']]})"
+            for name, change in comparison["changes"].items()
+            if change["status"] != "incomparable"
+        ]
+        first_method, second_method = comparison.get("methods", [None, None])
+        if first_method != second_method:
+            lines.append(f"- 채점 방식이 달라 이해도/일관성/커버리지/개념 문장 수는 비교하지 않음 ({first_method} → {second_method})")
+        if comparison["resolved_terms"]:
+            lines.append(f"- 쉬운 말로 바꾼 전문 용어: {', '.join(comparison['resolved_terms'][:5])}")
+        if comparison["new_terms"]:
+            lines.append(f"- 새로 사용한 전문 용어: {', '.join(comparison['new_terms'][:5])}")
+        if comparison["resolved_confusion"]:
+            lines.append(f"- 사라진 혼란 표현: {', '.join(comparison['resolved_confusion'])}")
+        return "\n".join(lines)
+    
     # 헬퍼 메서드들
-    def _count_clear_concepts(self, text: str) -> int:
-        """명확한 개념 설명 수 계산"""
-        # 구현 필요
-        return 0
+    def _count_clear_concepts(self, features: TextFeatures, semantic: Optional[Dict] = None) -> int:
+        """명확한 개념 설명 수 계산 (참고 자료와 의미가 맞닿는 설명 문장 수)"""
+        return semantic["clear_concepts"] if semantic else 0
     
-    def _find_confusion_markers(self, text: str) -> List[str]:
+    def _find_confusion_markers(self, features: TextFeatures) -> List[str]:
         """혼란 지표 찾기"""
-        markers = ['잘 모르겠', '확실하지 않', '아마도', '것 같습니다']
-        found = [m for m in markers if m in text]
-        return found
+        return features.marker_words("confusion")
     
-    def _check_coherence(self, text: str) -> float:
-        """논리적 일관성 체크"""
-        # 실제로는 더 복잡한 NLP 처리 필요
+    def _check_coherence(self, features: TextFeatures, semantic: Optional[Dict] = None) -> float:
+        """논리적 일관성 체크 (인접 문장 임베딩 코사인 유사도 평균, 임베딩이 없거나 한 문장이면 기본값)"""
+        if semantic and semantic["coherence"] is not None:
+            return semantic["coherence"]
         return 0.7
     
     def _determine_understanding_level(self, indicators: Dict) -> str:
         """이해 수준 결정"""
+        coverage = indicators.get("coverage")
         if indicators.get("confusion_markers", []):
             return "low"
+        elif coverage is not None:
+            # 참고 자료가 있으면 커버리지와 일관성으로 판단
+            if coverage >= 0.6 and indicators.get("coherence", 0) >= 0.4:
+                return "high"
+            return "low" if coverage < 0.2 else "medium"
         elif indicators.get("coherence", 0) > 0.8:
             return "high"
         else:
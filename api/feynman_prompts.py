@@ -154,9 +154,17 @@ PDF나 이미지를 업로드하면 더 정확한 학습이 가능함을 안내
 
     def _evaluation_prompt(self, context: Dict) -> str:
         """종합 평가"""
-        return """
-사용자의 두 번의 설명과 자기 성찰을 바탕으로 종합 평가를 제공합니다.
+        improvement = context.get('improvement_summary')
+        improvement_block = f"""
+첫 번째 → 두 번째 설명 분석 비교 (저장된 분석 결과):
+{improvement}
 
+위 비교 결과를 '개선된 부분'과 '개선 방법 제시'의 근거로 사용하세요.
+""" if improvement else ""
+        
+        return f"""
+사용자의 두 번의 설명과 자기 성찰을 바탕으로 종합 평가를 제공합니다.
+{improvement_block}
 평가 기준 (절대 점수 사용 금지):
 
 1. 이해도
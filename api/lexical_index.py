@@ -0,0 +1,171 @@
+# backend/lexical_index.py
+# 채팅방별 BM25 역색인 (하이브리드 검색용)
+#
+# 채팅방 역색인은 메모리 크기 기준 LRU(RAG_LEXICAL_CACHE_MB)에 보관하고,
+# 밀려난 채팅방은 다음 검색 때 ChromaDB에 저장된 청크로 다시 구축 (RAGSystem._ensure_lexical_index)
+import math
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from rag_cache import MemoryBoundedLRU
+
+# 역색인 항목 하나(용어 → {chunk_id: 빈도})와 문서 하나의 대략적인 고정 비용 (바이트)
+POSTING_BYTES = 120
+DOCUMENT_BYTES = 400
+
+HANGUL_RE = re.compile(r"[가-힣]")
+TOKEN_RE = re.compile(r"[가-힣]+|[a-z]+|\d+")
+
+def tokenize(text: str) -> List[str]:
+    """한국어는 글자 2-gram, 영어/숫자는 단어 단위로 토큰화
+
+    한국어는 조사/어미가 붙어 단어 단위 매칭이 잘 되지 않으므로
+    ("자료구조는", "자료구조를") 글자 2-gram을 사용합니다.
+    """
+    tokens = []
+    for match in TOKEN_RE.finditer(text.lower()):
+        word = match.group()
+        if HANGUL_RE.match(word):
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """여러 순위 목록을 RRF 점수(sum 1 / (k + rank))로 합치기"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class _RoomIndex:
+    """채팅방 하나의 역색인"""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.documents: Dict[str, Tuple[str, Dict]] = {}
+        self.total_length = 0
+        # 대략적인 메모리 크기 (MemoryBoundedLRU가 estimate_size에서 읽음)
+        self.nbytes = 0
+
+    @staticmethod
+    def _document_bytes(text: str, term_count: int) -> int:
+        return sys.getsizeof(text) + term_count * POSTING_BYTES + DOCUMENT_BYTES
+
+    def add(self, chunk_id: str, text: str, metadata: Dict):
+        if chunk_id in self.documents:
+            self.remove(chunk_id)
+        term_counts = Counter(tokenize(text))
+        for term, count in term_counts.items():
+            self.postings.setdefault(term, {})[chunk_id] = count
+        length = sum(term_counts.values())
+        self.doc_lengths[chunk_id] = length
+        self.documents[chunk_id] = (text, metadata)
+        self.total_length += length
+        self.nbytes += self._document_bytes(text, len(term_counts))
+
+    def remove(self, chunk_id: str):
+        if chunk_id not in self.documents:
+            return
+        text, _ = self.documents.pop(chunk_id)
+        terms = set(tokenize(text))
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(chunk_id, None)
+                if not posting:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(chunk_id)
+        self.nbytes -= self._document_bytes(text, len(terms))
+
+class LexicalIndex:
+    """BM25 점수 기반 채팅방별 역색인 (PDF 업로드 시 함께 구축, 메모리 크기 기준 LRU)"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, max_bytes: Optional[int] = None):
+        self.k1 = k1
+        self.b = b
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("RAG_LEXICAL_CACHE_MB", "128")) * 1024 * 1024)
+        self._rooms = MemoryBoundedLRU("lexical_index", max_bytes)
+        self._lock = threading.Lock()
+
+    def _room(self, room_id: str) -> Optional[_RoomIndex]:
+        return self._rooms.get(room_id, count_miss=False)
+
+    def has_room(self, room_id: str) -> bool:
+        return self._room(room_id) is not None
+
+    def add(self, room_id: str, chunk_ids: List[str], texts: List[str], metadatas: List[Dict]):
+        """청크 추가 (같은 id가 있으면 교체, 채팅방이 없으면 새로 만듦 - 전체 구축용)"""
+        with self._lock:
+            room = self._room(room_id) or _RoomIndex()
+            for chunk_id, text, metadata in zip(chunk_ids, texts, metadatas):
+                room.add(chunk_id, text, metadata)
+            # 크기가 바뀌었으므로 다시 넣어 LRU 용량 계산에 반영
+            self._rooms.put(room_id, room)
+
+    def update(self, room_id: str, chunk_ids: List[str], texts: List[str], metadatas: List[Dict]):
+        """메모리에 있는 채팅방에만 청크 반영 (없으면 다음 검색 때 전체를 다시 구축하므로 건너뜀)"""
+        with self._lock:
+            room = self._room(room_id)
+            if room is None:
+                return
+            for chunk_id, text, metadata in zip(chunk_ids, texts, metadatas):
+                room.add(chunk_id, text, metadata)
+            self._rooms.put(room_id, room)
+
+    def remove(self, room_id: str, chunk_ids: List[str]):
+        """청크 삭제"""
+        with self._lock:
+            room = self._room(room_id)
+            if room is None:
+                return
+            for chunk_id in chunk_ids:
+                room.remove(chunk_id)
+            self._rooms.put(room_id, room)
+
+    def drop_room(self, room_id: str):
+        with self._lock:
+            self._rooms.pop(room_id)
+
+    def get(self, room_id: str, chunk_id: str) -> Optional[Tuple[str, Dict]]:
+        """청크 본문과 메타데이터"""
+        room = self._room(room_id)
+        if room is None:
+            return None
+        return room.documents.get(chunk_id)
+
+    def stats(self) -> Dict:
+        return self._rooms.stats()
+
+    def search(self, room_id: str, query: str, n_results: int = 10) -> List[Tuple[str, float]]:
+        """BM25 상위 n개 (chunk_id, 점수)"""
+        with self._lock:
+            room = self._rooms.get(room_id)
+            if room is None or not room.documents:
+                return []
+
+            doc_count = len(room.documents)
+            avg_length = room.total_length / doc_count if doc_count else 0.0
+            scores: Dict[str, float] = {}
+
+            for term in set(tokenize(query)):
+                posting = room.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for chunk_id, tf in posting.items():
+                    norm = 1 - self.b + self.b * room.doc_lengths[chunk_id] / (avg_length or 1)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:n_results]
@@ -0,0 +1,153 @@
+# backend/log_config.py
+# 구조화 로깅: 이벤트 루프를 막지 않는 큐 기반 로거 + 카테고리별 레벨/샘플링 + 채팅방/단계/턴 컨텍스트
+#
+# - 로그 호출은 큐에 레코드를 넣기만 하고, 실제 stdout 쓰기는 백그라운드 스레드(QueueListener)가 함
+# - 레코드마다 현재 room_id / phase / turn_id(contextvars)를 붙여 JSON 한 줄로 출력 (LOG_FORMAT=text면 사람이 읽는 형식)
+# - 카테고리(feynman.<category>)별 레벨: LOG_LEVELS="ws=INFO,prompt=DEBUG"
+# - 카테고리별 샘플링 (WARNING 미만만): LOG_SAMPLE="ws=0.1,rag=0.5"
+# - 프롬프트 본문은 prompt 카테고리가 DEBUG일 때만, LOG_PROMPT_CHARS 글자까지만 기록
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+LOGGER_PREFIX = "feynman"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_PROMPT_CHARS = int(os.getenv("LOG_PROMPT_CHARS", "2000"))
+
+room_id_var: contextvars.ContextVar = contextvars.ContextVar("room_id", default=None)
+phase_var: contextvars.ContextVar = contextvars.ContextVar("phase", default=None)
+turn_id_var: contextvars.ContextVar = contextvars.ContextVar("turn_id", default=None)
+
+CONTEXT_VARS = {"room_id": room_id_var, "phase": phase_var, "turn_id": turn_id_var}
+
+# LogRecord 기본 속성 (나머지는 extra로 넘긴 필드)
+RESERVED_ATTRS = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "room_id", "phase", "turn_id"}
+
+def parse_category_settings(value: Optional[str]) -> Dict[str, str]:
+    """"ws=INFO,prompt=DEBUG" → {"ws": "INFO", "prompt": "DEBUG"}"""
+    settings = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            category, setting = item.split("=", 1)
+            settings[category.strip()] = setting.strip()
+    return settings
+
+def bind_context(**values):
+    """현재 태스크의 로그 컨텍스트 설정 (room_id, phase, turn_id)"""
+    for key, value in values.items():
+        CONTEXT_VARS[key].set(value)
+
+@contextmanager
+def log_context(**values):
+    """블록 안에서만 로그 컨텍스트 설정"""
+    tokens = [(CONTEXT_VARS[key], CONTEXT_VARS[key].set(value)) for key, value in values.items()]
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+class ContextFilter(logging.Filter):
+    """로그를 남긴 쪽(이벤트 루프 태스크)의 컨텍스트를 레코드에 복사 (큐에 넣기 전에 실행됨)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, var in CONTEXT_VARS.items():
+            # extra로 직접 넘긴 값이 우선
+            if getattr(record, key, None) is None:
+                setattr(record, key, var.get())
+        return True
+
+class SamplingFilter(logging.Filter):
+    """카테고리별 비율로 WARNING 미만 레코드를 샘플링"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(record.name[len(LOGGER_PREFIX) + 1:], 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+class JsonFormatter(logging.Formatter):
+    """레코드 → JSON 한 줄"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "category": record.name[len(LOGGER_PREFIX) + 1:] or record.name,
+            "msg": record.getMessage(),
+        }
+        for key in CONTEXT_VARS:
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        for key, value in record.__dict__.items():
+            if key not in RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    """개발용 한 줄 형식: 시간 카테고리 [room/phase/turn] 메시지"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        context = "/".join(str(getattr(record, key, None) or "-") for key in CONTEXT_VARS)
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.name[len(LOGGER_PREFIX) + 1:]:<10} [{context}] {record.getMessage()}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def setup_logging():
+    """feynman.* 로거를 큐 핸들러 + 백그라운드 출력으로 구성 (여러 번 호출해도 한 번만)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    root = logging.getLogger(LOGGER_PREFIX)
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+    for category, level in parse_category_settings(os.getenv("LOG_LEVELS")).items():
+        logging.getLogger(f"{LOGGER_PREFIX}.{category}").setLevel(level.upper())
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.addFilter(SamplingFilter({
+        category: float(rate) for category, rate in parse_category_settings(os.getenv("LOG_SAMPLE")).items()
+    }))
+    queue_handler.addFilter(ContextFilter())
+    root.addHandler(queue_handler)
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    _listener = logging.handlers.QueueListener(records, output)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+def get_logger(category: str) -> logging.Logger:
+    """카테고리 로거 (feynman.<category>)"""
+    setup_logging()
+    return logging.getLogger(f"{LOGGER_PREFIX}.{category}")
+
+def log_prompt(logger: logging.Logger, prompt: str, **fields):
+    """프롬프트 본문은 DEBUG에서만, 길이 제한을 두고 기록"""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            prompt[:LOG_PROMPT_CHARS],
+            extra={"prompt_chars": len(prompt), "truncated": len(prompt) > LOG_PROMPT_CHARS, **fields}
+        )
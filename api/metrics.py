@@ -0,0 +1,190 @@
+# backend/metrics.py
+# Prometheus 텍스트 형식 메트릭 (외부 라이브러리 없이 카운터/게이지/히스토그램)
+#
+# GET /metrics 를 로컬 Prometheus가 수집하거나 curl로 바로 확인할 수 있습니다.
+# 모든 메트릭에 phase(LearningPhase 값) 라벨이 붙으며, 넘기지 않으면 현재 로그 컨텍스트의 단계를 사용합니다.
+# 멀티 워커(cluster.py)에서는 워커마다 값이 따로 쌓이므로 워커 포트별로 수집합니다.
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from log_config import phase_var
+
+# 지연 시간 기본 버킷 (초)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# 처리량 버킷 (토큰/s, 페이지/s)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 200, 500, 1000)
+
+def current_phase() -> str:
+    return phase_var.get() or "none"
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ("phase",)):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        if "phase" in self.labelnames and labels.get("phase") is None:
+            labels["phase"] = current_phase()
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{format_labels(self.labelnames, key)} {value}" for key, value in values]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ("phase",), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 라벨 → [버킷별 개수(+Inf 포함), 합계, 개수]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """블록 실행 시간 기록"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        lines = []
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                le_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, key, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ("phase",)) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ("phase",)) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = ("phase",),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Prometheus 텍스트 형식 (0.0.4)"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+# ========== 파이프라인 메트릭 ==========
+ws_turn_seconds = metrics.histogram(
+    "feynman_ws_turn_seconds", "WebSocket 메시지 하나를 처리하는 데 걸린 시간")
+ws_first_token_seconds = metrics.histogram(
+    "feynman_ws_first_token_seconds", "메시지 수신부터 첫 응답 프레임 발행까지 걸린 시간")
+llm_tokens_per_second = metrics.histogram(
+    "feynman_llm_tokens_per_second", "Ollama 생성 속도 (eval_count / eval_duration)", ("phase", "model"), RATE_BUCKETS)
+ollama_responses_total = metrics.counter(
+    "feynman_ollama_responses_total", "Ollama HTTP 응답 수 (상태 코드별)", ("phase", "route", "status"))
+ws_connections = metrics.gauge(
+    "feynman_ws_connections", "연결된 WebSocket 수 (연결은 단계와 무관하므로 역할별)", ("role",))
+ws_frames_sent_total = metrics.counter(
+    "feynman_ws_frames_sent_total", "구독자 큐에 넣은 WebSocket 프레임 수", ("phase", "type"))
+rag_search_seconds = metrics.histogram(
+    "feynman_rag_search_seconds", "RAGSystem.search 지연 시간", ("phase", "mode"))
+rag_ingest_pages_per_second = metrics.histogram(
+    "feynman_rag_ingest_pages_per_second", "문서 색인 속도 (페이지/s)", ("phase",), RATE_BUCKETS)
+evaluation_analyze_seconds = metrics.histogram(
+    "feynman_evaluation_analyze_seconds", "FeynmanEvaluator.analyze_explanation 시간 (캐시 적중 포함)")
+db_commit_seconds = metrics.histogram(
+    "feynman_db_commit_seconds", "DB 커밋 시간")
+
+def instrument_sessions(session_factory):
+    """세션 팩토리의 커밋 시간을 db_commit_seconds에 기록"""
+    from sqlalchemy import event
+
+    def before_commit(session):
+        session.info["commit_started"] = time.perf_counter()
+
+    def after_commit(session):
+        started = session.info.pop("commit_started", None)
+        if started is not None:
+            db_commit_seconds.observe(time.perf_counter() - started)
+
+    def after_rollback(session):
+        session.info.pop("commit_started", None)
+
+    event.listen(session_factory, "before_commit", before_commit)
+    event.listen(session_factory, "after_commit", after_commit)
+    event.listen(session_factory, "after_rollback", after_rollback)
@@ -0,0 +1,46 @@
+# backend/migrate_db.py
+# 기존 DB에 새로 추가된 컬럼 반영 (create_all은 이미 있는 테이블을 변경하지 않음)
+#
+# 사용법:
+#   python migrate_db.py
+from sqlalchemy import inspect, text
+from database import engine
+import models
+
+# (테이블, 컬럼) → 컬럼 정의
+NEW_COLUMNS = [
+    ("messages", "analysis", "JSON"),
+    ("messages", "analysis_version", "INTEGER"),
+    ("messages", "analyzed_at", "TIMESTAMP"),
+    ("messages", "client_msg_id", "VARCHAR(64)"),
+    ("chat_rooms", "version", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+# (인덱스 이름, 테이블, 컬럼, 유니크 여부)
+NEW_INDEXES = [
+    ("uq_messages_room_client_msg", "messages", "room_id, client_msg_id", True),
+    ("ix_messages_room_created", "messages", "room_id, created_at", False),
+]
+
+def migrate():
+    # 새 테이블 생성
+    models.Base.metadata.create_all(bind=engine)
+
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table, column, column_type in NEW_COLUMNS:
+            existing = {col["name"] for col in inspector.get_columns(table)}
+            if column in existing:
+                continue
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+            print(f"➕ {table}.{column} 추가")
+        for name, table, columns, unique in NEW_INDEXES:
+            existing = {index["name"] for index in inspector.get_indexes(table)}
+            if name in existing:
+                continue
+            connection.execute(text(f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({columns})"))
+            print(f"➕ {table} {'유니크 ' if unique else ''}인덱스 {name} 추가")
+
+if __name__ == "__main__":
+    migrate()
+    print("✅ 마이그레이션 완료")
@@ -0,0 +1,160 @@
+# backend/migrate_rag_storage.py
+# 채팅방별 컬렉션(room_<id>)을 공유 샤드 컬렉션(rag_shard_<n>)으로 옮기는 도구
+#
+# 사용법:
+#   python migrate_rag_storage.py --path ./chroma_db --shards 8 [--delete-source] [--dry-run]
+#
+# 임베딩을 그대로 복사하므로 다시 임베딩하지 않습니다.
+# 마이그레이션 후 서버는 RAG_STORAGE_MODE=shared, RAG_SHARD_COUNT=<shards> 로 실행하세요.
+#
+# 청크 메타데이터는 서버가 색인할 때와 같은 형식(page, room_id, doc_id, chunk_hash)으로 맞춥니다.
+# doc_id가 없는 예전 청크는 채팅방마다 정해진 legacy 문서 id로 묶고, 그 id로 room_documents 행을 만들어
+# 문서 목록/삭제/교체 API에서 다른 문서처럼 다룰 수 있게 합니다 (--skip-db면 행은 만들지 않음).
+import argparse
+import uuid
+from typing import Dict, Optional
+
+from chroma_client import DEFAULT_CHROMA_PATH, create_chroma_client
+from rag_chunks import chunk_content_hash, shard_name_for_room
+
+ROOM_PREFIX = "room_"
+
+# 예전 청크를 묶는 문서의 파일 이름 (문서 목록에 표시됨)
+LEGACY_FILENAME = "legacy.pdf"
+
+def legacy_doc_id(room_id: str) -> str:
+    """doc_id가 없는 예전 청크의 문서 id (같은 채팅방은 몇 번 실행해도 같은 값)"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"feynman-legacy-document:{room_id}"))
+
+def chunk_metadata(room_id: str, document: Optional[str], metadata: Optional[Dict]) -> Dict:
+    """저장된 메타데이터를 서버 색인 형식(rag_chunks.document_chunks)으로 변환"""
+    metadata = metadata or {}
+    return {
+        'page': metadata.get('page', 0),
+        'room_id': room_id,
+        'doc_id': metadata.get('doc_id') or legacy_doc_id(room_id),
+        'chunk_hash': metadata.get('chunk_hash') or chunk_content_hash(document or ""),
+    }
+
+def list_room_collections(client) -> list:
+    """room_ 접두사가 붙은 기존 컬렉션 이름 목록"""
+    names = []
+    for collection in client.list_collections():
+        # chromadb 버전에 따라 이름(str) 또는 Collection 객체를 반환
+        name = collection if isinstance(collection, str) else collection.name
+        if name.startswith(ROOM_PREFIX):
+            names.append(name)
+    return sorted(names)
+
+def migrate_collection(client, name: str, shard_count: int, batch_size: int = 500, dry_run: bool = False) -> Dict:
+    """컬렉션 하나를 공유 샤드로 복사 → {"room_id", "chunks", "legacy_chunks", "legacy_pages"}"""
+    # room_<id>__<모델 태그> 형식이면 같은 태그의 샤드로 옮김 (임베딩 모델별 컬렉션 분리 유지)
+    room_id, _, tag = name[len(ROOM_PREFIX):].partition("__")
+    target_name = shard_name_for_room(room_id, shard_count) + (f"__{tag}" if tag else "")
+    source = client.get_collection(name, embedding_function=None)
+    target = None if dry_run else client.get_or_create_collection(target_name, embedding_function=None)
+
+    moved = 0
+    legacy_chunks = 0
+    legacy_pages = set()
+    offset = 0
+    while True:
+        batch = source.get(
+            include=["documents", "metadatas", "embeddings"],
+            limit=batch_size,
+            offset=offset
+        )
+        ids = batch["ids"]
+        if not ids:
+            break
+
+        metadatas = []
+        for document, metadata in zip(batch["documents"] or [None for _ in ids], batch["metadatas"] or [{} for _ in ids]):
+            if not (metadata or {}).get('doc_id'):
+                legacy_chunks += 1
+                legacy_pages.add((metadata or {}).get('page', 0))
+            metadatas.append(chunk_metadata(room_id, document, metadata))
+
+        if target is not None:
+            # id는 이미 room_id 접두사를 포함하므로 샤드 안에서도 충돌하지 않음
+            target.upsert(
+                ids=ids,
+                documents=batch["documents"],
+                metadatas=metadatas,
+                embeddings=batch["embeddings"]
+            )
+
+        moved += len(ids)
+        offset += len(ids)
+
+    return {"room_id": room_id, "chunks": moved, "legacy_chunks": legacy_chunks, "legacy_pages": len(legacy_pages)}
+
+def register_legacy_documents(legacy: Dict[str, Dict]) -> int:
+    """예전 청크를 묶은 legacy 문서를 room_documents에 등록 (이미 있으면 청크/페이지 수만 갱신, 등록한 문서 수 반환)"""
+    import models
+    from database import SessionLocal
+
+    registered = 0
+    db = SessionLocal()
+    try:
+        for room_id, counts in legacy.items():
+            if db.query(models.ChatRoom.id).filter(models.ChatRoom.id == room_id).first() is None:
+                print(f"  ⚠️ 채팅방이 없어 legacy 문서를 등록하지 않음: {room_id}")
+                continue
+            doc_id = legacy_doc_id(room_id)
+            document = db.query(models.RoomDocument).filter(models.RoomDocument.id == doc_id).first()
+            if document is None:
+                document = models.RoomDocument(id=doc_id, room_id=room_id, filename=LEGACY_FILENAME, version=1)
+                db.add(document)
+                registered += 1
+            document.chunk_count = counts["chunks"]
+            document.page_count = counts["pages"]
+        db.commit()
+    finally:
+        db.close()
+    return registered
+
+def migrate(client, shard_count: int, delete_source: bool = False, batch_size: int = 500, dry_run: bool = False,
+            register_documents: bool = True) -> dict:
+    """모든 채팅방 컬렉션 마이그레이션"""
+    names = list_room_collections(client)
+    print(f"📦 마이그레이션 대상 컬렉션: {len(names)}개 → 샤드 {shard_count}개")
+
+    total_chunks = 0
+    legacy: Dict[str, Dict] = {}
+    for index, name in enumerate(names, start=1):
+        result = migrate_collection(client, name, shard_count, batch_size, dry_run)
+        total_chunks += result["chunks"]
+        if result["legacy_chunks"]:
+            counts = legacy.setdefault(result["room_id"], {"chunks": 0, "pages": 0})
+            counts["chunks"] += result["legacy_chunks"]
+            counts["pages"] = max(counts["pages"], result["legacy_pages"])
+
+        if delete_source and not dry_run:
+            client.delete_collection(name)
+
+        if index % 100 == 0 or index == len(names):
+            print(f"  - {index}/{len(names)} 컬렉션 처리 ({total_chunks}개 청크)")
+
+    registered = 0
+    if legacy:
+        print(f"📎 doc_id가 없던 청크: {sum(c['chunks'] for c in legacy.values())}개 ({len(legacy)}개 채팅방)")
+        if register_documents and not dry_run:
+            registered = register_legacy_documents(legacy)
+
+    print(f"✅ 마이그레이션 완료: {len(names)}개 컬렉션, {total_chunks}개 청크, legacy 문서 {registered}개 등록")
+    return {"collections": len(names), "chunks": total_chunks, "legacy_rooms": len(legacy), "legacy_documents": registered}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="채팅방별 ChromaDB 컬렉션을 공유 샤드로 마이그레이션")
+    parser.add_argument("--path", default=DEFAULT_CHROMA_PATH, help="ChromaDB 저장 경로 (CHROMA_HOST가 있으면 서버처럼 Chroma 서버에 연결)")
+    parser.add_argument("--shards", type=int, default=8, help="공유 샤드 컬렉션 수 (RAG_SHARD_COUNT와 같아야 함)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--delete-source", action="store_true", help="복사 후 기존 컬렉션 삭제")
+    parser.add_argument("--dry-run", action="store_true", help="옮길 청크 수만 확인")
+    parser.add_argument("--skip-db", action="store_true", help="legacy 문서를 room_documents에 등록하지 않음")
+    args = parser.parse_args()
+
+    # 서버(rag_system)와 같은 방식으로 연결
+    client = create_chroma_client(args.path)
+    migrate(client, args.shards, args.delete_source, args.batch_size, args.dry_run, register_documents=not args.skip_db)
@@ -0,0 +1,140 @@
+# backend/model_router.py
+# 학습 단계/작업별 LLM 라우팅: 모델과 생성 예산(num_predict, num_ctx, stop, temperature)을 한 곳에서 관리
+#
+# 가벼운 작업(키워드 추출, 자기 성찰 유도 등)은 작은 양자화 모델과 짧은 토큰 예산으로,
+# 긴 설명과 평가는 큰 모델로 보냅니다. MODEL_ROUTES_FILE(JSON)로 항목별 덮어쓰기 가능:
+#   {"self_reflection_1:chat": {"model": "qwen2.5:3b", "num_predict": 150}}
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+from feynman_prompts import LearningPhase
+from metrics import llm_tokens_per_second
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+SMALL_MODEL = os.getenv("OLLAMA_SMALL_MODEL", "llama3.2:3b")
+LARGE_MODEL = os.getenv("OLLAMA_LARGE_MODEL", "llama3.1:8b")
+
+# 대화가 다음 "사용자:" 턴까지 이어서 생성되지 않도록
+CHAT_STOP = ["\n사용자:"]
+
+# (단계 값 또는 "*", 작업) → 라우트
+# 작업: chat(단계별 대화 응답), keyword(개념 키워드 추출), evaluation(구조화 종합 평가), health(연결 확인)
+ROUTES: Dict[str, Dict] = {
+    "*:chat": {"model": LARGE_MODEL, "num_predict": 1024, "num_ctx": 4096, "temperature": 0.7, "stop": CHAT_STOP},
+    "*:keyword": {"model": SMALL_MODEL, "num_predict": 16, "num_ctx": 1024, "temperature": 0.0, "stop": ["\n"]},
+    "*:health": {"model": SMALL_MODEL, "num_predict": 32, "num_ctx": 512, "temperature": 0.0, "stop": []},
+    f"{LearningPhase.KNOWLEDGE_CHECK.value}:chat": {
+        "model": SMALL_MODEL, "num_predict": 256, "num_ctx": 2048, "temperature": 0.5, "stop": CHAT_STOP,
+    },
+    f"{LearningPhase.FIRST_EXPLANATION.value}:chat": {
+        "model": SMALL_MODEL, "num_predict": 256, "num_ctx": 4096, "temperature": 0.5, "stop": CHAT_STOP,
+    },
+    f"{LearningPhase.SELF_REFLECTION_1.value}:chat": {
+        "model": SMALL_MODEL, "num_predict": 200, "num_ctx": 2048, "temperature": 0.6, "stop": CHAT_STOP,
+    },
+    f"{LearningPhase.AI_EXPLANATION.value}:chat": {
+        "model": LARGE_MODEL, "num_predict": 1536, "num_ctx": 8192, "temperature": 0.6, "stop": CHAT_STOP,
+    },
+    f"{LearningPhase.SECOND_EXPLANATION.value}:chat": {
+        "model": LARGE_MODEL, "num_predict": 512, "num_ctx": 4096, "temperature": 0.5, "stop": CHAT_STOP,
+    },
+    f"{LearningPhase.SELF_REFLECTION_2.value}:chat": {
+        "model": SMALL_MODEL, "num_predict": 200, "num_ctx": 2048, "temperature": 0.6, "stop": CHAT_STOP,
+    },
+    f"{LearningPhase.EVALUATION.value}:chat": {
+        "model": LARGE_MODEL, "num_predict": 1024, "num_ctx": 8192, "temperature": 0.5, "stop": CHAT_STOP,
+    },
+    f"{LearningPhase.EVALUATION.value}:evaluation": {
+        "model": os.getenv("EVALUATION_MODEL", LARGE_MODEL),
+        "num_predict": int(os.getenv("EVALUATION_NUM_PREDICT", "700")),
+        "num_ctx": 8192,
+        "temperature": 0.0,
+        "stop": [],
+    },
+}
+
+def load_route_overrides(path: Optional[str]) -> Dict[str, Dict]:
+    """MODEL_ROUTES_FILE의 항목별 덮어쓰기 (없으면 빈 dict)"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as routes_file:
+        return json.load(routes_file)
+
+class ModelRouter:
+    """(단계, 작업) → 모델/생성 옵션 선택 + 라우트별 지연 시간/토큰 통계"""
+
+    def __init__(self, routes: Optional[Dict[str, Dict]] = None, overrides_path: Optional[str] = None):
+        self.routes = {key: dict(route) for key, route in (routes or ROUTES).items()}
+        for key, override in load_route_overrides(overrides_path or os.getenv("MODEL_ROUTES_FILE")).items():
+            self.routes[key] = {**self.routes.get(key, self.routes["*:chat"]), **override}
+        self._stats: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def route(self, task: str, phase: Optional[LearningPhase] = None) -> Dict:
+        """단계별 라우트 → 작업 기본 라우트 → 대화 기본 라우트 순으로 찾음 (key 포함 사본)"""
+        for key in (f"{phase.value}:{task}" if phase else None, f"*:{task}", "*:chat"):
+            if key and key in self.routes:
+                return {"key": key, **self.routes[key]}
+        raise KeyError(task)
+
+    def request_body(self, route: Dict, prompt: str, stream: bool, **extra) -> Dict:
+        """Ollama /api/generate 요청 본문"""
+        options = {
+            "num_predict": route["num_predict"],
+            "num_ctx": route["num_ctx"],
+            "temperature": route["temperature"],
+        }
+        if route.get("stop"):
+            options["stop"] = route["stop"]
+        return {"model": route["model"], "prompt": prompt, "stream": stream, "options": options, **extra}
+
+    def record(self, route: Dict, phase: Optional[LearningPhase], seconds: float, final_chunk: Optional[Dict] = None):
+        """호출 하나의 지연 시간과 (Ollama 마지막 응답의) 토큰 수 기록"""
+        final_chunk = final_chunk or {}
+        if final_chunk.get("eval_count") and final_chunk.get("eval_duration"):
+            llm_tokens_per_second.observe(
+                final_chunk["eval_count"] / (final_chunk["eval_duration"] / 1e9),
+                phase=phase.value if phase else None,
+                model=route["model"]
+            )
+        stat_key = f"{phase.value if phase else '*'}|{route['key']}|{route['model']}"
+        with self._lock:
+            stats = self._stats.setdefault(stat_key, {
+                "phase": phase.value if phase else None,
+                "route": route["key"],
+                "model": route["model"],
+                "calls": 0,
+                "total_seconds": 0.0,
+                "max_seconds": 0.0,
+                "prompt_tokens": 0,
+                "output_tokens": 0,
+                "generation_seconds": 0.0,
+            })
+            stats["calls"] += 1
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["prompt_tokens"] += final_chunk.get("prompt_eval_count", 0)
+            stats["output_tokens"] += final_chunk.get("eval_count", 0)
+            # Ollama 시간 값은 나노초
+            stats["generation_seconds"] += final_chunk.get("eval_duration", 0) / 1e9
+
+    def stats(self) -> Dict:
+        """라우트별 평균 지연 시간/출력 토큰/생성 속도"""
+        with self._lock:
+            snapshot = [dict(stats) for stats in self._stats.values()]
+        for stats in snapshot:
+            calls = stats["calls"]
+            stats["avg_ms"] = round(stats["total_seconds"] / calls * 1000, 1)
+            stats["max_ms"] = round(stats["max_seconds"] * 1000, 1)
+            stats["avg_output_tokens"] = round(stats["output_tokens"] / calls, 1)
+            stats["tokens_per_s"] = round(stats["output_tokens"] / stats["generation_seconds"], 1) if stats["generation_seconds"] else None
+            for key in ("total_seconds", "max_seconds", "generation_seconds"):
+                del stats[key]
+        return {
+            "routes": self.routes,
+            "stats": sorted(snapshot, key=lambda stats: (stats["phase"] or "", stats["route"])),
+        }
+
+model_router = ModelRouter()
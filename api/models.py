@@ -1,5 +1,5 @@
 # backend/models.py
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Integer, Boolean
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Integer, Boolean, JSON, Index
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -17,8 +17,13 @@ class ChatRoom(Base):
     current_concept = Column(String(500), nullable=True)
     knowledge_level = Column(Integer, default=0)
     has_pdf = Column(Boolean, default=False)
+
+    # 목록 내용(메시지, 방 정보)이 바뀔 때마다 1씩 증가 (증분 동기화 ETag, delta_sync.py)
+    version = Column(Integer, default=0, nullable=False)
     
     messages = relationship("Message", back_populates="room", cascade="all, delete-orphan")
+    documents = relationship("RoomDocument", back_populates="room", cascade="all, delete-orphan")
+    evaluations = relationship("LearningEvaluation", back_populates="room", cascade="all, delete-orphan")
 
 class Message(Base):
     __tablename__ = "messages"
@@ -33,4 +38,48 @@ class Message(Base):
     phase = Column(String(50), nullable=True)
     is_explanation = Column(Boolean, default=False)
 
-    room = relationship("ChatRoom", back_populates="messages")
\ No newline at end of file
+    # 설명 분석 결과 (FeynmanEvaluator.analyze_explanation 출력, 채점 규칙 버전과 함께 저장)
+    analysis = Column(JSON, nullable=True)
+    analysis_version = Column(Integer, nullable=True)
+    analyzed_at = Column(DateTime, nullable=True)
+
+    # 클라이언트가 만든 멱등 키 (일괄 저장 재시도 시 중복 방지, 채팅방 안에서 유일)
+    client_msg_id = Column(String(64), nullable=True)
+
+    room = relationship("ChatRoom", back_populates="messages")
+
+    __table_args__ = (
+        Index("uq_messages_room_client_msg", "room_id", "client_msg_id", unique=True),
+        # 채팅방 메시지 목록/증분 조회 (room_id로 거르고 created_at 순서)
+        Index("ix_messages_room_created", "room_id", "created_at"),
+    )
+
+class RoomDocument(Base):
+    __tablename__ = "room_documents"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    room_id = Column(String, ForeignKey("chat_rooms.id"), index=True)
+    filename = Column(String(255), nullable=False)
+    content_hash = Column(String(64))
+    version = Column(Integer, default=1)
+    page_count = Column(Integer, default=0)
+    chunk_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    room = relationship("ChatRoom", back_populates="documents")
+
+class LearningEvaluation(Base):
+    __tablename__ = "learning_evaluations"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    room_id = Column(String, ForeignKey("chat_rooms.id"), index=True)
+    message_id = Column(String, ForeignKey("messages.id"), nullable=True)
+    # 평가 입력(모델, 스키마 버전, 설명/비교 결과) 해시 - 같은 입력이면 다시 생성하지 않음
+    input_hash = Column(String(64), index=True)
+    model = Column(String(100))
+    schema_version = Column(Integer)
+    result = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    room = relationship("ChatRoom", back_populates="evaluations")
\ No newline at end of file
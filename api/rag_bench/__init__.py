@@ -0,0 +1,6 @@
+# backend/rag_bench
+# RAG 검색 품질(recall@k, MRR)과 성능(적재 처리량, 검색 지연 시간) 오프라인 벤치마크
+#
+# 사용법:
+#   python -m rag_bench --synthetic 20 --output results.json
+#   python -m rag_bench --corpus corpus.json --configs configs.json --baseline last_release.json
@@ -0,0 +1,69 @@
+# backend/rag_bench/__main__.py
+# api 폴더에서 실행: python -m rag_bench --help
+import argparse
+import json
+import sys
+
+from rag_bench.corpus import generate_synthetic_corpus, load_corpus, save_corpus
+from rag_bench.runner import DEFAULT_CONFIGS, compare_with_baseline, run_all
+
+def print_table(report: dict):
+    header = ["name", "mrr", "recall@1", "recall@3", "recall@5", "pages_per_s", "p50_ms", "p95_ms", "p99_ms"]
+    print("\n" + " | ".join(f"{name:>12}" for name in header))
+    for result in report["results"]:
+        row = [
+            result["config"].get("name", "-"),
+            result["quality"]["mrr"],
+            result["quality"]["recall@1"],
+            result["quality"]["recall@3"],
+            result["quality"]["recall@5"],
+            result["ingest"]["pages_per_s"],
+            result["query_latency"]["p50_ms"],
+            result["query_latency"]["p95_ms"],
+            result["query_latency"]["p99_ms"],
+        ]
+        print(" | ".join(f"{str(value):>12}" for value in row))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m rag_bench", description="RAG 검색 품질/성능 벤치마크")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--corpus", help="라벨링된 코퍼스 JSON 파일")
+    source.add_argument("--synthetic", type=int, metavar="DOCS", help="합성 코퍼스 문서 수 (한국어/영어 반반)")
+    parser.add_argument("--pages", type=int, default=20, help="합성 문서당 페이지 수")
+    parser.add_argument("--save-corpus", help="생성한 합성 코퍼스를 저장할 경로")
+    parser.add_argument("--configs", help="비교할 설정 목록 JSON 파일 (없으면 기본 설정)")
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    parser.add_argument("--baseline", help="이전 결과 JSON (품질이 떨어지면 종료 코드 1)")
+    parser.add_argument("--tolerance", type=float, default=0.02)
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        corpus = generate_synthetic_corpus(args.synthetic, args.pages)
+        if args.save_corpus:
+            save_corpus(corpus, args.save_corpus)
+
+    configs = DEFAULT_CONFIGS
+    if args.configs:
+        with open(args.configs, encoding="utf-8") as configs_file:
+            configs = json.load(configs_file)
+
+    print(f"📄 문서 {len(corpus['documents'])}개, 질문 {len(corpus['questions'])}개, 설정 {len(configs)}개")
+    report = run_all(configs, corpus)
+    print_table(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        print(f"💾 결과 저장: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            regressions = compare_with_baseline(report, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print("❌ 품질 저하:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print("✅ 기준 결과 대비 품질 저하 없음")
@@ -0,0 +1,122 @@
+# backend/rag_bench/corpus.py
+# 라벨링된 벤치마크 코퍼스 (문서 + 질문→정답 페이지)
+#
+# 코퍼스 JSON 형식:
+# {
+#   "documents": [
+#     {"id": "os-lecture", "language": "ko", "path": "pdfs/os.pdf"},
+#     {"id": "synthetic-en-0", "language": "en", "pages": ["page 1 text", "page 2 text"]}
+#   ],
+#   "questions": [
+#     {"doc_id": "os-lecture", "question": "페이지 교체 알고리즘은?", "relevant_pages": [12, 13]}
+#   ]
+# }
+# path는 코퍼스 파일 기준 상대 경로, pages는 이미 추출된 페이지 텍스트(1페이지부터)입니다.
+import json
+import os
+import random
+from typing import Dict, List
+
+TOPICS = [
+    ("스택", "stack"), ("큐", "queue"), ("해시 테이블", "hash table"), ("이진 탐색 트리", "binary search tree"),
+    ("그래프", "graph"), ("힙", "heap"), ("연결 리스트", "linked list"), ("정렬 알고리즘", "sorting algorithm"),
+    ("동적 계획법", "dynamic programming"), ("운영체제", "operating system"), ("프로세스", "process"),
+    ("스레드", "thread"), ("가상 메모리", "virtual memory"), ("데이터베이스", "database"), ("트랜잭션", "transaction"),
+    ("인덱스", "index"), ("라우터", "router"), ("암호화", "encryption"), ("컴파일러", "compiler"),
+    ("광합성", "photosynthesis"), ("세포 분열", "cell division"), ("중력", "gravity"),
+    ("전자기 유도", "electromagnetic induction"), ("양자역학", "quantum mechanics"), ("미분", "derivative"),
+    ("적분", "integral"), ("확률", "probability"), ("행렬", "matrix"), ("신경망", "neural network"),
+    ("캐시 메모리", "cache memory"),
+]
+
+ATTRIBUTES = [
+    ("핵심 원리", "core principle"), ("대표 예시", "typical example"), ("처음 제안한 사람", "original author"),
+    ("주요 단점", "main drawback"), ("실생활 비유", "everyday analogy"),
+]
+
+VALUES = [
+    ("푸른 등대", "blue lighthouse"), ("은빛 시계", "silver clock"), ("붉은 다리", "red bridge"),
+    ("조용한 도서관", "quiet library"), ("높은 탑", "tall tower"), ("둥근 연못", "round pond"),
+    ("작은 우체통", "small mailbox"), ("오래된 나침반", "old compass"), ("하얀 풍차", "white windmill"),
+    ("긴 터널", "long tunnel"), ("노란 우산", "yellow umbrella"), ("깊은 우물", "deep well"),
+]
+
+FILLER = {
+    "ko": [
+        "이 내용은 시험에 자주 출제됩니다.",
+        "앞 장에서 배운 내용과 함께 복습하면 좋습니다.",
+        "아래 그림은 전체 구조를 간단히 나타낸 것입니다.",
+        "자세한 증명은 부록을 참고하세요.",
+    ],
+    "en": [
+        "This topic frequently appears on exams.",
+        "It is worth reviewing together with the previous chapter.",
+        "The figure below summarizes the overall structure.",
+        "See the appendix for the detailed proof.",
+    ],
+}
+
+def generate_synthetic_corpus(num_docs: int = 10, pages_per_doc: int = 20, seed: int = 42) -> Dict:
+    """한국어/영어 합성 코퍼스 생성 (문서의 절반씩, 페이지마다 주제 하나와 사실 몇 개)"""
+    rng = random.Random(seed)
+    documents, questions = [], []
+
+    for doc_index in range(num_docs):
+        language = "ko" if doc_index % 2 == 0 else "en"
+        doc_id = f"synthetic-{language}-{doc_index}"
+        topics = rng.sample(TOPICS, min(pages_per_doc, len(TOPICS)))
+        pages = []
+
+        for page_number, topic in enumerate(topics, start=1):
+            sentences = []
+            facts = rng.sample(ATTRIBUTES, 3)
+            for attribute in facts:
+                value = rng.choice(VALUES)
+                if language == "ko":
+                    sentences.append(f"{topic[0]}의 {attribute[0]}은(는) {value[0]}입니다.")
+                else:
+                    sentences.append(f"The {attribute[1]} of {topic[1]} is the {value[1]}.")
+            sentences.extend(rng.sample(FILLER[language], 2))
+            rng.shuffle(sentences)
+            title = topic[0] if language == "ko" else topic[1].title()
+            pages.append(f"{title}\n" + " ".join(sentences))
+
+            attribute = rng.choice(facts)
+            if language == "ko":
+                question = f"{topic[0]}의 {attribute[0]}은 무엇인가요?"
+            else:
+                question = f"What is the {attribute[1]} of {topic[1]}?"
+            questions.append({"doc_id": doc_id, "question": question, "relevant_pages": [page_number]})
+
+        documents.append({"id": doc_id, "language": language, "pages": pages})
+
+    return {"documents": documents, "questions": questions}
+
+def load_corpus(path: str) -> Dict:
+    """코퍼스 JSON 로드 (문서 path는 절대 경로로 변환)"""
+    with open(path, encoding="utf-8") as corpus_file:
+        corpus = json.load(corpus_file)
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    for document in corpus["documents"]:
+        if "path" in document and not os.path.isabs(document["path"]):
+            document["path"] = os.path.join(base_dir, document["path"])
+        document.setdefault("language", "unknown")
+
+    doc_ids = {document["id"] for document in corpus["documents"]}
+    for question in corpus["questions"]:
+        if question["doc_id"] not in doc_ids:
+            raise ValueError(f"질문이 없는 문서를 가리킵니다: {question['doc_id']}")
+    return corpus
+
+def save_corpus(corpus: Dict, path: str):
+    with open(path, "w", encoding="utf-8") as corpus_file:
+        json.dump(corpus, corpus_file, ensure_ascii=False, indent=2)
+
+def document_pages(document: Dict) -> List[Dict]:
+    """RAGSystem.index_document(pages=...)에 넘길 페이지 목록"""
+    return [
+        {"text": text, "page": page_number, "metadata": f"Page {page_number}"}
+        for page_number, text in enumerate(document["pages"], start=1)
+        if text.strip()
+    ]
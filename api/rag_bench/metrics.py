@@ -0,0 +1,32 @@
+# backend/rag_bench/metrics.py
+from typing import Dict, Iterable, List
+
+def recall_at_k(retrieved: List, relevant: Iterable, k: int) -> float:
+    """상위 k개 안에 정답 페이지가 하나라도 있으면 1"""
+    relevant = set(relevant)
+    return 1.0 if any(item in relevant for item in retrieved[:k]) else 0.0
+
+def reciprocal_rank(retrieved: List, relevant: Iterable) -> float:
+    """첫 정답의 순위 역수 (없으면 0)"""
+    relevant = set(relevant)
+    for rank, item in enumerate(retrieved, start=1):
+        if item in relevant:
+            return 1.0 / rank
+    return 0.0
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "mean_ms": round(sum(latencies_ms) / len(latencies_ms), 2) if latencies_ms else 0.0,
+    }
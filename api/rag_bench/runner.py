@@ -0,0 +1,149 @@
+# backend/rag_bench/runner.py
+# 설정별로 코퍼스를 적재/검색하며 품질과 성능 측정
+import platform
+import subprocess
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import chromadb
+from chromadb.config import Settings
+
+from embedding_backends import create_embedding_backend
+from rag_system import RAGSystem
+from rag_bench.corpus import document_pages
+from rag_bench.metrics import latency_summary, recall_at_k, reciprocal_rank
+
+# 기본 비교 설정 (configs 파일이 없을 때)
+DEFAULT_CONFIGS = [
+    {"name": "vector-500", "search_mode": "vector", "chunk_size": 500},
+    {"name": "hybrid-500", "search_mode": "hybrid", "chunk_size": 500},
+    {"name": "hybrid-300", "search_mode": "hybrid", "chunk_size": 300},
+    {"name": "hybrid-800", "search_mode": "hybrid", "chunk_size": 800},
+]
+
+CONFIG_DEFAULTS = {
+    "search_mode": "hybrid",
+    "chunk_size": 500,
+    "storage_mode": "per_room",
+    "embedding_backend": "torch",
+    "embedding_model": "minilm",
+    "quantize": False,
+    "n_results": 5,
+}
+
+K_VALUES = (1, 3, 5)
+
+_embedders: Dict[tuple, object] = {}
+
+def get_embedder(config: Dict):
+    """같은 임베딩 설정은 모델을 한 번만 로드"""
+    key = (config["embedding_backend"], config["embedding_model"], bool(config["quantize"]))
+    if key not in _embedders:
+        _embedders[key] = create_embedding_backend(*key)
+    return _embedders[key]
+
+def run_config(config: Dict, corpus: Dict) -> Dict:
+    """설정 하나로 전체 코퍼스를 적재하고 모든 질문을 검색"""
+    config = {**CONFIG_DEFAULTS, **config}
+    run_id = uuid.uuid4().hex[:8]
+    rag = RAGSystem(
+        storage_mode=config["storage_mode"],
+        client=chromadb.EphemeralClient(Settings(anonymized_telemetry=False)),
+        search_mode=config["search_mode"],
+        chunk_size=config["chunk_size"],
+        embedder=get_embedder(config)
+    )
+    # 캐시가 지연 시간 측정을 왜곡하지 않도록 끔
+    rag.result_cache.max_bytes = 0
+    rag.embedding_cache.max_bytes = 0
+
+    # 적재 (문서마다 별도 채팅방, 실행마다 다른 room_id로 격리)
+    rooms = {}
+    total_pages = 0
+    ingest_start = time.perf_counter()
+    for document in corpus["documents"]:
+        room_id = f"bench-{run_id}-{document['id']}"
+        rooms[document["id"]] = room_id
+        if "pages" in document:
+            stats = rag.index_document(room_id, document["id"], pages=document_pages(document), doc_hash=document["id"])
+        else:
+            stats = rag.index_document(room_id, document["id"], pdf_path=document["path"])
+        if stats is None:
+            raise RuntimeError(f"문서 적재 실패: {document['id']}")
+        total_pages += stats["pages"]
+    ingest_seconds = time.perf_counter() - ingest_start
+
+    # 검색
+    languages = {document["id"]: document.get("language", "unknown") for document in corpus["documents"]}
+    latencies = []
+    per_language: Dict[str, Dict[str, List[float]]] = {}
+    for question in corpus["questions"]:
+        start = time.perf_counter()
+        contexts = rag.search(rooms[question["doc_id"]], question["question"], n_results=config["n_results"])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        # 같은 페이지의 청크가 여러 개 나올 수 있으므로 페이지 기준으로 중복 제거
+        pages = list(dict.fromkeys(context["page"] for context in contexts))
+        scores = per_language.setdefault(languages[question["doc_id"]], {"mrr": []})
+        scores["mrr"].append(reciprocal_rank(pages, question["relevant_pages"]))
+        for k in K_VALUES:
+            scores.setdefault(f"recall@{k}", []).append(recall_at_k(pages, question["relevant_pages"], k))
+
+    def average(metric: str, language: Optional[str] = None) -> float:
+        values = per_language[language][metric] if language else [v for s in per_language.values() for v in s[metric]]
+        return round(sum(values) / len(values), 4) if values else 0.0
+
+    metrics = ["mrr"] + [f"recall@{k}" for k in K_VALUES]
+    return {
+        "config": config,
+        "documents": len(corpus["documents"]),
+        "questions": len(corpus["questions"]),
+        "quality": {metric: average(metric) for metric in metrics},
+        "quality_by_language": {
+            language: {metric: average(metric, language) for metric in metrics}
+            for language in sorted(per_language)
+        },
+        "ingest": {
+            "pages": total_pages,
+            "seconds": round(ingest_seconds, 3),
+            "pages_per_s": round(total_pages / ingest_seconds, 2) if ingest_seconds else 0.0,
+        },
+        "query_latency": latency_summary(latencies),
+    }
+
+def environment_info() -> Dict:
+    """결과 비교용 실행 환경 정보"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip()
+    except Exception:
+        commit = ""
+    return {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_commit": commit or None,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+def run_all(configs: List[Dict], corpus: Dict) -> Dict:
+    results = []
+    for config in configs:
+        print(f"⏱️ {config.get('name', config)} 측정 중...")
+        results.append(run_config(config, corpus))
+    return {"environment": environment_info(), "results": results}
+
+def compare_with_baseline(report: Dict, baseline: Dict, tolerance: float = 0.02) -> List[str]:
+    """이전 결과 대비 품질이 tolerance 이상 떨어진 설정 목록"""
+    previous = {result["config"].get("name"): result for result in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        name = result["config"].get("name")
+        if name not in previous:
+            continue
+        for metric, value in result["quality"].items():
+            old_value = previous[name]["quality"].get(metric)
+            if old_value is not None and value < old_value - tolerance:
+                regressions.append(f"{name} {metric}: {old_value} → {value}")
+    return regressions
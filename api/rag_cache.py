@@ -0,0 +1,101 @@
+# backend/rag_cache.py
+# 질의 임베딩 / 검색 결과 LRU 캐시 (메모리 사용량 기준으로 제한)
+import re
+import sys
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+PUNCTUATION_EDGES_RE = re.compile(r"^[\s\W_]+|[\s\W_]+$")
+WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_query(query: str) -> str:
+    """거의 같은 질문이 같은 키가 되도록 정규화 (유니코드 NFKC, 소문자, 공백/앞뒤 문장부호 정리)"""
+    query = unicodedata.normalize("NFKC", query).lower()
+    query = WHITESPACE_RE.sub(" ", query)
+    return PUNCTUATION_EDGES_RE.sub("", query)
+
+def estimate_size(value: Any) -> int:
+    """캐시 항목의 대략적인 메모리 크기 (바이트)"""
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes) + 112
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+class MemoryBoundedLRU:
+    """전체 크기가 max_bytes를 넘으면 가장 오래 안 쓴 항목부터 제거하는 LRU 캐시"""
+
+    def __init__(self, name: str, max_bytes: int):
+        self.name = name
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, count_miss: bool = True) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                if count_miss:
+                    self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: Hashable, value: Any):
+        size = estimate_size(key) + estimate_size(value)
+        if size > self.max_bytes:
+            # 들어갈 수 없는 값이면 같은 키의 이전 값도 남기지 않음
+            self.pop(key)
+            return
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._items[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._items.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """항목 제거 (없으면 None)"""
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is None:
+                return None
+            self._bytes -= item[1]
+            return item[0]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+def copy_results(results: List[Dict]) -> List[Dict]:
+    """캐시된 결과를 호출자가 수정해도 캐시에 영향이 없도록 복사"""
+    return [dict(result) for result in results]
@@ -0,0 +1,89 @@
+# backend/rag_chunks.py
+# RAG 청크 분할 / 샤드 배정 헬퍼 (부작용 없는 순수 함수)
+#
+# rag_system을 import하면 전역 RAGSystem(임베딩 모델, ChromaDB 클라이언트)이 필요해지므로
+# 마이그레이션/벤치마크 도구는 이 모듈에서 가져다 씀
+import hashlib
+import re
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+SENTENCE_END_RE = re.compile(r"[.!?。](?=\s)|\n")
+
+def shard_name_for_room(room_id: str, shard_count: int) -> str:
+    """채팅방이 속한 공유 샤드 컬렉션 이름 (프로세스와 무관하게 항상 같은 값)"""
+    digest = hashlib.sha1(room_id.encode("utf-8")).hexdigest()
+    return f"rag_shard_{int(digest, 16) % shard_count}"
+
+def chunk_content_hash(text: str) -> str:
+    """청크 내용 해시 (청크 id와 chunk_hash 메타데이터에 사용)"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+def file_sha256(path: str) -> str:
+    """파일 내용 해시 (문서 식별용)"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while block := file.read(1024 * 1024):
+            sha.update(block)
+    return sha.hexdigest()
+
+def split_into_chunks(text: str, chunk_size: int = 500, overlap: int = 100) -> List[str]:
+    """페이지 텍스트를 문장 경계 기준으로 chunk_size 글자 이내의 조각으로 분할"""
+    text = text.strip()
+    if len(text) <= chunk_size:
+        return [text] if text else []
+    
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            # 조각 후반부에서 마지막 문장 경계를 찾아 자르기
+            boundaries = [m.end() for m in SENTENCE_END_RE.finditer(text, start + chunk_size // 2, end)]
+            if boundaries:
+                end = boundaries[-1]
+        piece = text[start:end].strip()
+        if piece:
+            chunks.append(piece)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+# 청크 메타데이터 중 내용 외에 바뀔 수 있는 값 (다시 올린 문서에서 이것만 다르면 메타데이터만 갱신)
+# room_id/doc_id는 id에 포함되고, 문서 전체 해시는 RoomDocument.content_hash에만 저장
+CHUNK_METADATA_KEYS = ("page", "chunk_hash")
+
+def document_chunks(room_id: str, doc_id: str, pages: Iterable[Dict], chunk_size: int = 500) -> Iterator[tuple]:
+    """페이지를 청크로 나누고 내용 해시 기반 id 부여 → (id, 본문, 메타데이터)
+
+    id = {room_id}_{doc_id}_{청크 내용 해시}_{같은 내용의 등장 순번}
+    내용이 같은 청크는 문서를 다시 올려도 같은 id가 되므로 재임베딩을 건너뛸 수 있음
+    """
+    occurrences: Dict[str, int] = {}
+    for page in pages:
+        for piece in split_into_chunks(page['text'], chunk_size):
+            chunk_hash = chunk_content_hash(piece)
+            occurrence = occurrences.get(chunk_hash, 0)
+            occurrences[chunk_hash] = occurrence + 1
+            # 공유 컬렉션에서도 구분되도록 room_id/doc_id 메타데이터 포함
+            yield (
+                f"{room_id}_{doc_id}_{chunk_hash}_{occurrence}",
+                piece,
+                {
+                    'page': page['page'],
+                    'room_id': room_id,
+                    'doc_id': doc_id,
+                    'chunk_hash': chunk_hash
+                }
+            )
+
+def classify_chunks(batch: List[tuple], existing_metadata: Dict[str, Dict]) -> Tuple[List[tuple], List[tuple], int]:
+    """새 청크 묶음을 저장된 청크와 비교 → (새로 임베딩할 청크, 메타데이터만 바뀐 청크, 그대로인 청크 수)"""
+    added, moved = [], []
+    for chunk in batch:
+        stored = existing_metadata.get(chunk[0])
+        if stored is None:
+            added.append(chunk)
+        elif any((stored or {}).get(key) != chunk[2][key] for key in CHUNK_METADATA_KEYS):
+            moved.append(chunk)
+    return added, moved, len(batch) - len(added) - len(moved)
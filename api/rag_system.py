@@ -1,120 +1,430 @@
 # backend/rag_system.py
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
 import PyPDF2
-from typing import List, Dict
+from typing import List, Dict, Optional, Iterable, Iterator, Tuple
+from chroma_client import create_chroma_client
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from rag_chunks import classify_chunks, document_chunks, file_sha256, shard_name_for_room
+from embedding_backends import EmbeddingBackend, create_embedding_backend
+from embedding_service import EmbeddingBatcher
+from rag_cache import MemoryBoundedLRU, copy_results, normalize_query
+from log_config import get_logger
+from metrics import rag_ingest_pages_per_second, rag_search_seconds
+from tracing import span
+import asyncio
+import hashlib
+import mmap
 import os
+import time
+import uuid
+
+# 저장 방식
+# - per_room: 채팅방마다 컬렉션 1개 (기존 방식)
+# - shared: 소수의 공유 샤드 컬렉션에 모든 청크 저장, 조회 시 room_id 메타데이터로 필터링
+STORAGE_MODES = ("per_room", "shared")
+
+# 검색 방식
+# - vector: 임베딩 유사도만 사용
+# - hybrid: BM25 역색인 결과와 벡터 결과를 RRF로 결합
+SEARCH_MODES = ("vector", "hybrid")
+
+rag_log = get_logger("rag")
 
 class RAGSystem:
     """ChromaDB 기반 RAG 시스템"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        storage_mode: Optional[str] = None,
+        shard_count: Optional[int] = None,
+        client=None,
+        search_mode: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        embedder: Optional[EmbeddingBackend] = None
+    ):
+        self.storage_mode = storage_mode or os.getenv("RAG_STORAGE_MODE", "per_room")
+        if self.storage_mode not in STORAGE_MODES:
+            raise ValueError(f"지원하지 않는 저장 방식: {self.storage_mode}")
+        self.shard_count = shard_count or int(os.getenv("RAG_SHARD_COUNT", "8"))
+        self.search_mode = search_mode or os.getenv("RAG_SEARCH_MODE", "hybrid")
+        if self.search_mode not in SEARCH_MODES:
+            raise ValueError(f"지원하지 않는 검색 방식: {self.search_mode}")
+        self.chunk_size = chunk_size or int(os.getenv("RAG_CHUNK_SIZE", "500"))
+        # 한 번에 임베딩/저장하는 청크 수 (대용량 PDF에서도 메모리 사용량이 이 값에 비례)
+        self.ingest_batch_size = int(os.getenv("RAG_INGEST_BATCH", "64"))
+        
         # ChromaDB 클라이언트 초기화
-        self.client = chromadb.Client(Settings(
-            persist_directory="./chroma_db",
-            anonymized_telemetry=False
-        ))
+        self.client = client or create_chroma_client()
         
-        # 임베딩 모델 초기화
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        # 임베딩 백엔드 초기화 (EMBEDDING_BACKEND / EMBEDDING_MODEL 등으로 선택)
+        self.embedder = embedder or create_embedding_backend()
+        # 모델마다 벡터 공간이 다르므로 기본 모델이 아니면 컬렉션 이름에 태그를 붙임
+        tag = self.embedder.spec.get("tag", "")
+        self.collection_suffix = f"__{tag}" if tag else ""
+        # 동시 요청의 질의 임베딩을 모아서 계산 (asearch에서 사용)
+        self.query_batcher = EmbeddingBatcher(self.embedder)
         
-        print("✅ RAG 시스템 초기화 완료")
+        # 질의 임베딩 / 검색 결과 캐시
+        # 검색 결과 키에는 채팅방 문서 구성의 지문이 들어가므로, 같은 PDF를 쓰는 채팅방끼리 결과를 공유하고
+        # 문서가 바뀌면 지문이 달라져 이전 항목은 자연스럽게 무효화됨
+        self.embedding_cache = MemoryBoundedLRU("query_embedding", int(float(os.getenv("RAG_EMBEDDING_CACHE_MB", "32")) * 1024 * 1024))
+        self.result_cache = MemoryBoundedLRU("search_result", int(float(os.getenv("RAG_RESULT_CACHE_MB", "64")) * 1024 * 1024))
+        # room_id → (지문, 청크 수): 검색마다 채팅방 청크 전체를 훑지 않도록 함께 보관 (문서 변경 시 invalidate_room)
+        self._room_states: Dict[str, Tuple[str, int]] = {}
+        
+        # 키워드 검색용 역색인 (업로드 시 구축, 재시작 후에는 첫 검색 때 ChromaDB에서 복원)
+        self.lexical_index = LexicalIndex()
+        
+        rag_log.info(f"✅ RAG 시스템 초기화 완료 (저장 방식: {self.storage_mode}, 임베딩: {self.embedder.name})")
+    
+    def collection_name(self, room_id: str) -> str:
+        """채팅방 데이터가 저장되는 컬렉션 이름"""
+        if self.storage_mode == "shared":
+            return shard_name_for_room(room_id, self.shard_count) + self.collection_suffix
+        return f"room_{room_id}" + self.collection_suffix
+    
+    def room_filter(self, room_id: str) -> Optional[Dict]:
+        """공유 컬렉션에서 채팅방 청크만 고르는 where 필터"""
+        if self.storage_mode == "shared":
+            return {"room_id": room_id}
+        return None
+    
+    def document_filter(self, room_id: str, doc_id: str) -> Dict:
+        """채팅방의 특정 문서 청크만 고르는 where 필터"""
+        if self.storage_mode == "shared":
+            return {"$and": [{"room_id": room_id}, {"doc_id": doc_id}]}
+        return {"doc_id": doc_id}
     
     def get_or_create_collection(self, room_id: str):
         """채팅방별 컬렉션 가져오기/생성"""
-        collection_name = f"room_{room_id}"
+        collection_name = self.collection_name(room_id)
         try:
-            collection = self.client.get_collection(collection_name)
+            collection = self.client.get_collection(collection_name, embedding_function=None)
         except:
-            collection = self.client.create_collection(collection_name)
+            # 임베딩은 self.embedder로 직접 계산해서 넣으므로 ChromaDB 기본 임베딩 함수는 사용하지 않음
+            collection = self.client.create_collection(collection_name, embedding_function=None)
         return collection
     
-    def extract_text_from_pdf(self, pdf_path: str) -> List[Dict[str, str]]:
-        """PDF에서 텍스트 추출 (페이지별)"""
-        chunks = []
+    def count_room_chunks(self, room_id: str, limit: Optional[int] = None) -> int:
+        """채팅방에 저장된 청크 수"""
+        collection = self.get_or_create_collection(room_id)
+        where = self.room_filter(room_id)
+        if where is None:
+            return collection.count()
+        result = collection.get(where=where, limit=limit, include=[])
+        return len(result['ids'])
+    
+    def room_state(self, room_id: str) -> Tuple[str, int]:
+        """채팅방 문서 구성의 지문(청크 내용 해시 목록 + 청크 크기 + 임베딩 모델)과 청크 수
+
+        메타데이터를 한 번 읽어 둘 다 계산하고 보관합니다.
+        청크가 없는 채팅방은 보관하지 않음 (다른 워커가 업로드했을 수 있으므로 다음 검색 때 다시 확인)
+        """
+        state = self._room_states.get(room_id)
+        if state is not None:
+            return state
         
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
+        collection = self.get_or_create_collection(room_id)
+        stored = collection.get(where=self.room_filter(room_id), include=["metadatas"])
+        # 같은 내용의 문서를 올린 채팅방끼리는 같은 지문 (청크가 하나라도 추가/삭제되면 바뀜)
+        chunk_hashes = sorted((metadata or {}).get('chunk_hash') or 'legacy' for metadata in stored['metadatas'] or [])
+        parts = chunk_hashes + [str(self.chunk_size), self.collection_suffix]
+        if 'legacy' in chunk_hashes:
+            # 내용 해시가 없는 예전 청크는 다른 채팅방과 결과를 공유하지 않음
+            parts.append(room_id)
+        state = (hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest(), len(stored['ids']))
+        if state[1] > 0:
+            self._room_states[room_id] = state
+        return state
+    
+    def room_fingerprint(self, room_id: str) -> str:
+        return self.room_state(room_id)[0]
+    
+    def invalidate_room(self, room_id: str):
+        """채팅방 문서가 바뀌었을 때 호출 (지문/청크 수를 다시 계산하게 함)"""
+        self._room_states.pop(room_id, None)
+    
+    def forget_room(self, room_id: str):
+        """채팅방 삭제 시 호출 (이 프로세스 메모리에 있는 역색인/지문 정리)"""
+        self.lexical_index.drop_room(room_id)
+        self.invalidate_room(room_id)
+    
+    def _result_cache_key(self, room_id: str, query: str, n_results: int, mode: str, compute: bool = True):
+        if not compute and room_id not in self._room_states:
+            return None
+        return (self.room_fingerprint(room_id), mode, n_results, normalize_query(query))
+    
+    def _embedding_cache_key(self, query: str):
+        return (self.embedder.model_key, normalize_query(query))
+    
+    def embed_query(self, query: str):
+        """질의 임베딩 (캐시 사용, 동기 호출용)"""
+        embedding_key = self._embedding_cache_key(query)
+        query_embedding = self.embedding_cache.get(embedding_key)
+        if query_embedding is None:
+            query_embedding = self.embedder.encode_query(query)
+            self.embedding_cache.put(embedding_key, query_embedding)
+        return query_embedding
+    
+    def cache_stats(self) -> Dict:
+        """캐시 적중/실패 통계"""
+        return {
+            "query_embedding": self.embedding_cache.stats(),
+            "search_result": self.result_cache.stats(),
+            "query_batcher": dict(self.query_batcher.stats),
+            "rooms_fingerprinted": len(self._room_states),
+            "lexical_index": self.lexical_index.stats(),
+        }
+    
+    def iter_pdf_pages(self, pdf_path: str) -> Iterator[Dict]:
+        """PDF 페이지를 하나씩 추출 (파일은 메모리 맵으로 읽어 전체를 메모리에 올리지 않음)"""
+        with open(pdf_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            pdf_reader = PyPDF2.PdfReader(mapped)
             
-            for page_num, page in enumerate(pdf_reader.pages):
-                text = page.extract_text()
+            for page_num in range(len(pdf_reader.pages)):
+                text = pdf_reader.pages[page_num].extract_text() or ""
                 
                 if text.strip():
-                    chunks.append({
+                    yield {
                         'text': text,
                         'page': page_num + 1,
                         'metadata': f'Page {page_num + 1}'
-                    })
-        
-        print(f"📄 PDF에서 {len(chunks)}개 페이지 추출 완료")
+                    }
+    
+    def extract_text_from_pdf(self, pdf_path: str) -> List[Dict[str, str]]:
+        """PDF에서 텍스트 추출 (페이지별)"""
+        chunks = list(self.iter_pdf_pages(pdf_path))
+        rag_log.info(f"📄 PDF에서 {len(chunks)}개 페이지 추출 완료")
         return chunks
     
-    def add_pdf_to_collection(self, room_id: str, pdf_path: str) -> bool:
-        """PDF 내용을 ChromaDB에 저장"""
+    def iter_document_chunks(self, room_id: str, doc_id: str, pages: Iterable[Dict]) -> Iterator[tuple]:
+        """페이지를 청크로 나누고 내용 해시 기반 id 부여 → (id, 본문, 메타데이터)"""
+        return document_chunks(room_id, doc_id, pages, self.chunk_size)
+    
+    def index_document(
+        self,
+        room_id: str,
+        doc_id: str,
+        pdf_path: Optional[str] = None,
+        doc_hash: Optional[str] = None,
+        pages: Optional[Iterable[Dict]] = None
+    ) -> Optional[Dict]:
+        """문서 추가/교체 (바뀐 청크만 임베딩, 사라진 청크만 삭제)
+
+        페이지를 하나씩 읽어 ingest_batch_size개 청크 단위로 임베딩/저장하므로
+        파일 크기와 관계없이 메모리 사용량이 일정합니다.
+        pdf_path 대신 이미 추출된 pages(페이지 dict 목록)를 넘길 수도 있습니다.
+        성공하면 처리 통계를, 실패하면 None을 반환
+        """
+        started = time.perf_counter()
         try:
             collection = self.get_or_create_collection(room_id)
+            if pages is None:
+                pages = self.iter_pdf_pages(pdf_path)
+            if doc_hash is None:
+                doc_hash = file_sha256(pdf_path) if pdf_path else "pages"
             
-            # PDF 텍스트 추출
-            chunks = self.extract_text_from_pdf(pdf_path)
+            # 이미 저장된 같은 문서의 청크 (메타데이터만 가져오므로 작음)
+            with span("rag.load_existing"):
+                existing = collection.get(where=self.document_filter(room_id, doc_id), include=["metadatas"])
+            existing_metadata = dict(zip(existing['ids'], existing['metadatas'] or []))
             
-            if not chunks:
-                print("❌ PDF에서 텍스트를 추출할 수 없습니다")
-                return False
+            stats = {"doc_hash": doc_hash, "pages": 0, "chunks": 0, "added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+            seen_ids = set()
+            seen_pages = set()
+            batch = []
             
-            # ChromaDB에 저장
-            for i, chunk in enumerate(chunks):
-                collection.add(
-                    documents=[chunk['text']],
-                    metadatas=[{'page': chunk['page']}],
-                    ids=[f"{room_id}_page_{chunk['page']}"]
-                )
+            def flush(batch):
+                added, moved, unchanged = classify_chunks(batch, existing_metadata)
+                
+                if added:
+                    embeddings = self.embedder.encode([chunk[1] for chunk in added], kind="passage")
+                    collection.add(
+                        ids=[chunk[0] for chunk in added],
+                        documents=[chunk[1] for chunk in added],
+                        metadatas=[chunk[2] for chunk in added],
+                        embeddings=embeddings.tolist()
+                    )
+                if moved:
+                    collection.update(ids=[chunk[0] for chunk in moved], metadatas=[chunk[2] for chunk in moved])
+                
+                # 역색인은 전체를 다시 만들지 않고 바뀐 청크만 반영 (메모리에 없는 채팅방은 다음 검색 때 구축)
+                changed = added + moved
+                if changed:
+                    self.lexical_index.update(room_id, [c[0] for c in changed], [c[1] for c in changed], [c[2] for c in changed])
+                
+                stats["added"] += len(added)
+                stats["updated"] += len(moved)
+                stats["unchanged"] += unchanged
             
-            print(f"✅ {len(chunks)}개 청크를 ChromaDB에 저장 완료")
-            return True
+            for chunk in self.iter_document_chunks(room_id, doc_id, pages):
+                seen_ids.add(chunk[0])
+                seen_pages.add(chunk[2]['page'])
+                batch.append(chunk)
+                if len(batch) >= self.ingest_batch_size:
+                    with span("rag.embed_batch", chunks=len(batch)):
+                        flush(batch)
+                    batch = []
+            if batch:
+                with span("rag.embed_batch", chunks=len(batch)):
+                    flush(batch)
+            
+            if not seen_ids:
+                rag_log.error("❌ PDF에서 텍스트를 추출할 수 없습니다", extra={"room_id": room_id, "doc_id": doc_id})
+                return None
+            
+            # 새 버전에 없는 청크 삭제
+            removed = [chunk_id for chunk_id in existing_metadata if chunk_id not in seen_ids]
+            if removed:
+                collection.delete(ids=removed)
+                self.lexical_index.remove(room_id, removed)
+            self.invalidate_room(room_id)
+            
+            stats["pages"] = len(seen_pages)
+            stats["chunks"] = len(seen_ids)
+            stats["removed"] = len(removed)
+            elapsed = time.perf_counter() - started
+            if elapsed > 0:
+                rag_ingest_pages_per_second.observe(stats["pages"] / elapsed)
+            rag_log.info(f"✅ 문서 색인 완료 (doc: {doc_id}): {stats}", extra={"room_id": room_id, "doc_id": doc_id})
+            return stats
             
         except Exception as e:
-            print(f"❌ PDF 저장 오류: {e}")
-            return False
+            rag_log.error(f"❌ PDF 저장 오류: {e}", extra={"room_id": room_id, "doc_id": doc_id})
+            return None
+    
+    def remove_document(self, room_id: str, doc_id: str) -> int:
+        """문서의 모든 청크 삭제 후 삭제된 청크 수 반환"""
+        collection = self.get_or_create_collection(room_id)
+        existing = collection.get(where=self.document_filter(room_id, doc_id), include=[])
+        if existing['ids']:
+            collection.delete(ids=existing['ids'])
+            self.lexical_index.remove(room_id, existing['ids'])
+        self.invalidate_room(room_id)
+        rag_log.info(f"🗑️ 문서 삭제 (doc: {doc_id}): {len(existing['ids'])}개 청크", extra={"room_id": room_id, "doc_id": doc_id})
+        return len(existing['ids'])
+    
+    def add_pdf_to_collection(self, room_id: str, pdf_path: str) -> bool:
+        """PDF 내용을 ChromaDB에 저장 (새 문서로 추가)"""
+        return self.index_document(room_id, str(uuid.uuid4()), pdf_path) is not None
     
-    def search(self, room_id: str, query: str, n_results: int = 3) -> List[Dict]:
+    def _ensure_lexical_index(self, room_id: str, collection):
+        """역색인이 없으면 ChromaDB에 저장된 청크로 다시 구축"""
+        if self.lexical_index.has_room(room_id):
+            return
+        stored = collection.get(where=self.room_filter(room_id), include=["documents", "metadatas"])
+        self.lexical_index.add(room_id, stored['ids'], stored['documents'], stored['metadatas'])
+    
+    async def asearch(self, room_id: str, query: str, n_results: int = 3, mode: Optional[str] = None) -> List[Dict]:
+        """비동기 검색 (질의 임베딩은 다른 요청과 배치로 계산, ChromaDB 조회는 스레드에서 실행)"""
+        mode = mode or self.search_mode
+        # 지문이 이미 계산된 채팅방이면 이벤트 루프에서 바로 캐시 확인
+        key = self._result_cache_key(room_id, query, n_results, mode, compute=False)
+        if key is not None:
+            # 실패는 search()에서 다시 확인할 때 한 번만 집계
+            cached = self.result_cache.get(key, count_miss=False)
+            if cached is not None:
+                return copy_results(cached)
+        
+        try:
+            embedding_key = self._embedding_cache_key(query)
+            query_embedding = self.embedding_cache.get(embedding_key)
+            if query_embedding is None:
+                query_embedding = await self.query_batcher.encode_query(query)
+                self.embedding_cache.put(embedding_key, query_embedding)
+        except Exception as e:
+            rag_log.error(f"❌ 질의 임베딩 오류: {e}")
+            return []
+        # to_thread는 로그/메트릭 컨텍스트(room_id, phase)를 스레드로 넘겨줌
+        return await asyncio.to_thread(self.search, room_id, query, n_results, mode, query_embedding)
+    
+    def search(self, room_id: str, query: str, n_results: int = 3, mode: Optional[str] = None, query_embedding=None) -> List[Dict]:
         """질문과 관련된 내용 검색"""
+        mode = mode or self.search_mode
+        with rag_search_seconds.time(mode=mode):
+            return self._search(room_id, query, n_results, mode, query_embedding)
+    
+    def _search(self, room_id: str, query: str, n_results: int, mode: str, query_embedding=None) -> List[Dict]:
         try:
-            collection = self.get_or_create_collection(room_id)
-            
-            # 컬렉션이 비어있는지 확인
-            if collection.count() == 0:
+            # 보관된 지문/청크 수가 있으면 ChromaDB를 읽지 않고 바로 캐시 확인
+            fingerprint, room_count = self.room_state(room_id)
+            if room_count == 0:
                 return []
             
+            key = (fingerprint, mode, n_results, normalize_query(query))
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return copy_results(cached)
+            
+            if query_embedding is None:
+                query_embedding = self.embed_query(query)
+            
+            collection = self.get_or_create_collection(room_id)
+            # 결합 전에 각 방식에서 후보를 넉넉히 가져옴
+            candidates = n_results if mode == "vector" else max(n_results * 4, 10)
             results = collection.query(
-                query_texts=[query],
-                n_results=n_results
+                query_embeddings=[query_embedding.tolist()],
+                n_results=min(candidates, room_count),
+                where=self.room_filter(room_id)
             )
             
-            # 결과 포맷팅
-            contexts = []
+            found = {}
+            vector_ranking = []
             if results['documents'] and results['documents'][0]:
                 for i, doc in enumerate(results['documents'][0]):
+                    chunk_id = results['ids'][0][i]
                     metadata = results['metadatas'][0][i] if results['metadatas'] else {}
-                    contexts.append({
-                        'content': doc,
-                        'page': metadata.get('page', 'Unknown')
-                    })
+                    found[chunk_id] = (doc, metadata)
+                    vector_ranking.append(chunk_id)
+            
+            if mode == "hybrid":
+                self._ensure_lexical_index(room_id, collection)
+                lexical_ranking = []
+                for chunk_id, _ in self.lexical_index.search(room_id, query, candidates):
+                    stored = self.lexical_index.get(room_id, chunk_id)
+                    if stored is not None:
+                        found.setdefault(chunk_id, stored)
+                        lexical_ranking.append(chunk_id)
+                ranking = [chunk_id for chunk_id, _ in reciprocal_rank_fusion([vector_ranking, lexical_ranking])]
+            else:
+                ranking = vector_ranking
             
-            print(f"🔍 {len(contexts)}개 관련 내용 검색됨")
+            # 결과 포맷팅
+            contexts = []
+            for chunk_id in ranking[:n_results]:
+                doc, metadata = found[chunk_id]
+                contexts.append({
+                    'content': doc,
+                    'page': (metadata or {}).get('page', 'Unknown')
+                })
+            
+            self.result_cache.put(key, copy_results(contexts))
+            rag_log.info(f"🔍 {len(contexts)}개 관련 내용 검색됨 ({mode})")
             return contexts
             
         except Exception as e:
-            print(f"❌ 검색 오류: {e}")
+            rag_log.error(f"❌ 검색 오류: {e}")
             return []
     
     def has_pdf(self, room_id: str) -> bool:
         """채팅방에 PDF가 업로드되어 있는지 확인"""
+        if room_id in self._room_states:
+            return True
         try:
-            collection = self.get_or_create_collection(room_id)
-            return collection.count() > 0
+            return self.count_room_chunks(room_id, limit=1) > 0
         except:
             return False
 
-# 전역 인스턴스
-rag_system = RAGSystem()
\ No newline at end of file
+# 전역 인스턴스 (처음 사용할 때 생성: RAGSystem 클래스만 가져가는 도구는 모델을 로드하지 않음)
+_rag_system: Optional[RAGSystem] = None
+
+def get_rag_system() -> RAGSystem:
+    global _rag_system
+    if _rag_system is None:
+        _rag_system = RAGSystem()
+    return _rag_system
+
+def __getattr__(name: str):
+    # from rag_system import rag_system 은 여기서 처리됨
+    if name == "rag_system":
+        return get_rag_system()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,225 @@
+# backend/rate_limit.py
+# 요청 제한과 생성 공정 분배
+#
+# - 토큰 버킷: 채팅방별/클라이언트 IP별로 WebSocket 메시지와 무거운 REST 요청(PDF 업로드 등)을 제한
+#   설정 형식은 "횟수/초" (예: RATE_LIMIT_WS_ROOM="6/60" → 60초에 6개, 순간 최대 6개), "0"(또는 "0/60")이면 끔
+#   형식이 틀리면 서버 시작 시 ValueError
+#   버킷은 서버 프로세스마다 따로 있음: nginx는 채팅방 해시로 라우팅하므로 채팅방 한도는 워커 하나에만 쌓이지만,
+#   IP 한도는 한 클라이언트의 요청이 여러 워커로 나뉘므로 cluster.py 워커 수(CLUSTER_WORKERS)로 나눠 워커마다 적용
+#   (한 방만 쓰는 클라이언트는 설정값의 1/워커 수까지만 받을 수 있음, 여러 방에 고르게 보내면 전체가 설정값)
+# - 공정 분배: CPU에서 도는 Ollama를 반 전체가 공유하므로, 생성 호출은 OLLAMA_CONCURRENCY개까지만 동시에 보내고
+#   기다리는 호출은 채팅방 단위로 돌아가며 처리 (메시지를 많이 보낸 방이 다른 방의 차례를 가져가지 않음)
+#   스케줄러는 서버 프로세스마다 따로 있으므로 cluster.py로 워커 N개를 띄우면 OLLAMA_CONCURRENCY를 워커 수로 나눠
+#   (최소 1) 각 워커에 배정합니다. 워커 수보다 작게 설정하면 실제 동시 호출은 워커 수만큼이 됩니다.
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import ExitStack, asynccontextmanager
+from typing import Deque, Dict, Iterable, Optional, Tuple
+
+from metrics import metrics
+from tracing import tracer
+
+# 앞단 nginx(deploy/nginx.conf)를 거칠 때만 켬 (직접 노출된 서버에서는 헤더를 위조할 수 있음)
+TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "0").lower() in ("1", "true", "yes")
+
+rate_limited_total = metrics.counter("feynman_rate_limited_total", "제한으로 거부된 요청 수", ("limiter",))
+generation_queue_seconds = metrics.histogram("feynman_generation_queue_seconds", "생성 슬롯 대기 시간")
+
+def parse_rate(spec: Optional[str]) -> Optional[Tuple[float, float]]:
+    """"6/60" → (초당 0.1개, 버스트 6) / "0", "0/60" 또는 빈 값 → None(제한 없음)"""
+    if not spec or not spec.strip():
+        return None
+    count, separator, seconds = spec.strip().partition("/")
+    try:
+        count = float(count)
+        seconds = float(seconds) if separator else 1.0
+    except ValueError:
+        raise ValueError(f"제한 설정 형식 오류: {spec!r} (\"횟수/초\", 예: \"6/60\", 끄려면 \"0\")") from None
+    if not (math.isfinite(count) and math.isfinite(seconds)) or count < 0 or seconds <= 0:
+        raise ValueError(f"제한 설정 값 오류: {spec!r} (횟수는 0 이상, 초는 0보다 커야 함)")
+    if count == 0:
+        return None
+    return count / seconds, count
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, cost: float = 1.0) -> float:
+        """토큰을 꺼내지 않고 확인 (충분하면 0, 부족하면 다시 시도할 수 있을 때까지의 초)"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def take(self, cost: float = 1.0) -> float:
+        """토큰을 꺼냄 (성공하면 0, 부족하면 다시 시도할 수 있을 때까지의 초)"""
+        retry_after = self.wait_time(cost)
+        if not retry_after:
+            self.tokens -= cost
+        return retry_after
+
+class RateLimiter:
+    """키(room_id, IP 등)별 토큰 버킷 (오래 안 쓴 키부터 제거)"""
+
+    def __init__(self, name: str, spec: Optional[str], max_keys: int = 10000, shards: int = 1):
+        self.name = name
+        try:
+            self.limit = parse_rate(spec)
+        except ValueError as e:
+            raise ValueError(f"{name}: {e}") from None
+        if self.limit is not None and shards > 1:
+            # 같은 키의 요청이 여러 워커로 나뉘어 들어오면 워커마다 한도의 1/shards만 허용 (버스트는 최소 1)
+            rate, capacity = self.limit
+            self.limit = (rate / shards, max(1.0, capacity / shards))
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit is not None
+
+    def _bucket(self, key: str) -> TokenBucket:
+        # _lock을 잡은 상태에서 호출
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(*self.limit)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def check(self, key: str, cost: float = 1.0) -> float:
+        """제한 확인 (허용되면 0, 거부되면 retry_after 초)"""
+        return check_all([(self, key)], cost)[1]
+
+def check_all(checks: Iterable[Tuple[RateLimiter, str]], cost: float = 1.0) -> Tuple[Optional[RateLimiter], float]:
+    """여러 제한(IP별 + 채팅방별 등)을 함께 확인
+
+    모두 허용될 때만 모든 버킷에서 꺼내므로, 하나가 거부하면 다른 버킷도 소모되지 않음
+    (채팅방 제한에 걸린 메시지가 IP 한도를 깎지 않음). 허용되면 (None, 0), 거부되면 (거부한 제한기, retry_after 초)
+    """
+    checks = [(limiter, key) for limiter, key in checks if limiter.enabled]
+    rejected = None
+    with ExitStack() as stack:
+        # 항상 넘겨받은 순서대로 잠금
+        for limiter, _ in checks:
+            stack.enter_context(limiter._lock)
+        buckets = [limiter._bucket(key) for limiter, key in checks]
+        for (limiter, _), bucket in zip(checks, buckets):
+            retry_after = bucket.wait_time(cost)
+            if retry_after:
+                rejected = (limiter, retry_after)
+                break
+        else:
+            for bucket in buckets:
+                bucket.tokens -= cost
+    if rejected:
+        rate_limited_total.inc(limiter=rejected[0].name)
+        return rejected
+    return None, 0.0
+
+class FairShareScheduler:
+    """생성 호출 슬롯 (동시 capacity개, 대기 중인 호출은 채팅방 라운드 로빈으로 배정)"""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.running = 0
+        self._waiting: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self.granted: Dict[str, int] = {}
+
+    def _has_waiters(self) -> bool:
+        return any(self._waiting.values())
+
+    @asynccontextmanager
+    async def slot(self, room_id: str):
+        """생성 호출 하나를 감쌈 (차례가 올 때까지 대기)"""
+        started = time.perf_counter()
+        if self.running < self.capacity and not self._has_waiters():
+            self.running += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._waiting.setdefault(room_id, deque()).append(future)
+            try:
+                await future
+            except asyncio.CancelledError:
+                # 배정된 직후 취소되었으면 슬롯을 돌려줌
+                if future.done() and not future.cancelled():
+                    self._release()
+                raise
+        waited = time.perf_counter() - started
+        generation_queue_seconds.observe(waited)
+        tracer.record_span("ollama.queue", started, started + waited)
+        self.granted[room_id] = self.granted.get(room_id, 0) + 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        self.running -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """빈 슬롯을 맨 앞 채팅방의 가장 오래 기다린 호출에 주고, 그 방은 맨 뒤로 보냄"""
+        while self.running < self.capacity and self._waiting:
+            room_id, queue = next(iter(self._waiting.items()))
+            future = queue.popleft()
+            if queue:
+                self._waiting.move_to_end(room_id)
+            else:
+                del self._waiting[room_id]
+            if future.cancelled():
+                continue
+            self.running += 1
+            future.set_result(None)
+
+    def stats(self) -> Dict:
+        return {
+            "capacity": self.capacity,
+            "running": self.running,
+            "waiting": {room_id: len(queue) for room_id, queue in self._waiting.items() if queue},
+            "granted": dict(sorted(self.granted.items(), key=lambda item: -item[1])[:20]),
+        }
+
+def client_ip(headers, client) -> str:
+    """클라이언트 IP (RATE_LIMIT_TRUST_PROXY=1이면 앞단 nginx가 넣은 X-Real-IP)
+
+    X-Forwarded-For는 클라이언트가 보낸 값 뒤에 덧붙는 형식이라 첫 주소를 위조할 수 있으므로 쓰지 않음
+    """
+    if TRUST_PROXY:
+        real_ip = headers.get("x-real-ip")
+        if real_ip:
+            return real_ip.strip()
+    return client.host if client else "unknown"
+
+def cluster_workers() -> int:
+    """cluster.py로 띄운 서버 워커 수 (단일 프로세스면 1)"""
+    return max(1, int(os.getenv("CLUSTER_WORKERS", "1")))
+
+def worker_concurrency() -> int:
+    """이 서버 프로세스의 생성 슬롯 수 (OLLAMA_CONCURRENCY를 cluster.py 워커 수(CLUSTER_WORKERS)로 나눔, 최소 1)"""
+    total = int(os.getenv("OLLAMA_CONCURRENCY", "1"))
+    return max(1, total // cluster_workers())
+
+# WebSocket 메시지 (생성 한 번 = DB 커밋 + RAG 검색 + Ollama 생성)
+ws_room_limiter = RateLimiter("ws_room", os.getenv("RATE_LIMIT_WS_ROOM", "6/60"))
+ws_ip_limiter = RateLimiter("ws_ip", os.getenv("RATE_LIMIT_WS_IP", "20/60"), shards=cluster_workers())
+# PDF 업로드 (페이지 추출 + 임베딩)
+upload_room_limiter = RateLimiter("upload_room", os.getenv("RATE_LIMIT_UPLOAD_ROOM", "5/600"))
+upload_ip_limiter = RateLimiter("upload_ip", os.getenv("RATE_LIMIT_UPLOAD_IP", "10/600"), shards=cluster_workers())
+
+generation_scheduler = FairShareScheduler(worker_concurrency())
@@ -0,0 +1,32 @@
+# backend/rescore_worker.py
+# 재채점 프로세스 풀 워커 쪽 코드
+#
+# 풀은 spawn으로 시작하므로 워커는 메인 모듈(batch_evaluation.py)과 이 모듈을 새로 가져옵니다.
+# (서버/DB/RAG 모듈을 가져오지 않도록 채점에 필요한 것만 import)
+import signal
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from embedding_backends import create_embedding_backend
+from evaluation_system import ANALYSIS_VERSION, evaluator
+
+def init_worker():
+    """워커 프로세스 초기화"""
+    # Ctrl+C는 부모 프로세스만 처리 (마지막 체크포인트까지 기록된 상태로 풀 종료)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # 실시간 채점과 같은 임베딩 모델로 점수 계산 (임베딩이 없으면 휴리스틱 점수가 되어 비교할 수 없음)
+    # cluster.py 환경(EMBEDDING_BACKEND=remote)에서는 워커마다 모델을 올리지 않고 사이드카를 공유
+    evaluator.use_embedder(create_embedding_backend())
+
+def analyze_rows(rows: List[Tuple[str, str, List[str]]]) -> List[Dict]:
+    """(message_id, content, references) 목록 채점"""
+    analyzed_at = datetime.utcnow()
+    return [
+        {
+            "id": message_id,
+            "analysis": evaluator.compact_analysis(evaluator.analyze_explanation(content or "", references)),
+            "analysis_version": ANALYSIS_VERSION,
+            "analyzed_at": analyzed_at,
+        }
+        for message_id, content, references in rows
+    ]
@@ -1,7 +1,7 @@
 # backend/reset_db.py
 from sqlalchemy import create_engine
 from database import Base, DATABASE_URL
-from models import ChatRoom, Message
+from models import ChatRoom, Message, RoomDocument, LearningEvaluation
 
 # 엔진 생성
 engine = create_engine(DATABASE_URL)
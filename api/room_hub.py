@@ -0,0 +1,166 @@
+# backend/room_hub.py
+# 채팅방별 WebSocket 구독 허브: 생성 한 번의 이벤트를 같은 방의 모든 연결(휴대폰, 태블릿, 교사 화면)에 전달
+import asyncio
+import os
+from typing import Callable, Dict, Optional, Set
+
+from fastapi import WebSocket
+
+from log_config import get_logger
+from metrics import ws_connections, ws_frames_sent_total
+from serialization import ENCODING_JSON, encode_event, send_frame
+
+# 구독자별 대기 이벤트 수 상한 (넘치면 느린 구독자로 보고 연결을 끊음)
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("WS_SUBSCRIBER_QUEUE", "256"))
+
+SUBSCRIBER_ROLES = ("participant", "viewer")
+
+hub_log = get_logger("hub")
+
+class Subscriber:
+    """WebSocket 연결 하나 (전송은 전용 태스크가 큐에서 꺼내 순서대로 보냄, 큐에는 직렬화된 프레임)"""
+
+    def __init__(self, room_id: str, websocket: WebSocket, role: str = "participant",
+                 encoding: str = ENCODING_JSON, queue_size: int = SUBSCRIBER_QUEUE_SIZE,
+                 on_overflow: Optional[Callable[["Subscriber"], None]] = None):
+        self.room_id = room_id
+        self.websocket = websocket
+        self.role = role
+        self.encoding = encoding
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+        # 큐가 넘쳤을 때 호출 (허브가 느린 구독자로 보고 연결을 끊음)
+        self.on_overflow = on_overflow
+        self._sender = asyncio.create_task(self._send_loop())
+
+    def offer(self, frame) -> bool:
+        """직렬화된 프레임을 큐에 넣음 (막히지 않음, 큐가 가득 차면 False)"""
+        if self.dropped:
+            return False
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def send(self, event: Dict):
+        """이 연결에만 보내는 이벤트 (오류 응답, 이어받기 등, 큐가 넘치면 publish와 같이 연결을 끊음)"""
+        if self.offer(encode_event(event, self.encoding)):
+            ws_frames_sent_total.inc(phase=event.get("phase"), type=event.get("type"))
+        elif not self.dropped and self.on_overflow is not None:
+            self.on_overflow(self)
+
+    async def _send_loop(self):
+        try:
+            while True:
+                frame = await self.queue.get()
+                await send_frame(self.websocket, frame)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # 연결이 끊긴 경우 (수신 루프에서 정리됨)
+            self.dropped = True
+
+    async def close(self, code: Optional[int] = None):
+        self._sender.cancel()
+        if code is not None:
+            try:
+                await self.websocket.close(code=code)
+            except Exception:
+                pass
+
+class RoomHub:
+    """room_id → 구독자 집합 (프로세스 내 pub/sub)
+
+    - publish는 각 구독자 큐에 넣기만 하므로 느린 연결이 생성 루프를 늦추지 않음
+    - 이벤트는 인코딩(JSON/msgpack)별로 한 번만 직렬화해 모든 구독자가 같은 프레임을 공유
+    - 큐가 넘친 구독자는 잘라내고 연결을 닫음 (재접속 후 이어받기)
+    - 방마다 생성 잠금을 두어 여러 기기에서 동시에 보내도 생성은 한 번에 하나씩
+      (잠금을 받아 간 연결 수를 세어 마지막 연결이 돌려줄 때 정리, 구독 해제 시점과 무관)
+    """
+
+    def __init__(self):
+        self.rooms: Dict[str, Set[Subscriber]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._lock_refs: Dict[str, int] = {}
+        self.stats = {"published": 0, "delivered": 0, "dropped_subscribers": 0}
+
+    def subscribe(self, room_id: str, websocket: WebSocket, role: str = "participant",
+                  encoding: str = ENCODING_JSON) -> Subscriber:
+        if role not in SUBSCRIBER_ROLES:
+            raise ValueError(f"지원하지 않는 구독 역할: {role}")
+        subscriber = Subscriber(room_id, websocket, role, encoding, on_overflow=self._drop_slow)
+        self.rooms.setdefault(room_id, set()).add(subscriber)
+        ws_connections.inc(role=role)
+        return subscriber
+
+    async def unsubscribe(self, subscriber: Subscriber, code: Optional[int] = None):
+        subscribers = self.rooms.get(subscriber.room_id)
+        if subscribers is not None and subscriber in subscribers:
+            subscribers.discard(subscriber)
+            ws_connections.dec(role=subscriber.role)
+            if not subscribers:
+                del self.rooms[subscriber.room_id]
+        await subscriber.close(code)
+
+    def _drop_slow(self, subscriber: Subscriber):
+        """느린 구독자: 이벤트를 건너뛰면 스트림이 깨지므로 연결을 끊음 (1013: 나중에 다시 시도)"""
+        subscriber.dropped = True
+        self.stats["dropped_subscribers"] += 1
+        hub_log.warning(f"🐢 느린 구독자 연결 해제 (역할: {subscriber.role})", extra={"room_id": subscriber.room_id})
+        asyncio.create_task(self.unsubscribe(subscriber, code=1013))
+
+    def publish(self, room_id: str, event: Dict, exclude: Optional[Subscriber] = None) -> int:
+        """방의 모든 구독자에게 이벤트 전달 (전달된 구독자 수 반환)"""
+        self.stats["published"] += 1
+        delivered = 0
+        frames: Dict[str, object] = {}
+        for subscriber in list(self.rooms.get(room_id, ())):
+            if subscriber is exclude:
+                continue
+            frame = frames.get(subscriber.encoding)
+            if frame is None:
+                frame = frames[subscriber.encoding] = encode_event(event, subscriber.encoding)
+            if subscriber.offer(frame):
+                delivered += 1
+            elif not subscriber.dropped:
+                self._drop_slow(subscriber)
+        self.stats["delivered"] += delivered
+        if delivered:
+            ws_frames_sent_total.inc(delivered, phase=event.get("phase"), type=event.get("type"))
+        return delivered
+
+    def generation_lock(self, room_id: str) -> asyncio.Lock:
+        """방별 생성 잠금 (연결마다 한 번 받고, 연결이 끝나면 release_generation_lock)"""
+        lock = self._locks.get(room_id)
+        if lock is None:
+            lock = self._locks[room_id] = asyncio.Lock()
+        self._lock_refs[room_id] = self._lock_refs.get(room_id, 0) + 1
+        return lock
+
+    def release_generation_lock(self, room_id: str):
+        """연결 종료: 잠금을 받아 간 연결이 더 없으면 방의 잠금 정리"""
+        refs = self._lock_refs.get(room_id, 0) - 1
+        if refs > 0:
+            self._lock_refs[room_id] = refs
+            return
+        self._lock_refs.pop(room_id, None)
+        self._locks.pop(room_id, None)
+
+    def room_info(self, room_id: str) -> Dict:
+        subscribers = self.rooms.get(room_id, set())
+        return {
+            "participants": sum(1 for subscriber in subscribers if subscriber.role == "participant"),
+            "viewers": sum(1 for subscriber in subscribers if subscriber.role == "viewer"),
+            "generating": room_id in self._locks and self._locks[room_id].locked(),
+        }
+
+    def hub_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "rooms": len(self.rooms),
+            "subscribers": sum(len(subscribers) for subscribers in self.rooms.values()),
+            "room_locks": len(self._locks),
+        }
+
+room_hub = RoomHub()
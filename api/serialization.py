@@ -0,0 +1,90 @@
+# backend/serialization.py
+# 빠른 직렬화 경로: REST는 orjson, WebSocket은 선택형 MessagePack 바이너리 프레임
+#
+# - orjson이 설치되어 있으면 REST 응답과 WebSocket JSON 텍스트 프레임을 orjson으로 만들고, 없으면 표준 json 사용
+# - WebSocket 클라이언트가 Sec-WebSocket-Protocol: feynman.msgpack 을 요청하면(msgpack 설치 시)
+#   이벤트를 MessagePack 바이너리 프레임으로 주고받음. 요청하지 않으면 기존 JSON 텍스트 프로토콜 그대로
+# - 허브에서 같은 이벤트를 여러 구독자에게 보낼 때는 인코딩별로 한 번만 직렬화함 (encode_event)
+import json
+import os
+from typing import Dict, Optional, Union
+
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_SUBPROTOCOL = "feynman.msgpack"
+
+# 프레임 인코딩 종류
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+
+# permessage-deflate: 토큰 단위 작은 프레임은 압축 이득보다 CPU 비용이 커서 끌 수 있음 (큰 목록/평가 프레임 위주면 켜둠)
+# (uvicorn은 켜기/끄기만 설정할 수 있어 압축 수준/윈도 크기는 websockets 기본값을 따름)
+WS_PER_MESSAGE_DEFLATE = os.getenv("WS_PER_MESSAGE_DEFLATE", "true").lower() in ("1", "true", "yes")
+
+def dumps_json(data) -> str:
+    """JSON 문자열 (orjson이 있으면 orjson, datetime 등은 문자열로)"""
+    if orjson is not None:
+        return orjson.dumps(data, default=str).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+
+if orjson is not None:
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+else:
+    FastJSONResponse = JSONResponse
+
+def negotiate_encoding(websocket: WebSocket) -> str:
+    """클라이언트가 요청한 서브프로토콜로 프레임 인코딩 결정 (기본은 JSON)"""
+    if msgpack is not None and MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", []):
+        return ENCODING_MSGPACK
+    return ENCODING_JSON
+
+def accept_subprotocol(encoding: str) -> Optional[str]:
+    """websocket.accept에 넘길 서브프로토콜"""
+    return MSGPACK_SUBPROTOCOL if encoding == ENCODING_MSGPACK else None
+
+def encode_event(event: Dict, encoding: str) -> Union[str, bytes]:
+    """이벤트 → WebSocket 프레임 (msgpack은 bytes, JSON은 str)"""
+    if encoding == ENCODING_MSGPACK:
+        return msgpack.packb(event, use_bin_type=True, default=str)
+    return dumps_json(event)
+
+async def send_frame(websocket: WebSocket, frame: Union[str, bytes]):
+    if isinstance(frame, bytes):
+        await websocket.send_bytes(frame)
+    else:
+        await websocket.send_text(frame)
+
+class InvalidFrame(ValueError):
+    """디코딩할 수 없거나 객체(dict)가 아닌 수신 프레임 (연결은 유지하고 오류 프레임으로 응답)"""
+
+async def receive_event(websocket: WebSocket) -> Dict:
+    """텍스트(JSON) 또는 바이너리(msgpack) 프레임 하나를 받아 dict로 (잘못된 프레임은 InvalidFrame)"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        if msgpack is None:
+            raise InvalidFrame("Binary frames are not supported")
+        try:
+            event = msgpack.unpackb(message["bytes"], raw=False)
+        except (ValueError, TypeError, msgpack.UnpackException) as e:
+            raise InvalidFrame(f"Invalid msgpack frame: {e}") from e
+    else:
+        try:
+            event = json.loads(message.get("text") or "")
+        except (ValueError, TypeError) as e:
+            raise InvalidFrame(f"Invalid JSON frame: {e}") from e
+    if not isinstance(event, dict):
+        raise InvalidFrame("Frame must be an object")
+    return event
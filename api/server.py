@@ -1,34 +1,96 @@
 # backend/server.py (수정 버전)
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, File, UploadFile
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, File, UploadFile, Form, Request, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import and_, func, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict
 from database import engine, get_db, SessionLocal
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta
 import httpx
 import json
 import models
 import socket
 import asyncio
+import hashlib
+import math
 import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
 
 # 새로운 모듈 import
 from feynman_prompts import LearningPhase, feynman_engine
-from evaluation_system import evaluator
+from evaluation_system import ANALYSIS_VERSION, evaluator
+from analysis_references import build_references, latest_ai_explanation, search_references
+from batch_evaluation import EXIT_ALREADY_RUNNING, read_job_status
+from structured_evaluation import (
+    EVALUATION_SCHEMA_VERSION, evaluation_input_hash, evaluation_route,
+    generate_structured_evaluation, render_evaluation
+)
+from model_router import OLLAMA_URL, model_router
+from room_hub import SUBSCRIBER_ROLES, room_hub
+from rate_limit import (
+    check_all, client_ip, generation_scheduler, upload_ip_limiter, upload_room_limiter, ws_ip_limiter, ws_room_limiter
+)
+from stream_buffer import StreamTruncated, stream_registry
+from delta_sync import bump_room_versions, etag_matches, make_etag, normalize_since, not_modified, track_room_versions
+from log_config import LOG_PROMPT_CHARS, bind_context, get_logger, log_prompt
+from tracing import instrument_sessions as trace_sessions, span, tracer
+from metrics import (
+    instrument_sessions, metrics, ollama_responses_total, ws_first_token_seconds, ws_turn_seconds
+)
+from serialization import (
+    WS_PER_MESSAGE_DEFLATE, FastJSONResponse, InvalidFrame, accept_subprotocol, negotiate_encoding, receive_event
+)
 from learning_flow import flow_manager
 #Rag 시스템 
 from rag_system import rag_system
+from context_builder import context_builder
 import shutil
 
+api_log = get_logger("api")
+ws_log = get_logger("ws")
+llm_log = get_logger("llm")
+prompt_log = get_logger("prompt")
+
 # 데이터베이스 테이블 생성
 models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+# 커밋 시간 메트릭 + 트레이스 구간
+instrument_sessions(SessionLocal)
+trace_sessions(SessionLocal)
+# 메시지/방 정보가 바뀔 때마다 채팅방 version 증가 (목록 ETag)
+track_room_versions(SessionLocal)
+
+# 설명 평가도 RAG 시스템의 임베딩 모델을 공유 (일관성/커버리지 점수)
+evaluator.use_embedder(rag_system.embedder)
+
+# REST 응답은 orjson으로 직렬화 (설치되지 않았으면 표준 JSONResponse)
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # uploads 폴더 생성
 os.makedirs("uploads", exist_ok=True)
 
+# 종합 평가 방식 (structured: JSON 스키마 평가 후 서버에서 렌더링, freeform: 기존 스트리밍 서술형)
+EVALUATION_MODE = os.getenv("EVALUATION_MODE", "structured")
+
+# 일괄 저장 요청 하나에 담을 수 있는 최대 메시지 수
+MAX_BULK_MESSAGES = int(os.getenv("MAX_BULK_MESSAGES", "500"))
+
+# 채팅방 목록 한 페이지의 최대 방 수 (limit이 범위를 벗어나면 422)
+MAX_ROOMS_PAGE = int(os.getenv("MAX_ROOMS_PAGE", "500"))
+
+# 업로드 최대 크기 (페이지 단위로 처리하므로 큰 파일도 메모리 사용량은 일정)
+# 앞단 nginx의 업로드 경로 client_max_body_size와 맞춤 (deploy/nginx.conf)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "300")) * 1024 * 1024
+# Content-Length에는 파일 외에 multipart 경계/폼 필드가 포함되므로 그만큼 여유를 둠
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
 # 실제 IP 주소 확인
 def get_local_ip():
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -51,6 +113,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# REST 요청마다 트레이스 (메트릭/트레이스 조회 요청은 제외)
+UNTRACED_PATHS = ("/metrics", "/debug/traces")
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    if request.url.path in UNTRACED_PATHS:
+        return await call_next(request)
+    with tracer.trace(f"{request.method} {request.url.path}") as trace:
+        response = await call_next(request)
+        trace.attributes["status"] = response.status_code
+        return response
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """업로드 본문을 받기 전에 Content-Length로 크기 확인
+
+    Starlette는 핸들러가 실행되기 전에 폼 전체를 임시 파일로 받아 두므로,
+    핸들러 안의 크기 확인만으로는 디스크/대역폭을 보호하지 못함
+    """
+    if request.method == "POST" and request.url.path.endswith("/upload-pdf"):
+        content_length = request.headers.get("content-length")
+        if content_length is None:
+            return FastJSONResponse(status_code=411, content={"detail": "Content-Length가 필요합니다"})
+        if not content_length.isdigit():
+            return FastJSONResponse(status_code=400, content={"detail": "잘못된 Content-Length"})
+        if int(content_length) > MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD:
+            return FastJSONResponse(
+                status_code=413,
+                content={"detail": f"파일 크기는 {MAX_UPLOAD_BYTES // (1024 * 1024)}MB 이하여야 합니다"}
+            )
+    return await call_next(request)
+
 # ========== 기존 Pydantic 모델 ==========
 class ChatRoomCreate(BaseModel):
     title: str
@@ -78,6 +172,16 @@ class MessageCreate(BaseModel):
     role: str
     phase: str
 
+class BulkMessageItem(BaseModel):
+    room_id: str
+    content: str
+    role: str = "user"
+    phase: Optional[str] = None
+    client_msg_id: Optional[str] = None
+
+class BulkMessageRequest(BaseModel):
+    messages: List[BulkMessageItem]
+
 # ========== 새로운 Pydantic 모델 (파인만) ==========
 class PhaseTransitionRequest(BaseModel):
     room_id: str
@@ -90,8 +194,21 @@ class PhaseResponse(BaseModel):
     instruction: str
     title: str
 
+class DocumentResponse(BaseModel):
+    id: str
+    filename: str
+    content_hash: Optional[str]
+    version: int
+    page_count: int
+    chunk_count: int
+    created_at: datetime
+    updated_at: datetime
+    
+    class Config:
+        orm_mode = True
+
 # ========== 키워드 추출 함수 (새로 추가) ==========
-async def extract_concept_keyword(user_message: str) -> str:
+async def extract_concept_keyword(user_message: str, room_id: str) -> str:
     """사용자 질문에서 핵심 개념 키워드 추출"""
     
     extraction_prompt = f"""다음 질문에서 학습하고자 하는 핵심 개념/키워드만 추출하세요.
@@ -110,51 +227,129 @@ async def extract_concept_keyword(user_message: str) -> str:
 
 키워드:"""
 
+    # 한 줄짜리 키워드이므로 작은 모델 + 짧은 토큰 예산
+    route = model_router.route("keyword")
     try:
         async with httpx.AsyncClient() as client:
-            print(f"🔍 키워드 추출 중: '{user_message}'")
-            response = await client.post(
-                "http://localhost:11434/api/generate",
-                json={
-                    "model": "llama3.1:8b",
-                    "prompt": extraction_prompt,
-                    "stream": False
-                },
-                timeout=180.0
-            )
+            llm_log.info(f"🔍 키워드 추출 중 ({route['model']})", extra={"chars": len(user_message)})
+            async with generation_scheduler.slot(room_id):
+                start = time.perf_counter()
+                response = await client.post(
+                    f"{OLLAMA_URL}/api/generate",
+                    json=model_router.request_body(route, extraction_prompt, stream=False),
+                    timeout=180.0
+                )
+            ollama_responses_total.inc(phase=LearningPhase.HOME.value, route=route["key"], status=response.status_code)
             
             if response.status_code == 200:
                 result = response.json()
+                model_router.record(route, LearningPhase.HOME, time.perf_counter() - start, result)
                 keyword = result.get("response", "").strip()
                 # 첫 줄만 가져오기 (추가 설명 제거)
                 keyword = keyword.split('\n')[0].strip()
                 # 따옴표 제거
                 keyword = keyword.strip('"\'')
-                print(f"✅ 추출된 키워드: '{keyword}'")
+                llm_log.info(f"✅ 추출된 키워드: '{keyword}'")
                 return keyword if keyword else user_message
             else:
-                print(f"⚠️ 키워드 추출 실패 (상태: {response.status_code}), 원본 사용")
+                llm_log.warning(f"⚠️ 키워드 추출 실패 (상태: {response.status_code}), 원본 사용")
                 return user_message
     except Exception as e:
-        print(f"⚠️ 키워드 추출 오류: {e}, 원본 사용")
+        llm_log.warning(f"⚠️ 키워드 추출 오류: {e}, 원본 사용")
         return user_message
 
+# ========== 설명 분석 저장/비교 ==========
+def latest_explanation(db: Session, room_id: str, phase: LearningPhase) -> Optional[models.Message]:
+    """해당 단계의 마지막 설명 메시지"""
+    return db.query(models.Message).filter(
+        models.Message.room_id == room_id,
+        models.Message.phase == phase.value,
+        models.Message.is_explanation.is_(True)
+    ).order_by(models.Message.created_at.desc()).first()
+
+async def latest_explanation_analysis(db: Session, room_id: str, phase: LearningPhase) -> Optional[Dict]:
+    """해당 단계의 마지막 설명 메시지에 저장된 분석 (없거나 이전 채점 버전이면 지금 분석해 저장)
+
+    다시 분석할 때도 실시간 채점과 같은 참고 자료(당시의 AI 설명 + 검색된 PDF 청크)를 쓰고,
+    검색/임베딩 계산은 이벤트 루프를 막지 않도록 스레드에서 실행합니다.
+    """
+    message = latest_explanation(db, room_id, phase)
+    
+    if not message:
+        return None
+    if message.analysis is None or message.analysis_version != ANALYSIS_VERSION:
+        content = message.content or ""
+        ai_explanation = latest_ai_explanation(db, room_id, before=message.created_at)
+        
+        def analyze():
+            return evaluator.analyze_explanation(content, search_references(room_id, content, ai_explanation))
+        
+        with span("evaluation.reanalyze"):
+            analysis = await asyncio.to_thread(analyze)
+        message.analysis = evaluator.compact_analysis(analysis)
+        message.analysis_version = ANALYSIS_VERSION
+        message.analyzed_at = datetime.utcnow()
+        db.commit()
+    return message.analysis
+
+async def structured_evaluation_reply(
+    db: Session,
+    room: models.ChatRoom,
+    message_id: str,
+    improvement_summary: Optional[str]
+) -> Optional[Dict]:
+    """구조화 종합 평가 (같은 입력이면 저장된 결과 재사용, 실패하면 None → 서술형으로 대체)"""
+    first = latest_explanation(db, room.id, LearningPhase.FIRST_EXPLANATION)
+    second = latest_explanation(db, room.id, LearningPhase.SECOND_EXPLANATION)
+    inputs = {
+        "concept": room.current_concept,
+        "first_explanation": first.content if first else None,
+        "second_explanation": second.content if second else None,
+        "improvement_summary": improvement_summary,
+    }
+    route = evaluation_route()
+    input_hash = evaluation_input_hash(route["model"], inputs)
+    
+    cached = db.query(models.LearningEvaluation).filter(
+        models.LearningEvaluation.room_id == room.id,
+        models.LearningEvaluation.input_hash == input_hash
+    ).first()
+    if cached:
+        llm_log.info("📊 구조화 평가 캐시 사용")
+        return {"evaluation": cached.result, "evaluation_id": cached.id, "cached": True}
+    
+    try:
+        async with generation_scheduler.slot(room.id):
+            result = await generate_structured_evaluation(inputs, route)
+    except Exception as e:
+        llm_log.warning(f"⚠️ 구조화 평가 실패, 서술형으로 대체: {e}")
+        return None
+    
+    evaluation = models.LearningEvaluation(
+        room_id=room.id,
+        message_id=message_id,
+        input_hash=input_hash,
+        model=route["model"],
+        schema_version=EVALUATION_SCHEMA_VERSION,
+        result=result
+    )
+    db.add(evaluation)
+    db.commit()
+    llm_log.info("📊 구조화 평가 저장됨")
+    return {"evaluation": result, "evaluation_id": evaluation.id, "cached": False}
+
 # ========== 기존 엔드포인트 유지 ==========
 @app.get("/")
 async def root():
-    return {"message": "Backend is running", "ip": LOCAL_IP}
+    return {"message": "Backend is running", "ip": LOCAL_IP, "worker": os.getenv("WORKER_ID")}
 
 @app.get("/test-ollama")
 async def test_ollama():
     try:
         async with httpx.AsyncClient() as client:
             response = await client.post(
-                "http://localhost:11434/api/generate",
-                json={
-                    "model": "llama3.1:8b",
-                    "prompt": "Say hello in Korean",
-                    "stream": False
-                },
+                f"{OLLAMA_URL}/api/generate",
+                json=model_router.request_body(model_router.route("health"), "Say hello in Korean", stream=False),
                 timeout=30.0
             )
             
@@ -168,6 +363,31 @@ async def test_ollama():
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.get("/api/llm/routing-stats")
+async def get_routing_stats():
+    """단계/작업별 모델 라우팅 표와 라우트별 지연 시간/토큰 통계"""
+    return model_router.stats()
+
+@app.get("/api/llm/scheduler-stats")
+async def get_scheduler_stats():
+    """생성 슬롯 사용 현황 (실행 중, 채팅방별 대기 수, 배정 횟수)"""
+    return generation_scheduler.stats()
+
+def enforce_rate_limits(checks) -> None:
+    """(제한기, 키) 목록을 함께 확인해 거부되면 429 (Retry-After 헤더 포함, 거부되면 어느 버킷도 소모하지 않음)"""
+    limiter, retry_after = check_all(checks)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many requests ({limiter.name})",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+
+@app.get("/api/rag/cache-stats")
+async def get_rag_cache_stats():
+    """RAG 질의 임베딩/검색 결과 캐시 통계"""
+    return rag_system.cache_stats()
+
 @app.post("/api/rooms", response_model=ChatRoomResponse)
 def create_room(room: ChatRoomCreate, db: Session = Depends(get_db)):
     """새 채팅방 생성"""
@@ -181,18 +401,93 @@ def create_room(room: ChatRoomCreate, db: Session = Depends(get_db)):
     return db_room
 
 @app.get("/api/rooms", response_model=List[ChatRoomResponse])
-def get_rooms(db: Session = Depends(get_db)):
-    """모든 채팅방 조회"""
-    rooms = db.query(models.ChatRoom).order_by(models.ChatRoom.updated_at.desc()).all()
-    return rooms
+def get_rooms(
+    updated_since: Optional[datetime] = None,
+    after_id: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_ROOMS_PAGE),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """채팅방 목록 (최근 수정 순)
+
+    - updated_since: 그 이후 생성/수정된 방만 (삭제된 방은 X-Total-Count가 줄어든 것으로 알 수 있음)
+    - after_id / limit: 목록 순서에서 after_id 방 다음부터 limit개
+    - If-None-Match가 현재 ETag와 같으면 목록을 읽지 않고 304
+    """
+    Room = models.ChatRoom
+    total, version_sum, last_created, last_updated = db.query(
+        func.count(Room.id),
+        func.coalesce(func.sum(Room.version), 0),
+        func.max(Room.created_at),
+        func.max(Room.updated_at)
+    ).one()
+    since = normalize_since(updated_since)
+    etag = make_etag("rooms", total, version_sum, last_created, last_updated, since, after_id, limit)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
+    query = db.query(Room.id, Room.title, Room.created_at, Room.updated_at)
+    if since is not None:
+        query = query.filter(Room.updated_at > since)
+    if after_id:
+        anchor = db.query(Room.updated_at).filter(Room.id == after_id).scalar()
+        if anchor is None:
+            raise HTTPException(status_code=404, detail="Room not found")
+        query = query.filter(or_(Room.updated_at < anchor, and_(Room.updated_at == anchor, Room.id < after_id)))
+    query = query.order_by(Room.updated_at.desc(), Room.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return FastJSONResponse([
+        {"id": room_id, "title": title, "created_at": created_at.isoformat(), "updated_at": updated_at.isoformat()}
+        for room_id, title, created_at, updated_at in query
+    ], headers={"ETag": etag, "X-Total-Count": str(total), "Cache-Control": "no-cache"})
 
 @app.get("/api/rooms/{room_id}/messages", response_model=List[MessageResponse])
-def get_messages(room_id: str, db: Session = Depends(get_db)):
-    """특정 채팅방의 메시지 조회"""
-    messages = db.query(models.Message).filter(
-        models.Message.room_id == room_id
-    ).order_by(models.Message.created_at).all()
-    return messages
+def get_messages(
+    room_id: str,
+    updated_since: Optional[datetime] = None,
+    after_id: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """특정 채팅방의 메시지 조회 (필요한 컬럼만 읽어 ORM 객체/모델 검증 없이 바로 직렬화)
+
+    - after_id: 그 메시지 다음 메시지만 / updated_since: 그 이후 생성된 메시지만
+      (목록에 나가는 필드는 생성 후 바뀌지 않으므로 created_at 기준)
+    - ETag는 채팅방 version 기준. If-None-Match가 같으면 메시지를 읽지 않고 304
+    """
+    Message = models.Message
+    anchor_created_at = db.query(Message.created_at).filter(
+        Message.id == after_id, Message.room_id == room_id
+    ).scalar_subquery()
+    row = db.query(models.ChatRoom.version, anchor_created_at).filter(models.ChatRoom.id == room_id).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+    version, anchor = row
+    since = normalize_since(updated_since)
+    etag = make_etag("messages", room_id, version, since, after_id)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    if after_id and anchor is None:
+        raise HTTPException(status_code=404, detail="Message not found")
+    
+    query = db.query(
+        Message.id,
+        Message.role,
+        Message.content,
+        Message.created_at
+    ).filter(
+        Message.room_id == room_id
+    )
+    if since is not None:
+        query = query.filter(Message.created_at > since)
+    if anchor is not None:
+        query = query.filter(or_(Message.created_at > anchor, and_(Message.created_at == anchor, Message.id > after_id)))
+    rows = query.order_by(Message.created_at, Message.id).all()
+    return FastJSONResponse([
+        {"id": message_id, "role": role, "content": content or "", "created_at": created_at.isoformat()}
+        for message_id, role, content, created_at in rows
+    ], headers={"ETag": etag, "Cache-Control": "no-cache"})
 
 @app.delete("/api/rooms/{room_id}")
 def delete_room(room_id: str, db: Session = Depends(get_db)):
@@ -205,11 +500,15 @@ def delete_room(room_id: str, db: Session = Depends(get_db)):
     # CASCADE 설정 덕분에 메시지들도 자동 삭제됨
     db.delete(room)
     db.commit()
+    rag_system.forget_room(room_id)
     
-    print(f"🗑️ 채팅방 삭제됨: {room_id}")
+    api_log.info(f"🗑️ 채팅방 삭제됨: {room_id}")
     
     return {"status": "ok", "message": "Room deleted"}
 
+# cluster.py로 띄운 워커 주소 목록 (WORKER_ID 순서, 여러 방을 한 번에 지울 때 모든 워커의 캐시를 정리)
+CLUSTER_PEERS = [url.strip() for url in os.getenv("CLUSTER_PEERS", "").split(",") if url.strip()]
+
 class DeleteRoomsRequest(BaseModel):
     room_ids: List[str]
 
@@ -225,11 +524,32 @@ def delete_multiple_rooms(request: DeleteRoomsRequest, db: Session = Depends(get
             deleted_count += 1
     
     db.commit()
+    # 이 요청은 room_id 해시로 라우팅되지 않으므로 각 방의 캐시를 가진 워커 모두에 알림
+    broadcast_forget_rooms(request.room_ids)
     
-    print(f"🗑️ {deleted_count}개 채팅방 삭제됨")
+    api_log.info(f"🗑️ {deleted_count}개 채팅방 삭제됨")
     
     return {"status": "ok", "deleted_count": deleted_count}
 
+def broadcast_forget_rooms(room_ids: List[str]):
+    """모든 워커에서 채팅방 캐시(RAG 지문/역색인/검색 결과) 제거 (단일 프로세스면 이 워커만)"""
+    for room_id in room_ids:
+        rag_system.forget_room(room_id)
+    for index, peer in enumerate(CLUSTER_PEERS):
+        if str(index) == os.getenv("WORKER_ID"):
+            continue
+        try:
+            httpx.post(f"{peer}/api/internal/forget-rooms", json={"room_ids": room_ids}, timeout=5.0).raise_for_status()
+        except httpx.HTTPError as e:
+            api_log.warning(f"⚠️ 워커 캐시 정리 실패 ({peer}): {e}")
+
+@app.post("/api/internal/forget-rooms")
+def forget_rooms(request: DeleteRoomsRequest):
+    """이 워커의 채팅방 캐시 제거 (다른 워커가 호출, nginx에서 외부 접근 차단)"""
+    for room_id in request.room_ids:
+        rag_system.forget_room(room_id)
+    return {"status": "ok"}
+
 @app.post("/api/rooms/{room_id}/messages")
 def save_message(room_id: str, message: MessageCreate, db: Session = Depends(get_db)):
     """단순 메시지 저장 (AI 응답 없이)"""
@@ -251,10 +571,98 @@ def save_message(room_id: str, message: MessageCreate, db: Session = Depends(get
     room.updated_at = datetime.utcnow()
     db.commit()
     
-    print(f"💾 메시지 저장됨 (단계: {message.phase}): {message.content[:50]}...")
+    api_log.info(f"💾 메시지 저장됨 (단계: {message.phase})", extra={"room_id": room_id, "chars": len(message.content)})
     
     return {"status": "ok", "message_id": db_message.id}
 
+def existing_client_messages(db: Session, keys) -> Dict:
+    """(room_id, client_msg_id) → 이미 저장된 메시지 id"""
+    if not keys:
+        return {}
+    rows = db.query(models.Message.id, models.Message.room_id, models.Message.client_msg_id).filter(
+        models.Message.room_id.in_({room_id for room_id, _ in keys}),
+        models.Message.client_msg_id.in_({client_msg_id for _, client_msg_id in keys})
+    )
+    return {(room_id, client_msg_id): message_id for message_id, room_id, client_msg_id in rows if (room_id, client_msg_id) in keys}
+
+@app.post("/api/messages/bulk")
+def save_messages_bulk(request: BulkMessageRequest, db: Session = Depends(get_db)):
+    """여러 메시지를 순서대로 한 트랜잭션에 저장 (여러 채팅방 가능)
+
+    채팅방 확인은 IN 조회 한 번, 저장은 여러 행 INSERT 한 번으로 처리합니다.
+    client_msg_id가 같은 메시지를 다시 보내면 새로 저장하지 않고 기존 id를 돌려줍니다 (재시도 멱등성).
+    결과는 요청과 같은 순서의 [{id, client_msg_id, duplicate}]
+    """
+    items = request.messages
+    if len(items) > MAX_BULK_MESSAGES:
+        raise HTTPException(status_code=413, detail=f"Too many messages (max {MAX_BULK_MESSAGES})")
+    if not items:
+        return {"status": "ok", "messages": []}
+    
+    room_ids = {item.room_id for item in items}
+    found = {room_id for (room_id,) in db.query(models.ChatRoom.id).filter(models.ChatRoom.id.in_(room_ids))}
+    missing = sorted(room_ids - found)
+    if missing:
+        raise HTTPException(status_code=404, detail={"message": "Room not found", "room_ids": missing})
+    
+    keys = {(item.room_id, item.client_msg_id) for item in items if item.client_msg_id}
+    saved_ids = existing_client_messages(db, keys)
+    
+    # 요청 순서대로 created_at을 1µs씩 늘려 조회 순서(created_at 정렬)를 유지
+    now = datetime.utcnow()
+    rows = []
+    results = []
+    for index, item in enumerate(items):
+        key = (item.room_id, item.client_msg_id)
+        if item.client_msg_id and key in saved_ids:
+            results.append({"id": saved_ids[key], "client_msg_id": item.client_msg_id, "duplicate": True})
+            continue
+        message_id = str(uuid.uuid4())
+        if item.client_msg_id:
+            # 같은 요청 안에서 반복된 키도 한 번만 저장
+            saved_ids[key] = message_id
+        rows.append({
+            "id": message_id,
+            "room_id": item.room_id,
+            "role": item.role,
+            "content": item.content,
+            "phase": item.phase,
+            "is_explanation": False,
+            "client_msg_id": item.client_msg_id,
+            "created_at": now + timedelta(microseconds=index),
+        })
+        results.append({"id": message_id, "client_msg_id": item.client_msg_id, "duplicate": False})
+    
+    if rows:
+        table = models.Message.__table__
+        if db.bind.dialect.name == "postgresql":
+            # 동시에 도착한 같은 재시도는 유니크 인덱스 충돌로 건너뛰고, 실제로 들어간 행 id만 돌려받음
+            statement = pg_insert(table).values(rows).on_conflict_do_nothing(
+                index_elements=["room_id", "client_msg_id"]
+            ).returning(table.c.id)
+            inserted = {message_id for (message_id,) in db.execute(statement)}
+        else:
+            db.execute(table.insert(), rows)
+            inserted = {row["id"] for row in rows}
+        
+        skipped = {row["id"]: (row["room_id"], row["client_msg_id"]) for row in rows if row["id"] not in inserted}
+        if skipped:
+            winners = existing_client_messages(db, set(skipped.values()))
+            for result in results:
+                if result["id"] in skipped:
+                    result.update(id=winners[skipped[result["id"]]], duplicate=True)
+        
+        db.query(models.ChatRoom).filter(
+            models.ChatRoom.id.in_({row["room_id"] for row in rows})
+        ).update({models.ChatRoom.updated_at: now}, synchronize_session=False)
+        # Core INSERT는 flush를 거치지 않으므로 version을 직접 올림
+        bump_room_versions(db.connection(), {row["room_id"] for row in rows})
+    db.commit()
+    
+    duplicates = sum(1 for result in results if result["duplicate"])
+    api_log.info(f"💾 메시지 일괄 저장: {len(items) - duplicates}개 저장, {duplicates}개 중복 (채팅방 {len(room_ids)}개)")
+    return {"status": "ok", "messages": results}
+
 # ========== 새로운 파인만 학습 엔드포인트 ==========
 @app.post("/api/learning/transition", response_model=PhaseResponse)
 async def transition_phase(
@@ -308,80 +716,363 @@ async def get_current_phase(room_id: str, db: Session = Depends(get_db)):
 @app.post("/api/rooms/{room_id}/upload-pdf")
 async def upload_pdf(
     room_id: str,
+    request: Request,
     file: UploadFile = File(...),
+    document_id: Optional[str] = Form(None),
     db: Session = Depends(get_db)
 ):
-    """PDF 파일 업로드 및 RAG 시스템에 등록"""
-    
+    """PDF 파일 업로드 및 RAG 시스템에 등록
+
+    document_id를 함께 보내면 기존 문서를 교체 (바뀐 청크만 다시 임베딩)
+    """
     # 파일 형식 확인
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="PDF 파일만 업로드 가능합니다")
     
-    # 파일 크기 확인 (10MB 제한)
+    room = db.query(models.ChatRoom).filter(models.ChatRoom.id == room_id).first()
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+    
+    document = None
+    if document_id:
+        document = db.query(models.RoomDocument).filter(
+            models.RoomDocument.id == document_id,
+            models.RoomDocument.room_id == room_id
+        ).first()
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
+    
+    # 형식/채팅방/문서 확인을 통과한 요청만 업로드 한도를 소모
+    enforce_rate_limits([
+        (upload_ip_limiter, client_ip(request.headers, request.client)),
+        (upload_room_limiter, room_id),
+    ])
+    
+    # 업로드마다 고유한 임시 파일에 조각 단위로 저장하면서 해시 계산
+    # (같은 채팅방에 동시에 업로드해도 서로 덮어쓰지 않음)
     file_size = 0
     chunk_size = 1024 * 1024  # 1MB
-    temp_file = f"uploads/temp_{room_id}.pdf"
+    sha = hashlib.sha256()
+    buffer = tempfile.NamedTemporaryFile(dir="uploads", prefix=f"upload_{room_id}_", suffix=".pdf", delete=False)
+    temp_file = buffer.name
     
     try:
-        with open(temp_file, "wb") as buffer:
+        with buffer:
             while chunk := await file.read(chunk_size):
                 file_size += len(chunk)
-                if file_size > 10 * 1024 * 1024:  # 10MB
-                    os.remove(temp_file)
-                    raise HTTPException(status_code=400, detail="파일 크기는 10MB 이하여야 합니다")
+                if file_size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=f"파일 크기는 {MAX_UPLOAD_BYTES // (1024 * 1024)}MB 이하여야 합니다")
+                sha.update(chunk)
                 buffer.write(chunk)
         
-        # RAG 시스템에 PDF 추가
-        success = rag_system.add_pdf_to_collection(room_id, temp_file)
+        # RAG 시스템에 PDF 추가 (교체인 경우 같은 doc_id로 다시 색인)
+        # 페이지 추출/임베딩은 오래 걸리므로 스레드에서 실행
+        doc_id = document.id if document else str(uuid.uuid4())
+        stats = await asyncio.to_thread(rag_system.index_document, room_id, doc_id, temp_file, sha.hexdigest())
         
-        if success:
+        if stats:
             # DB 업데이트
-            room = db.query(models.ChatRoom).filter(models.ChatRoom.id == room_id).first()
-            if room:
-                room.has_pdf = True
-                db.commit()
+            if document:
+                document.filename = file.filename
+                document.version = (document.version or 1) + 1
+            else:
+                document = models.RoomDocument(id=doc_id, room_id=room_id, filename=file.filename, version=1)
+                db.add(document)
+            document.content_hash = stats["doc_hash"]
+            document.page_count = stats["pages"]
+            document.chunk_count = stats["chunks"]
+            room.has_pdf = True
+            db.commit()
             
-            print(f"✅ PDF 업로드 성공: {file.filename} (Room: {room_id})")
-            return {"status": "success", "message": "PDF 업로드 완료"}
+            api_log.info(f"✅ PDF 업로드 성공: {file.filename} (Doc: {doc_id}, v{document.version})", extra={"room_id": room_id})
+            return {
+                "status": "success",
+                "message": "PDF 업로드 완료",
+                "document_id": doc_id,
+                "version": document.version,
+                "chunks": {key: value for key, value in stats.items() if key != "doc_hash"}
+            }
         else:
             raise HTTPException(status_code=500, detail="PDF 처리 실패")
             
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ PDF 업로드 오류: {e}")
+        api_log.error(f"❌ PDF 업로드 오류: {e}", extra={"room_id": room_id})
         raise HTTPException(status_code=500, detail=f"업로드 실패: {str(e)}")
     finally:
         # 임시 파일 삭제
         if os.path.exists(temp_file):
             os.remove(temp_file)
 
+@app.get("/api/rooms/{room_id}/documents", response_model=List[DocumentResponse])
+def get_documents(room_id: str, db: Session = Depends(get_db)):
+    """채팅방에 업로드된 문서 목록"""
+    documents = db.query(models.RoomDocument).filter(
+        models.RoomDocument.room_id == room_id
+    ).order_by(models.RoomDocument.created_at).all()
+    return documents
+
+@app.delete("/api/rooms/{room_id}/documents/{document_id}")
+def delete_document(room_id: str, document_id: str, db: Session = Depends(get_db)):
+    """문서 삭제 (해당 문서의 청크만 벡터 저장소에서 제거)"""
+    document = db.query(models.RoomDocument).filter(
+        models.RoomDocument.id == document_id,
+        models.RoomDocument.room_id == room_id
+    ).first()
+    
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    removed = rag_system.remove_document(room_id, document_id)
+    db.delete(document)
+    db.flush()
+    
+    # 남은 문서가 없으면 PDF 없음으로 표시
+    remaining = db.query(models.RoomDocument).filter(models.RoomDocument.room_id == room_id).count()
+    if remaining == 0:
+        room = db.query(models.ChatRoom).filter(models.ChatRoom.id == room_id).first()
+        if room:
+            room.has_pdf = False
+    db.commit()
+    
+    return {"status": "ok", "removed_chunks": removed, "remaining_documents": remaining}
+
 # ========== 수정된 WebSocket (파인만 통합) ==========
+class EvaluationResponse(BaseModel):
+    id: str
+    message_id: Optional[str]
+    model: Optional[str]
+    schema_version: Optional[int]
+    result: Dict
+    created_at: datetime
+    
+    class Config:
+        orm_mode = True
+
+@app.get("/api/rooms/{room_id}/evaluations", response_model=List[EvaluationResponse])
+def get_evaluations(room_id: str, db: Session = Depends(get_db)):
+    """채팅방의 구조화 종합 평가 목록 (최신순)"""
+    return db.query(models.LearningEvaluation).filter(
+        models.LearningEvaluation.room_id == room_id
+    ).order_by(models.LearningEvaluation.created_at.desc()).all()
+
+@app.get("/api/rooms/{room_id}/presence")
+async def get_room_presence(room_id: str):
+    """채팅방에 연결된 참여자/관찰자 수와 생성 중 여부"""
+    return room_hub.room_info(room_id)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus 텍스트 형식 메트릭 (이 워커의 값)"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/traces")
+async def get_traces(limit: int = 20, name: Optional[str] = None, format: str = "json"):
+    """가장 느린 트레이스의 단계별 폭포 (format=text면 터미널용 그림)"""
+    traces = tracer.buffer.slowest(limit, name)
+    if format == "text":
+        return PlainTextResponse("\n\n".join(trace.render_text() for trace in traces) + "\n")
+    return {"stats": tracer.stats(), "traces": [trace.waterfall() for trace in traces]}
+
+@app.get("/api/ws/stats")
+async def get_ws_stats():
+    """WebSocket 허브 통계 (발행/전달 이벤트 수, 끊은 느린 구독자 수, 재전송 버퍼)"""
+    return {**room_hub.hub_stats(), "stream_buffers": stream_registry.stats()}
+
+async def resume_stream(db: Session, subscriber, room_id: str, message_data: Dict):
+    """끊긴 AI 응답 이어받기: offset 이후 텍스트를 이 연결에만 다시 보냄 (재생성하지 않음)
+
+    생성이 아직 진행 중이면 이후 프레임은 허브를 통해 그대로 이어서 받고,
+    링 버퍼에서 사라진 완료 응답은 DB에 저장된 내용에서 잘라 보냄
+    """
+    message_id = message_data.get("message_id")
+    try:
+        offset = max(0, int(message_data.get("offset") or 0))
+    except (TypeError, ValueError):
+        await subscriber.send({
+            "type": "error",
+            "content": "Invalid resume offset"
+        })
+        return
+    
+    stream = stream_registry.get(room_id, message_id)
+    if stream is not None:
+        message_id = stream.message_id
+        try:
+            tail = stream.read_from(offset)
+        except StreamTruncated:
+            tail = None
+        if tail is not None:
+            if tail:
+                await subscriber.send({**stream.frame(tail, offset), "resumed": True})
+            if stream.done and stream.complete_frame:
+                await subscriber.send(stream.complete_frame)
+            ws_log.info(f"🔁 스트림 이어받기 (offset {offset} → {stream.length}, 완료: {stream.done})")
+            return
+    
+    saved = db.query(models.Message).filter(
+        models.Message.id == message_id,
+        models.Message.room_id == room_id,
+        models.Message.role == "assistant"
+    ).first() if message_id else None
+    if saved is None:
+        await subscriber.send({"type": "resume_failed", "message_id": message_id})
+        return
+    
+    content = saved.content or ""
+    if content[offset:]:
+        await subscriber.send({
+            "type": "stream",
+            "content": content[offset:],
+            "phase": saved.phase,
+            "message_id": saved.id,
+            "offset": offset,
+            "resumed": True
+        })
+    await subscriber.send({"type": "complete", "phase": saved.phase, "message_id": saved.id, "length": len(content)})
+    ws_log.info(f"🔁 저장된 응답으로 이어받기 (offset {offset})")
+
+# ========== 재채점 (관리자) ==========
+class RescoreRequest(BaseModel):
+    room_id: Optional[str] = None
+    workers: Optional[int] = None
+    chunk_size: int = 500
+    restart: bool = False
+
+# 재채점은 별도 프로세스(batch_evaluation.py)로 실행
+# (서버 프로세스에서 spawn 풀을 만들면 워커마다 이 모듈 전체를 다시 가져와 모델/DB 연결을 또 만듦)
+RESCORE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "batch_evaluation.py")
+# 작업 프로세스가 상태 파일에 등록할 때까지 기다리는 시간
+RESCORE_START_TIMEOUT = 30
+# 작업 프로세스 종료 대기 태스크 (좀비 프로세스가 남지 않도록 회수, 참조를 보관해 중간에 수거되지 않게)
+rescore_waits: set = set()
+
+@app.post("/api/admin/rescore")
+async def start_rescore(request: RescoreRequest):
+    """설명 메시지 전체 재채점 시작 (별도 프로세스에서 프로세스 풀로 실행, 상태는 상태 파일로 공유)"""
+    if read_job_status().get("status") == "running":
+        raise HTTPException(status_code=409, detail="Rescore already running")
+
+    job_id = str(uuid.uuid4())
+    command = [sys.executable, RESCORE_SCRIPT, "--job-id", job_id, "--chunk-size", str(request.chunk_size)]
+    if request.room_id:
+        command += ["--room", request.room_id]
+    if request.workers:
+        command += ["--workers", str(request.workers)]
+    if request.restart:
+        command.append("--restart")
+    process = subprocess.Popen(command, cwd=os.path.dirname(RESCORE_SCRIPT))
+    waiter = asyncio.create_task(asyncio.to_thread(process.wait))
+    rescore_waits.add(waiter)
+    waiter.add_done_callback(rescore_waits.discard)
+
+    # 작업 프로세스가 잠금을 잡고 상태를 기록할 때까지 대기 (동시에 요청한 다른 워커가 먼저 잡으면 409)
+    deadline = time.monotonic() + RESCORE_START_TIMEOUT
+    while time.monotonic() < deadline:
+        status = read_job_status()
+        if status.get("job_id") == job_id:
+            return status
+        if process.poll() is not None:
+            if process.returncode == EXIT_ALREADY_RUNNING:
+                raise HTTPException(status_code=409, detail="Rescore already running")
+            raise HTTPException(status_code=500, detail=f"Rescore exited with code {process.returncode}")
+        await asyncio.sleep(0.1)
+    raise HTTPException(status_code=504, detail="Rescore did not start in time")
+
+@app.get("/api/admin/rescore")
+async def get_rescore_status():
+    """재채점 진행 상황 (어느 서버 워커로 조회해도 같은 상태)"""
+    return read_job_status()
+
 @app.websocket("/ws/chat/{room_id}")
 async def websocket_endpoint_with_feynman(
     websocket: WebSocket, 
-    room_id: str
+    room_id: str,
+    role: str = "participant"
 ):
-    await websocket.accept()
-    print(f"✅ WebSocket 연결됨 (Room: {room_id})")
+    # 클라이언트가 feynman.msgpack 서브프로토콜을 요청한 경우에만 바이너리 프레임 (기본은 JSON 텍스트)
+    encoding = negotiate_encoding(websocket)
+    await websocket.accept(subprotocol=accept_subprotocol(encoding))
+    bind_context(room_id=room_id)
+    ip = client_ip(websocket.headers, websocket.client)
+    ws_log.info(f"✅ WebSocket 연결됨 (역할: {role}, 인코딩: {encoding})")
 
     db = SessionLocal()
+    subscriber = None
+    generation_lock = None
+    holding_lock = False
+    turn_trace = None
     
     try:
         room = db.query(models.ChatRoom).filter(models.ChatRoom.id == room_id).first()
-        if not room:
-            await websocket.send_json({"error": "Room not found"})
+        if not room or role not in SUBSCRIBER_ROLES:
+            await websocket.send_json({"error": "Room not found" if not room else f"Invalid role: {role}"})
             await websocket.close()
             return
         
+        # 같은 방의 다른 연결(다른 기기, 관찰자)과 생성 이벤트를 공유
+        subscriber = room_hub.subscribe(room_id, websocket, role, encoding)
+        generation_lock = room_hub.generation_lock(room_id)
+        room_hub.publish(room_id, {"type": "presence", **room_hub.room_info(room_id)})
+        
         while True:
-            data = await websocket.receive_text()
-            print(f"📥 받은 메시지 (Room {room_id}): {data}")
+            # 이전 메시지 처리가 끝났으므로 (continue 포함) 생성 잠금 해제
+            if holding_lock:
+                generation_lock.release()
+                holding_lock = False
+                ws_turn_seconds.observe(time.perf_counter() - turn_started)
+                tracer.finish(turn_trace)
             
-            message_data = json.loads(data)
+            try:
+                message_data = await receive_event(websocket)
+            except InvalidFrame as e:
+                ws_log.warning(f"⚠️ 잘못된 프레임: {e}")
+                await subscriber.send({
+                    "type": "error",
+                    "content": "Invalid message format"
+                })
+                continue
             
-            # 메시지 타입 확인
+            # 메시지 타입 확인 (턴마다 새 turn_id로 로그를 묶음)
             msg_type = message_data.get("type", "message")
+            bind_context(phase=room.learning_phase, turn_id=uuid.uuid4().hex[:12])
+            ws_log.info(f"📥 받은 메시지 ({msg_type})", extra={"chars": len(str(message_data.get("message") or ""))})
+            ws_log.debug("받은 메시지 본문", extra={"payload": str(message_data)[:LOG_PROMPT_CHARS]})
+            
+            # 재접속한 클라이언트의 이어받기 요청 (관찰자 포함, 생성 잠금 없이 처리)
+            if msg_type == "resume":
+                await resume_stream(db, subscriber, room_id, message_data)
+                continue
+            
+            if role == "viewer":
+                await subscriber.send({
+                    "type": "error",
+                    "content": "Viewers cannot send messages"
+                })
+                continue
+            
+            # 메시지 제한 (IP별, 채팅방별): 거부되면 이 연결에만 알리고 처리하지 않음 (어느 한도도 소모하지 않음)
+            if msg_type != "phase_transition":
+                limiter, retry_after = check_all([(ws_ip_limiter, ip), (ws_room_limiter, room_id)])
+                if retry_after:
+                    scope = "ip" if limiter is ws_ip_limiter else "room"
+                    ws_log.warning(f"⏳ 메시지 제한 ({scope}, {retry_after:.1f}초 후 가능)")
+                    await subscriber.send({
+                        "type": "rate_limited",
+                        "scope": scope,
+                        "retry_after": round(retry_after, 1),
+                        "error": f"메시지를 너무 자주 보냈습니다. {math.ceil(retry_after)}초 후 다시 시도하세요"
+                    })
+                    continue
+            
+            # 여러 기기에서 동시에 보내도 생성은 방마다 하나씩 (다른 기기의 생성이 끝날 때까지 대기)
+            turn_started = time.perf_counter()
+            turn_trace = tracer.start("ws.turn", room_id=room_id, type=msg_type, phase=room.learning_phase)
+            with span("generation_lock.wait"):
+                await generation_lock.acquire()
+            holding_lock = True
+            db.refresh(room)
             
             if msg_type == "phase_transition":
                 # 단계 전환 요청
@@ -392,7 +1083,7 @@ async def websocket_endpoint_with_feynman(
                 room.learning_phase = next_phase.value
                 db.commit()
                 
-                await websocket.send_json({
+                room_hub.publish(room_id, {
                     "type": "phase_changed",
                     "phase": next_phase.value,
                     "instruction": flow_manager.get_phase_instruction(next_phase),
@@ -404,7 +1095,7 @@ async def websocket_endpoint_with_feynman(
             try:
                 user_message = message_data["message"]
             except KeyError as e:
-                await websocket.send_json({
+                await subscriber.send({
                     "type": "error",
                     "content": "Invalid message format"
                 })
@@ -412,17 +1103,33 @@ async def websocket_endpoint_with_feynman(
 
             # RAG 컨텍스트 검색 (추가)
             rag_context = ""
+            contexts = []
             if rag_system.has_pdf(room_id):
-                contexts = rag_system.search(room_id, user_message, n_results=5)
+                # 하이브리드 검색으로 작은 청크 몇 개만 정확하게 가져옴
+                with span("rag.search"):
+                    contexts = await rag_system.asearch(room_id, user_message, n_results=3)
                 if contexts:
-                    rag_context = "\n\n**참고 자료:**\n"
-                    for ctx in contexts:
-                        rag_context += f"[Page {ctx['page']}] {ctx['content'][:200]}...\n\n"
-                    print(f"📚 RAG 컨텍스트 추가됨 ({len(contexts)}개)")
+                    # 질문과 관련된 문장만 골라 예산 안에서 페이지별로 구성
+                    with span("rag.context_build"):
+                        snippets = await context_builder.abuild(user_message, contexts)
+                    if snippets:
+                        rag_context = f"\n\n**참고 자료:**\n{snippets}\n\n"
+                        ws_log.info(f"📚 RAG 컨텍스트 추가됨 ({len(contexts)}개 청크 → {len(snippets)}자)")
             
             # 현재 학습 단계 확인
             db.refresh(room)  # DB 
             current_phase = LearningPhase(room.learning_phase or "home")
+            bind_context(phase=current_phase.value)
+            
+            # 사용자 설명 분석 (설명 단계인 경우, 메시지와 함께 저장)
+            analysis = None
+            if current_phase in [LearningPhase.FIRST_EXPLANATION, LearningPhase.SECOND_EXPLANATION]:
+                # 커버리지 비교 대상: AI 설명 + 검색된 PDF 청크 (임베딩 계산은 스레드에서)
+                references = build_references(latest_ai_explanation(db, room_id), contexts)
+                # to_thread는 로그/메트릭 컨텍스트(room_id, phase)를 스레드로 넘겨줌
+                with span("evaluation.analyze"):
+                    analysis = await asyncio.to_thread(evaluator.analyze_explanation, user_message, references)
+                ws_log.info(f"📊 설명 분석 완료 ({analysis['understanding']['details']['method']})")
             
             # 사용자 메시지 저장 (단계 정보 포함)
             user_msg = models.Message(
@@ -435,24 +1142,36 @@ async def websocket_endpoint_with_feynman(
                     LearningPhase.SECOND_EXPLANATION
                 ]) if hasattr(models.Message, 'is_explanation') else None
             )
+            if analysis:
+                user_msg.analysis = evaluator.compact_analysis(analysis)
+                user_msg.analysis_version = ANALYSIS_VERSION
+                user_msg.analyzed_at = datetime.utcnow()
             db.add(user_msg)
             db.commit()
-            print(f"💾 사용자 메시지 저장됨 (단계: {current_phase.value})")
+            ws_log.info("💾 사용자 메시지 저장됨")
+            
+            # 같은 방의 다른 기기/관찰자 화면에도 사용자 메시지 표시
+            room_hub.publish(room_id, {
+                "type": "user_message",
+                "content": user_message,
+                "message_id": user_msg.id,
+                "phase": current_phase.value
+            }, exclude=subscriber)
             
             if current_phase == LearningPhase.HOME:
                 # 키워드 추출
-                concept_keyword = await extract_concept_keyword(user_message)
+                with span("llm.keyword"):
+                    concept_keyword = await extract_concept_keyword(user_message, room_id)
 
                 # 개념 저장
                 room.current_concept = user_message
                 room.learning_phase = LearningPhase.KNOWLEDGE_CHECK.value
                 db.commit()
     
-                print(f"💾 개념 저장: '{concept_keyword}'")
-                print(f"🔄 단계 전환: HOME → KNOWLEDGE_CHECK")
+                ws_log.info(f"💾 개념 저장: '{concept_keyword}', 단계 전환: HOME → KNOWLEDGE_CHECK")
     
             # AI 응답 없이 바로 단계 전환 알림
-                await websocket.send_json({
+                room_hub.publish(room_id, {
                     "type": "phase_changed",
                     "phase": LearningPhase.KNOWLEDGE_CHECK.value,
                     "instruction": flow_manager.get_phase_instruction(LearningPhase.KNOWLEDGE_CHECK),
@@ -461,8 +1180,10 @@ async def websocket_endpoint_with_feynman(
     
                 # 단순 안내 메시지만 전송
                 simple_response = f"'{concept_keyword}'에 대해 학습하시는군요! 이 개념에 대해 얼마나 알고 계신가요?"
+                stream = stream_registry.begin(room_id, LearningPhase.KNOWLEDGE_CHECK.value)
     
                 ai_msg = models.Message(
+                    id=stream.message_id,
                     room_id=room_id,
                     role="assistant",
                     content=simple_response,
@@ -472,95 +1193,134 @@ async def websocket_endpoint_with_feynman(
                 room.updated_at = datetime.utcnow()
                 db.commit()
     
-                await websocket.send_json({
-                    "type": "stream",
-                    "content": simple_response,
-                    "phase": LearningPhase.KNOWLEDGE_CHECK.value
-                })
+                room_hub.publish(room_id, stream.append(simple_response))
+                room_hub.publish(room_id, stream.finish())
     
-                await websocket.send_json({
-                    "type": "complete",
-                    "phase": LearningPhase.KNOWLEDGE_CHECK.value
-                })
-    
-                print("✅ KNOWLEDGE_CHECK 단계로 전환 완료")
+                ws_log.info("✅ KNOWLEDGE_CHECK 단계로 전환 완료")
                 continue  # Ollama 호출 없이 다음 메시지 대기
 
 
-            # 사용자 설명 분석 (설명 단계인 경우)
-            analysis = None
-            if current_phase in [LearningPhase.FIRST_EXPLANATION, LearningPhase.SECOND_EXPLANATION]:
-                analysis = evaluator.analyze_explanation(user_message)
-                print(f"📊 설명 분석 완료")
+            # 평가 단계: 저장된 첫 번째/두 번째 설명 분석을 비교 (다시 분석하거나 LLM에 기록을 읽히지 않음)
+            improvement = None
+            if current_phase == LearningPhase.EVALUATION:
+                first_analysis = await latest_explanation_analysis(db, room_id, LearningPhase.FIRST_EXPLANATION)
+                second_analysis = await latest_explanation_analysis(db, room_id, LearningPhase.SECOND_EXPLANATION)
+                if first_analysis and second_analysis:
+                    improvement = evaluator.compare_analyses(first_analysis, second_analysis)
+                    ws_log.info(f"📈 설명 비교: 개선 {improvement['improved']}, 후퇴 {improvement['regressed']}")
+            
+            # 구조화 평가: 짧은 JSON을 생성/검증해 서버에서 텍스트로 렌더링 (긴 서술형 스트리밍 대신)
+            if current_phase == LearningPhase.EVALUATION and EVALUATION_MODE == "structured":
+                with span("llm.structured_evaluation"):
+                    reply = await structured_evaluation_reply(
+                        db, room, user_msg.id,
+                        evaluator.format_comparison(improvement) if improvement else None
+                    )
+                if reply:
+                    evaluation_text = render_evaluation(reply["evaluation"])
+                    stream = stream_registry.begin(room_id, current_phase.value)
+                    ai_msg = models.Message(
+                        id=stream.message_id,
+                        room_id=room_id,
+                        role="assistant",
+                        content=evaluation_text,
+                        phase=current_phase.value
+                    )
+                    db.add(ai_msg)
+                    room.updated_at = datetime.utcnow()
+                    db.commit()
+                    
+                    room_hub.publish(room_id, stream.append(evaluation_text))
+                    room_hub.publish(room_id, stream.finish(
+                        evaluation=reply["evaluation"],
+                        evaluation_id=reply["evaluation_id"]
+                    ))
+                    continue
             
             # 컨텍스트 준비
             context = {
                 "concept": room.current_concept if hasattr(room, 'current_concept') else None,
                 "knowledge_level": room.knowledge_level if hasattr(room, 'knowledge_level') else 0,
                 "analysis": analysis,
+                "improvement": improvement,
+                "improvement_summary": evaluator.format_comparison(improvement) if improvement else None,
                 "phase": current_phase.value
             }
             
             # 파인만 프롬프트 가져오기
-            system_prompt = feynman_engine.get_prompt_for_phase(current_phase, context)
+            with span("prompt.build"):
+                system_prompt = feynman_engine.get_prompt_for_phase(current_phase, context)
             
-            # Ollama API 호출
+            # Ollama API 호출 (단계별 라우트: 모델, 토큰 예산, stop, temperature)
             ai_response = ""
+            route = model_router.route("chat", current_phase)
+            # 응답 id는 스트림 시작 시 정함 (끊긴 클라이언트가 이 id와 offset으로 이어받음)
+            stream = stream_registry.begin(room_id, current_phase.value)
             try:
                 async with httpx.AsyncClient() as client:
-                    print("🤖 Ollama 요청 중 (파인만 모드)...")
+                    llm_log.info(f"🤖 Ollama 요청 중 (파인만 모드, {route['model']}, 최대 {route['num_predict']} 토큰)")
                     
                     # Ollama에 시스템 프롬프트 포함
                     if rag_context:
                         full_prompt = f"{system_prompt}\n\n{rag_context}\n\n사용자: {user_message}\n\nAI:"
                     else:
                         full_prompt = f"{system_prompt}\n\n사용자: {user_message}\n\nAI:"
-                    print(f"📝 프롬프트 길이: {len(full_prompt)} 문자")
-                    print(f"📝 프롬프트 미리보기:\n{full_prompt[:500]}...")
+                    # 프롬프트 본문은 prompt 카테고리가 DEBUG일 때만 (길이 제한)
+                    log_prompt(prompt_log, full_prompt, model=route["model"])
                     
-                    async with client.stream(
-                        "POST",
-                        "http://localhost:11434/api/generate",
-                        json={
-                            "model": "llama3.1:8b",
-                            "prompt": full_prompt,
-                            "stream": True
-                        },
-                        timeout=httpx.Timeout(300.0, connect=60.0)
-                    ) as response:
+                    # 공유 Ollama 생성 슬롯 (대기 중이면 채팅방 라운드 로빈으로 차례를 받음)
+                    async with generation_scheduler.slot(room_id):
+                        start = time.perf_counter()
+                        first_token_at = None
+                        async with client.stream(
+                            "POST",
+                            f"{OLLAMA_URL}/api/generate",
+                            json=model_router.request_body(route, full_prompt, stream=True),
+                            timeout=httpx.Timeout(300.0, connect=60.0)
+                        ) as response:
                         
-                        print(f"📡 Ollama 응답 상태: {response.status_code}")
+                            llm_log.info(f"📡 Ollama 응답 상태: {response.status_code}", extra={"prompt_chars": len(full_prompt)})
+                            ollama_responses_total.inc(route=route["key"], status=response.status_code)
                         
-                        if response.status_code != 200:
-                            await websocket.send_json({
-                                "type": "error",
-                                "content": f"Ollama error: {response.status_code}"
-                            })
-                            continue
+                            if response.status_code != 200:
+                                stream.abort(f"Ollama error: {response.status_code}")
+                                await subscriber.send({
+                                    "type": "error",
+                                    "content": f"Ollama error: {response.status_code}"
+                                })
+                                continue
                         
-                        async for line in response.aiter_lines():
-                            if line.strip():
-                                try:
-                                    chunk_data = json.loads(line)
+                            async for line in response.aiter_lines():
+                                if line.strip():
+                                    try:
+                                        chunk_data = json.loads(line)
                                     
-                                    if "response" in chunk_data:
-                                        chunk = chunk_data["response"]
-                                        ai_response += chunk
+                                        if "response" in chunk_data:
+                                            chunk = chunk_data["response"]
+                                            ai_response += chunk
                                         
-                                        await websocket.send_json({
-                                            "type": "stream",
-                                            "content": chunk,
-                                            "phase": current_phase.value
-                                        })
+                                            if first_token_at is None:
+                                                # 요청부터 첫 토큰까지 = Ollama 대기(모델 로드, 큐, 프롬프트 처리)
+                                                first_token_at = time.perf_counter()
+                                                ws_first_token_seconds.observe(first_token_at - turn_started)
+                                                tracer.record_span("ollama.wait", start, first_token_at, model=route["model"])
+                                            room_hub.publish(room_id, stream.append(chunk))
                                     
-                                    if chunk_data.get("done", False):
-                                        break
+                                        if chunk_data.get("done", False):
+                                            model_router.record(route, current_phase, time.perf_counter() - start, chunk_data)
+                                            if first_token_at is not None:
+                                                tracer.record_span(
+                                                    "ollama.stream", first_token_at, time.perf_counter(),
+                                                    tokens=chunk_data.get("eval_count")
+                                                )
+                                            break
                                         
-                                except json.JSONDecodeError:
-                                    continue
+                                    except json.JSONDecodeError:
+                                        continue
                 
                 # AI 응답 저장
                 ai_msg = models.Message(
+                    id=stream.message_id,
                     room_id=room_id,
                     role="assistant",
                     content=ai_response,
@@ -569,47 +1329,33 @@ async def websocket_endpoint_with_feynman(
                 db.add(ai_msg)
                 room.updated_at = datetime.utcnow()
                 db.commit()
-                print(f"💾 AI 응답 저장됨 (단계: {current_phase.value})")
-                
-                # 평가 단계인 경우 평가 결과 저장
-                if current_phase == LearningPhase.EVALUATION and analysis:
-                    if hasattr(models, 'LearningEvaluation'):
-                        evaluation = models.LearningEvaluation(
-                            room_id=room_id,
-                            message_id=user_msg.id,
-                            strengths=analysis.get("strengths", []),
-                            weaknesses=analysis.get("weaknesses", []),
-                            suggestions=analysis.get("suggestions", [])
-                        )
-                        db.add(evaluation)
-                        db.commit()
-                        print(f"📊 평가 결과 저장됨")
+                ws_log.info("💾 AI 응답 저장됨", extra={"chars": len(ai_response)})
                 
-                await websocket.send_json({
-                    "type": "complete",
-                    "phase": current_phase.value
-                })
-                print("✉️ 완료 신호 전송")
+                room_hub.publish(room_id, stream.finish())
                 
             except Exception as e:
-                import traceback
-                error_detail = traceback.format_exc()
-                print(f"❌ 처리 오류 발생!")
-                print(f"❌ 에러 타입: {type(e).__name__}")
-                print(f"❌ 에러 메시지: {str(e)}")
-                print(f"❌ 상세 스택:")
-                print(error_detail)
-    
-                await websocket.send_json({
+                ws_log.exception(f"❌ 처리 오류 발생: {type(e).__name__}: {e}")
+                stream.abort(f"Error: {str(e)}")
+    
+                await subscriber.send({
                     "type": "error",
                     "content": f"Error: {str(e)}"
                 })
                 
     except WebSocketDisconnect:
-        print(f"🔌 WebSocket 연결 끊김 (Room: {room_id})")
+        ws_log.info("🔌 WebSocket 연결 끊김")
     except Exception as e:
-        print(f"❌ WebSocket 오류: {e}")
+        ws_log.exception(f"❌ WebSocket 오류: {e}")
     finally:
+        if holding_lock:
+            generation_lock.release()
+            ws_turn_seconds.observe(time.perf_counter() - turn_started)
+        tracer.finish(turn_trace)
+        if generation_lock is not None:
+            room_hub.release_generation_lock(room_id)
+        if subscriber is not None:
+            await room_hub.unsubscribe(subscriber)
+            room_hub.publish(room_id, {"type": "presence", **room_hub.room_info(room_id)})
         db.close()
 
 if __name__ == "__main__":
@@ -626,4 +1372,4 @@ if __name__ == "__main__":
     print(f"  - 단계 전환: POST /api/learning/transition")
     print("="*50)
     
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info", ws_per_message_deflate=WS_PER_MESSAGE_DEFLATE)
\ No newline at end of file
@@ -0,0 +1,142 @@
+# backend/stream_buffer.py
+# AI 응답 스트림 재전송 버퍼: 연결이 끊긴 클라이언트가 받은 위치(offset)부터 나머지를 이어받음
+#
+# - 응답마다 스트림 시작 시 message_id를 정하고(DB에 저장되는 assistant 메시지 id와 같음),
+#   stream 프레임마다 응답 텍스트 안의 시작 위치(글자 단위 offset)를 붙입니다.
+# - 재접속한 클라이언트는 {"type": "resume", "message_id": ..., "offset": 받은 글자 수}를 보내면
+#   빠진 뒷부분을 받고, 생성이 아직 진행 중이면 이후 프레임을 그대로 이어서 받습니다.
+# - 재접속 직후에는 라이브 프레임과 재전송 구간이 겹치거나 재전송보다 먼저 도착할 수 있으므로, 클라이언트는
+#   offset이 받은 글자 수보다 크면 버리고(재전송 프레임에 포함됨) 이미 받은 앞부분은 잘라내고 붙입니다.
+# - offset 단위는 유니코드 코드 포인트 (Python len, Dart의 String.runes 길이)
+import os
+import threading
+import uuid
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Tuple
+
+# 메시지당 보관하는 최대 글자 수 (넘으면 앞부분부터 버림, 완료된 응답은 DB에서 복원)
+STREAM_BUFFER_CHARS = int(os.getenv("STREAM_BUFFER_CHARS", "65536"))
+# 서버 전체에서 보관하는 스트림 수 (넘으면 완료된 스트림부터 버림)
+STREAM_BUFFER_MESSAGES = int(os.getenv("STREAM_BUFFER_MESSAGES", "256"))
+
+class StreamTruncated(Exception):
+    """요청한 offset이 이미 링 버퍼에서 밀려남"""
+
+class StreamBuffer:
+    """응답 하나의 청크 링 버퍼"""
+
+    def __init__(self, room_id: str, phase: str, message_id: Optional[str] = None, max_chars: int = STREAM_BUFFER_CHARS):
+        self.message_id = message_id or str(uuid.uuid4())
+        self.room_id = room_id
+        self.phase = phase
+        self.max_chars = max_chars
+        self.chunks: Deque[Tuple[int, str]] = deque()
+        self.base_offset = 0    # 버퍼에 남아 있는 첫 글자의 offset
+        self.length = 0         # 지금까지 생성된 전체 글자 수
+        self.done = False
+        self.complete_frame: Optional[Dict] = None
+
+    def append(self, text: str) -> Dict:
+        """청크를 버퍼에 추가하고 보낼 stream 프레임 반환"""
+        offset = self.length
+        self.chunks.append((offset, text))
+        self.length += len(text)
+        while self.chunks and self.length - self.chunks[0][0] > self.max_chars and len(self.chunks) > 1:
+            dropped_offset, dropped = self.chunks.popleft()
+            self.base_offset = dropped_offset + len(dropped)
+        return self.frame(text, offset)
+
+    def frame(self, text: str, offset: int) -> Dict:
+        """offset 위치부터의 텍스트를 담은 stream 프레임"""
+        return {
+            "type": "stream",
+            "content": text,
+            "phase": self.phase,
+            "message_id": self.message_id,
+            "offset": offset,
+        }
+
+    def finish(self, **extra) -> Dict:
+        """스트림 종료, 보낼 complete 프레임 반환 (재접속 시 다시 보냄)"""
+        self.done = True
+        self.complete_frame = {
+            "type": "complete",
+            "phase": self.phase,
+            "message_id": self.message_id,
+            "length": self.length,
+            **extra,
+        }
+        return self.complete_frame
+
+    def abort(self, reason: str) -> Dict:
+        """생성 실패로 스트림 종료 (재접속한 클라이언트에는 오류 프레임을 보냄)"""
+        self.done = True
+        self.complete_frame = {
+            "type": "error",
+            "content": reason,
+            "phase": self.phase,
+            "message_id": self.message_id,
+        }
+        return self.complete_frame
+
+    def read_from(self, offset: int) -> str:
+        """offset 이후의 텍스트 (버퍼에서 이미 밀려난 구간이면 StreamTruncated)"""
+        if offset < self.base_offset:
+            raise StreamTruncated(self.message_id)
+        parts = []
+        for chunk_offset, text in self.chunks:
+            end = chunk_offset + len(text)
+            if end <= offset:
+                continue
+            parts.append(text[max(0, offset - chunk_offset):])
+        return "".join(parts)
+
+class StreamRegistry:
+    """message_id → StreamBuffer (오래된 완료 스트림부터 제거)"""
+
+    def __init__(self, max_messages: int = STREAM_BUFFER_MESSAGES):
+        self.max_messages = max_messages
+        self._buffers: "OrderedDict[str, StreamBuffer]" = OrderedDict()
+        self._latest_by_room: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def begin(self, room_id: str, phase: str) -> StreamBuffer:
+        buffer = StreamBuffer(room_id, phase)
+        with self._lock:
+            self._buffers[buffer.message_id] = buffer
+            self._latest_by_room[room_id] = buffer.message_id
+            while len(self._buffers) > self.max_messages:
+                evicted = self._buffers.pop(self._eviction_candidate())
+                if self._latest_by_room.get(evicted.room_id) == evicted.message_id:
+                    del self._latest_by_room[evicted.room_id]
+        return buffer
+
+    def _eviction_candidate(self) -> str:
+        """제거할 스트림: 가장 오래된 완료 스트림 (완료된 응답은 DB에서 복원 가능)
+
+        생성 중인 스트림은 이어받을 곳이 버퍼뿐이므로, 모두 생성 중일 때만 가장 오래된 것을 제거
+        """
+        for message_id, buffer in self._buffers.items():
+            if buffer.done:
+                return message_id
+        return next(iter(self._buffers))
+
+    def get(self, room_id: str, message_id: Optional[str] = None) -> Optional[StreamBuffer]:
+        """채팅방의 스트림 (message_id가 없으면 가장 최근 스트림)"""
+        with self._lock:
+            message_id = message_id or self._latest_by_room.get(room_id)
+            buffer = self._buffers.get(message_id) if message_id else None
+        if buffer is None or buffer.room_id != room_id:
+            return None
+        return buffer
+
+    def stats(self) -> Dict:
+        with self._lock:
+            buffers = list(self._buffers.values())
+        return {
+            "streams": len(buffers),
+            "active": sum(1 for buffer in buffers if not buffer.done),
+            "buffered_chars": sum(buffer.length - buffer.base_offset for buffer in buffers),
+        }
+
+stream_registry = StreamRegistry()
@@ -0,0 +1,165 @@
+# backend/structured_evaluation.py
+# 종합 평가를 Ollama JSON 스키마 출력으로 받아 검증/캐시하고 서버에서 텍스트로 렌더링
+import hashlib
+import json
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from feynman_prompts import LearningPhase
+from log_config import get_logger
+from metrics import ollama_responses_total
+from model_router import OLLAMA_URL, model_router
+
+# 스키마나 프롬프트를 바꾸면 올림 (입력 해시에 포함되어 이전 캐시를 무효화)
+EVALUATION_SCHEMA_VERSION = 1
+
+LEVELS = ["low", "medium", "high"]
+
+DIMENSIONS = {
+    "understanding": "이해도",
+    "expression": "표현력",
+    "application": "응용력",
+    "metacognition": "메타인지 능력",
+    "knowledge_level": "배경 지식 수준",
+}
+
+# 필드별 길이 제한 (스키마에도 반영해 생성 단계에서 짧게 유도하고, 검증 단계에서 한 번 더 자름)
+MAX_EVIDENCE_ITEMS = 3
+MAX_EVIDENCE_CHARS = 120
+MAX_SUGGESTION_CHARS = 160
+MAX_SUMMARY_CHARS = 200
+
+def _dimension_schema() -> Dict:
+    return {
+        "type": "object",
+        "properties": {
+            "level": {"type": "string", "enum": LEVELS},
+            "evidence": {
+                "type": "array",
+                "items": {"type": "string", "maxLength": MAX_EVIDENCE_CHARS},
+                "maxItems": MAX_EVIDENCE_ITEMS,
+            },
+            "suggestion": {"type": "string", "maxLength": MAX_SUGGESTION_CHARS},
+        },
+        "required": ["level", "evidence", "suggestion"],
+    }
+
+EVALUATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        **{name: _dimension_schema() for name in DIMENSIONS},
+        "summary": {"type": "string", "maxLength": MAX_SUMMARY_CHARS},
+    },
+    "required": list(DIMENSIONS) + ["summary"],
+}
+
+class EvaluationValidationError(ValueError):
+    """LLM 출력이 평가 스키마와 맞지 않음"""
+
+def evaluation_input_hash(model: str, inputs: Dict) -> str:
+    """평가 입력(모델, 스키마 버전, 설명/비교 결과) 해시 (캐시 키)"""
+    payload = json.dumps(
+        {"model": model, "schema_version": EVALUATION_SCHEMA_VERSION, "inputs": inputs},
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def build_evaluation_prompt(inputs: Dict) -> str:
+    """구조화 평가 프롬프트 (결과는 JSON 스키마로만 받음)"""
+    improvement = inputs.get("improvement_summary")
+    improvement_block = f"\n첫 번째 → 두 번째 설명 분석 비교:\n{improvement}\n" if improvement else ""
+    return f"""당신은 파인만 학습법 평가자입니다. 학생의 두 번의 설명을 비교해 평가하세요.
+
+개념: {inputs.get('concept') or '알 수 없음'}
+
+첫 번째 설명:
+{inputs.get('first_explanation') or '(없음)'}
+
+두 번째 설명:
+{inputs.get('second_explanation') or '(없음)'}
+{improvement_block}
+평가 항목: {', '.join(f'{name}({label})' for name, label in DIMENSIONS.items())}
+
+규칙:
+- 각 항목의 level은 low/medium/high 중 하나 (점수 사용 금지)
+- evidence는 학생 설명에서 찾은 구체적 근거를 최대 {MAX_EVIDENCE_ITEMS}개, 각각 한 문장으로
+- suggestion은 구체적인 개선 방법 한 문장
+- summary는 격려를 담은 한두 문장
+- 모든 문장은 한국어로 짧게
+"""
+
+def _clip(text, limit: int) -> str:
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+def validate_evaluation(data) -> Dict:
+    """스키마 검증 + 필드별 길이 제한 적용 (형식이 틀리면 EvaluationValidationError)"""
+    if not isinstance(data, dict):
+        raise EvaluationValidationError("평가 결과가 객체가 아닙니다")
+
+    result = {}
+    for name in DIMENSIONS:
+        dimension = data.get(name)
+        if not isinstance(dimension, dict):
+            raise EvaluationValidationError(f"{name} 항목이 없습니다")
+        level = str(dimension.get("level", "")).strip().lower()
+        if level not in LEVELS:
+            raise EvaluationValidationError(f"{name}.level 값이 올바르지 않습니다: {level}")
+        evidence = dimension.get("evidence") or []
+        if not isinstance(evidence, list):
+            raise EvaluationValidationError(f"{name}.evidence는 목록이어야 합니다")
+        result[name] = {
+            "level": level,
+            "evidence": [_clip(item, MAX_EVIDENCE_CHARS) for item in evidence if str(item).strip()][:MAX_EVIDENCE_ITEMS],
+            "suggestion": _clip(dimension.get("suggestion"), MAX_SUGGESTION_CHARS),
+        }
+    result["summary"] = _clip(data.get("summary"), MAX_SUMMARY_CHARS)
+    return result
+
+def render_evaluation(evaluation: Dict) -> str:
+    """구조화 평가를 채팅에 보여줄 텍스트로 렌더링"""
+    level_labels = {"low": "보완 필요", "medium": "양호", "high": "우수"}
+    sections = []
+    for name, label in DIMENSIONS.items():
+        dimension = evaluation[name]
+        lines = [f"**{label}** ({level_labels[dimension['level']]})"]
+        lines.extend(f"- {item}" for item in dimension["evidence"])
+        if dimension["suggestion"]:
+            lines.append(f"👉 {dimension['suggestion']}")
+        sections.append("\n".join(lines))
+    if evaluation.get("summary"):
+        sections.append(evaluation["summary"])
+    return "\n\n".join(sections)
+
+def evaluation_route() -> Dict:
+    """구조화 평가 라우트 (모델/토큰 예산은 model_router에서 관리)"""
+    return model_router.route("evaluation", LearningPhase.EVALUATION)
+
+async def generate_structured_evaluation(inputs: Dict, route: Optional[Dict] = None, retries: int = 1) -> Dict:
+    """Ollama에 JSON 스키마 출력으로 평가 요청 (검증 실패 시 retries번 재시도)"""
+    route = route or evaluation_route()
+    prompt = build_evaluation_prompt(inputs)
+    last_error: Optional[Exception] = None
+
+    async with httpx.AsyncClient() as client:
+        for _ in range(retries + 1):
+            start = time.perf_counter()
+            response = await client.post(
+                f"{OLLAMA_URL}/api/generate",
+                json=model_router.request_body(route, prompt, stream=False, format=EVALUATION_SCHEMA),
+                timeout=httpx.Timeout(300.0, connect=60.0)
+            )
+            ollama_responses_total.inc(phase=LearningPhase.EVALUATION.value, route=route["key"], status=response.status_code)
+            response.raise_for_status()
+            result = response.json()
+            model_router.record(route, LearningPhase.EVALUATION, time.perf_counter() - start, result)
+            try:
+                return validate_evaluation(json.loads(result.get("response", "")))
+            except (json.JSONDecodeError, EvaluationValidationError) as e:
+                last_error = e
+                get_logger("llm").warning(f"⚠️ 구조화 평가 검증 실패: {e}")
+
+    raise EvaluationValidationError(f"구조화 평가 생성 실패: {last_error}")
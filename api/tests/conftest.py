@@ -0,0 +1,32 @@
+# backend/tests/conftest.py
+# 백엔드 모듈은 api/ 디렉토리 기준으로 import하므로 경로에 추가
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashlib
+
+import numpy as np
+import pytest
+
+from embedding_backends import EmbeddingBackend
+from lexical_index import tokenize
+
+class HashEmbeddingBackend(EmbeddingBackend):
+    """테스트용 결정적 임베딩 (토큰 해시 bag-of-words, 모델 다운로드 없음)"""
+
+    def __init__(self):
+        super().__init__("minilm")
+
+    def _encode(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                vectors[row, int(hashlib.md5(token.encode("utf-8")).hexdigest(), 16) % self.dim] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-9)
+
+@pytest.fixture
+def hash_embedder():
+    return HashEmbeddingBackend()
@@ -0,0 +1,58 @@
+# backend/tests/test_batch_evaluation.py
+import os
+import subprocess
+import sys
+
+import batch_evaluation
+from batch_evaluation import EXIT_ALREADY_RUNNING, claim_job, read_job_status, release_job, run_job, split_rows
+
+API_DIR = os.path.dirname(os.path.abspath(batch_evaluation.__file__))
+
+def test_import_does_not_load_db_or_rag_modules():
+    # spawn 풀 워커는 메인 모듈(batch_evaluation.py)을 다시 가져오므로 모듈 수준에서 DB/RAG를 가져오면 안 됨
+    code = (
+        "import sys, batch_evaluation; "
+        "print(sorted(m for m in ('database', 'models', 'rag_system', 'server', 'chromadb') if m in sys.modules))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=API_DIR)
+    assert output.stdout.strip() == "[]"
+
+def test_split_rows_covers_every_row():
+    rows = [(str(i), f"설명 {i}") for i in range(7)]
+    parts = split_rows(rows, 3)
+    assert len(parts) == 3
+    assert [row for part in parts for row in part] == rows
+
+def test_job_status_is_shared_through_file(tmp_path):
+    path = str(tmp_path / "status.json")
+    assert read_job_status(path) == {"status": "idle"}
+
+    job = {"started_at": "now"}
+    assert claim_job(job, path)
+    # 다른 서버 워커도 같은 파일을 읽으므로 실행 중으로 보이고 새 작업은 거절됨
+    assert read_job_status(path)["status"] == "running"
+    assert not claim_job({"started_at": "later"}, path)
+
+    job.update({"status": "completed"})
+    release_job(job, path)
+    assert read_job_status(path)["status"] == "completed"
+    assert claim_job({"started_at": "again"}, path)
+
+def test_dead_owner_does_not_block_new_job(tmp_path):
+    path = str(tmp_path / "status.json")
+    # 재채점하던 워커가 죽어 잠금/상태 파일만 남은 경우
+    dead_pid = 2 ** 22 + 12345
+    with open(f"{path}.lock", "w") as lock_file:
+        lock_file.write(str(dead_pid))
+    with open(path, "w") as status_file:
+        status_file.write(f'{{"status": "running", "pid": {dead_pid}}}')
+
+    assert read_job_status(path)["status"] == "interrupted"
+    assert claim_job({"started_at": "now"}, path)
+    assert read_job_status(path)["pid"] == os.getpid()
+
+def test_run_job_refuses_while_another_job_runs(tmp_path):
+    path = str(tmp_path / "status.json")
+    assert claim_job({"job_id": "first"}, path)
+    assert run_job(job_id="second", status_path=path) == EXIT_ALREADY_RUNNING
+    assert read_job_status(path)["job_id"] == "first"
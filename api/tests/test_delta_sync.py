@@ -0,0 +1,34 @@
+# backend/tests/test_delta_sync.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("sqlalchemy")
+
+from delta_sync import etag_matches, make_etag, normalize_since
+
+def test_make_etag_is_quoted_and_depends_on_every_part():
+    etag = make_etag("room", 3)
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == make_etag("room", 3)
+    assert etag != make_etag("room", 4)
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"other", "abc"', True),
+    ('"other"', False),
+    ("*", True),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"abc"') is expected
+
+def test_normalize_since_converts_to_naive_utc():
+    aware = datetime(2024, 1, 1, 9, 0, tzinfo=timezone(timedelta(hours=9)))
+    assert normalize_since(aware) == datetime(2024, 1, 1, 0, 0)
+    naive = datetime(2024, 1, 1, 0, 0)
+    assert normalize_since(naive) is naive
+    assert normalize_since(None) is None
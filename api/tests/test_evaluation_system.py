@@ -0,0 +1,46 @@
+# backend/tests/test_evaluation_system.py
+from evaluation_system import FeynmanEvaluator, SEMANTIC_METRICS
+
+REFERENCE = "광합성은 빛 에너지를 화학 에너지로 바꾸는 과정입니다. 엽록체에서 이산화탄소와 물로 포도당을 만듭니다."
+FIRST = "광합성은 식물이 빛을 받아서 에너지를 만드는 과정입니다. 엽록체에서 일어납니다."
+SECOND = "광합성은 빛 에너지를 화학 에너지로 바꾸는 과정입니다. 엽록체에서 이산화탄소와 물로 포도당을 만듭니다. 잎은 마치 태양광 패널처럼 빛을 모읍니다."
+
+def test_compact_analysis_records_method(hash_embedder):
+    semantic = FeynmanEvaluator(embedder=hash_embedder)
+    heuristic = FeynmanEvaluator()
+    assert semantic.compact_analysis(semantic.analyze_explanation(FIRST, [REFERENCE]))["method"] == "embedding"
+    assert heuristic.compact_analysis(heuristic.analyze_explanation(FIRST))["method"] == "heuristic"
+
+def test_same_method_compares_semantic_metrics(hash_embedder):
+    evaluator = FeynmanEvaluator(embedder=hash_embedder)
+    first = evaluator.compact_analysis(evaluator.analyze_explanation(FIRST, [REFERENCE]))
+    second = evaluator.compact_analysis(evaluator.analyze_explanation(SECOND, [REFERENCE]))
+    comparison = evaluator.compare_analyses(first, second)
+    assert comparison["changes"]["coverage"]["status"] == "improved"
+    assert "coverage" in comparison["improved"]
+    assert all(comparison["changes"][name]["status"] != "incomparable" for name in SEMANTIC_METRICS)
+
+def test_mixed_methods_are_not_diffed(hash_embedder):
+    # 첫 번째는 휴리스틱(일관성 0.7 기본값), 두 번째는 임베딩으로 채점된 경우
+    heuristic = FeynmanEvaluator()
+    semantic = FeynmanEvaluator(embedder=hash_embedder)
+    first = heuristic.compact_analysis(heuristic.analyze_explanation(FIRST))
+    second = semantic.compact_analysis(semantic.analyze_explanation(SECOND, [REFERENCE]))
+    comparison = semantic.compare_analyses(first, second)
+
+    for name in SEMANTIC_METRICS + ("understanding",):
+        assert comparison["changes"][name]["status"] == "incomparable"
+        assert name not in comparison["improved"] + comparison["regressed"]
+    # 채점 방식과 무관한 항목은 그대로 비교
+    assert comparison["changes"]["analogies"]["status"] == "improved"
+    assert comparison["methods"] == ["heuristic", "embedding"]
+
+    text = semantic.format_comparison(comparison)
+    assert "논리적 일관성" not in text
+    assert "채점 방식이 달라" in text
+
+def test_analyses_without_method_are_not_diffed():
+    # method가 없는 예전 버전 분석
+    evaluator = FeynmanEvaluator()
+    comparison = evaluator.compare_analyses({"coherence": 0.7}, {"coherence": 0.9})
+    assert comparison["changes"]["coherence"]["status"] == "incomparable"
@@ -0,0 +1,50 @@
+# backend/tests/test_lexical_index.py
+from lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+def add_room(index: LexicalIndex, room_id: str, count: int = 20):
+    ids = [f"{room_id}_{i}" for i in range(count)]
+    texts = [f"자료구조 설명 {i} 스택과 큐는 선형 구조입니다 " * 5 for i in range(count)]
+    index.add(room_id, ids, texts, [{"page": i} for i in range(count)])
+
+def test_tokenize_uses_hangul_bigrams_and_words():
+    assert tokenize("자료구조는 Stack 2개") == ["자료", "료구", "구조", "조는", "stack", "2", "개"]
+
+def test_bm25_ranks_matching_chunk_first():
+    index = LexicalIndex()
+    index.add("room", ["a", "b", "c"], ["스택은 후입선출 구조", "큐는 선입선출 구조", "그래프 탐색"], [{}, {}, {}])
+    ranked = index.search("room", "후입선출 스택")
+    assert ranked[0][0] == "a"
+    assert "c" not in [chunk_id for chunk_id, _ in ranked]
+
+def test_reciprocal_rank_fusion_prefers_items_ranked_high_in_both():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "a", "d"]])
+    assert [item for item, _ in fused][:2] in (["a", "b"], ["b", "a"])
+    assert fused[-1][0] in ("c", "d")
+
+def test_rooms_are_evicted_by_memory_size():
+    index = LexicalIndex(max_bytes=200_000)
+    for n in range(20):
+        add_room(index, f"room{n}")
+    stats = index.stats()
+    assert stats["bytes"] <= 200_000
+    assert stats["evictions"] > 0
+    assert not index.has_room("room0")
+    assert index.has_room("room19")
+
+def test_update_skips_rooms_not_in_memory():
+    index = LexicalIndex()
+    index.update("missing", ["x"], ["스택"], [{}])
+    assert not index.has_room("missing")
+    add_room(index, "room", count=2)
+    index.update("room", ["extra"], ["그래프 탐색"], [{}])
+    assert index.get("room", "extra") == ("그래프 탐색", {})
+
+def test_drop_and_remove_release_memory():
+    index = LexicalIndex()
+    add_room(index, "room", count=5)
+    before = index.stats()["bytes"]
+    index.remove("room", ["room_0", "room_1"])
+    assert index.stats()["bytes"] < before
+    index.drop_room("room")
+    assert not index.has_room("room")
+    assert index.stats()["bytes"] == 0
@@ -0,0 +1,39 @@
+# backend/tests/test_migrate_rag_storage.py
+# 마이그레이션한 예전 청크를 서버의 문서 경로(remove_document)로 다룰 수 있는지 확인 (chromadb가 없으면 건너뜀)
+import pytest
+
+chromadb = pytest.importorskip("chromadb")
+pytest.importorskip("PyPDF2")
+
+from chromadb.config import Settings
+
+from migrate_rag_storage import chunk_metadata, legacy_doc_id, migrate
+from rag_chunks import chunk_content_hash
+from rag_system import RAGSystem
+
+def test_chunk_metadata_matches_index_schema():
+    metadata = chunk_metadata("room-1", "본문", {"page": 3, "doc_hash": "legacy"})
+    assert metadata == {
+        "page": 3,
+        "room_id": "room-1",
+        "doc_id": legacy_doc_id("room-1"),
+        "chunk_hash": chunk_content_hash("본문"),
+    }
+    assert chunk_metadata("room-1", "본문", {"page": 1, "doc_id": "doc-1"})["doc_id"] == "doc-1"
+    assert legacy_doc_id("room-1") == legacy_doc_id("room-1") != legacy_doc_id("room-2")
+
+def test_migrated_legacy_chunks_can_be_removed_by_document(hash_embedder):
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+    legacy = client.create_collection("room_room-1", embedding_function=None)
+    legacy.add(
+        ids=["room-1_page_1", "room-1_page_2"],
+        documents=["스택 설명", "큐 설명"],
+        metadatas=[{"page": 1}, {"page": 2}],
+        embeddings=[[0.1] * hash_embedder.dim, [0.2] * hash_embedder.dim],
+    )
+
+    result = migrate(client, shard_count=2, register_documents=False)
+    assert result["chunks"] == 2 and result["legacy_rooms"] == 1
+
+    rag = RAGSystem(storage_mode="shared", shard_count=2, client=client, embedder=hash_embedder)
+    assert rag.remove_document("room-1", legacy_doc_id("room-1")) == 2
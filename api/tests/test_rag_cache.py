@@ -0,0 +1,43 @@
+# backend/tests/test_rag_cache.py
+import numpy as np
+
+from rag_cache import MemoryBoundedLRU, copy_results, normalize_query
+
+def test_normalize_query_merges_near_duplicates():
+    assert normalize_query("  광합성이란   무엇인가요?? ") == normalize_query("광합성이란 무엇인가요")
+    assert normalize_query("ＡＴＰ는?") == "atp는"
+
+def test_lru_stays_within_byte_budget():
+    vector = np.zeros(256, dtype=np.float32)
+    cache = MemoryBoundedLRU("test", max_bytes=3000)
+    for i in range(5):
+        cache.put(("q", i), vector)
+    stats = cache.stats()
+    assert stats["bytes"] <= 3000
+    assert stats["evictions"] > 0
+    # 가장 최근 항목은 남고 가장 오래된 항목부터 제거
+    assert cache.get(("q", 4)) is not None
+    assert cache.get(("q", 0)) is None
+
+def test_recently_used_entry_survives_eviction():
+    vector = np.zeros(256, dtype=np.float32)
+    cache = MemoryBoundedLRU("test", max_bytes=2500)
+    cache.put("a", vector)
+    cache.put("b", vector)
+    cache.get("a")
+    cache.put("c", vector)
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+
+def test_oversized_put_drops_stale_value():
+    cache = MemoryBoundedLRU("test", max_bytes=2000)
+    cache.put("key", np.zeros(16, dtype=np.float32))
+    cache.put("key", np.zeros(4096, dtype=np.float32))
+    assert cache.get("key") is None
+    assert cache.stats()["bytes"] == 0
+
+def test_copy_results_isolates_cached_contexts():
+    cached = [{"content": "청크", "page": 1}]
+    copied = copy_results(cached)
+    copied[0]["content"] = "수정"
+    assert cached[0]["content"] == "청크"
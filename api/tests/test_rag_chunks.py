@@ -0,0 +1,70 @@
+# backend/tests/test_rag_chunks.py
+import os
+import subprocess
+import sys
+
+import rag_chunks
+from rag_chunks import classify_chunks, document_chunks, shard_name_for_room, split_into_chunks
+
+API_DIR = os.path.dirname(os.path.abspath(rag_chunks.__file__))
+
+def test_shard_name_is_stable_and_in_range():
+    names = {shard_name_for_room(f"room-{i}", 8) for i in range(200)}
+    assert names <= {f"rag_shard_{n}" for n in range(8)}
+    assert shard_name_for_room("room-1", 8) == shard_name_for_room("room-1", 8)
+
+def test_split_into_chunks_respects_size_and_sentence_boundaries():
+    text = " ".join(f"문장 {i}번은 설명입니다." for i in range(100))
+    chunks = split_into_chunks(text, chunk_size=200, overlap=40)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks[:-1])
+
+def test_short_and_empty_text():
+    assert split_into_chunks("  짧은 글  ") == ["짧은 글"]
+    assert split_into_chunks("   ") == []
+
+def test_import_has_no_heavy_side_effects():
+    """도구들이 가져다 쓰는 헬퍼 모듈은 chromadb/임베딩 모델을 불러오지 않아야 함"""
+    code = "import sys, rag_chunks; print(any(m in sys.modules for m in ('chromadb', 'sentence_transformers', 'rag_system')))"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=API_DIR)
+    assert output.stdout.strip() == "False"
+
+PAGES_V1 = [
+    {"page": 1, "text": "스택은 후입선출 자료구조입니다."},
+    {"page": 2, "text": "큐는 선입선출 자료구조입니다."},
+]
+
+def stored_metadata(chunks):
+    return {chunk_id: metadata for chunk_id, _, metadata in chunks}
+
+def test_chunk_ids_depend_only_on_content():
+    first = list(document_chunks("room", "doc", PAGES_V1))
+    again = list(document_chunks("room", "doc", PAGES_V1))
+    assert [chunk[0] for chunk in first] == [chunk[0] for chunk in again]
+    assert all("doc_hash" not in metadata for _, _, metadata in first)
+
+def test_revised_upload_keeps_unchanged_chunks_unchanged():
+    existing = stored_metadata(document_chunks("room", "doc", PAGES_V1))
+    revised = PAGES_V1 + [{"page": 3, "text": "그래프는 정점과 간선으로 이루어집니다."}]
+    added, moved, unchanged = classify_chunks(list(document_chunks("room", "doc", revised)), existing)
+    assert [chunk[2]["page"] for chunk in added] == [3]
+    assert moved == []
+    assert unchanged == 2
+
+def test_page_shift_is_reported_as_moved():
+    existing = stored_metadata(document_chunks("room", "doc", PAGES_V1))
+    shifted = [{"page": 1, "text": "표지"}] + [{**page, "page": page["page"] + 1} for page in PAGES_V1]
+    added, moved, unchanged = classify_chunks(list(document_chunks("room", "doc", shifted)), existing)
+    assert len(added) == 1
+    assert sorted(chunk[2]["page"] for chunk in moved) == [2, 3]
+    assert unchanged == 0
+
+def test_chunks_stored_with_legacy_doc_hash_are_not_moved():
+    """doc_hash가 청크 메타데이터에 들어 있던 이전 버전 청크도 그대로로 판단"""
+    existing = {
+        chunk_id: {**metadata, "doc_hash": "old-file-hash"}
+        for chunk_id, _, metadata in document_chunks("room", "doc", PAGES_V1)
+    }
+    added, moved, unchanged = classify_chunks(list(document_chunks("room", "doc", PAGES_V1)), existing)
+    assert (added, moved, unchanged) == ([], [], 2)
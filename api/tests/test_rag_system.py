@@ -0,0 +1,50 @@
+# backend/tests/test_rag_system.py
+# 실제 ChromaDB(메모리 클라이언트)로 RAGSystem 검색/색인 경로 확인 (chromadb가 없으면 건너뜀)
+import pytest
+
+chromadb = pytest.importorskip("chromadb")
+pytest.importorskip("PyPDF2")
+
+from chromadb.config import Settings
+
+from rag_system import RAGSystem
+
+PAGES = [
+    {"page": 1, "text": "스택은 나중에 넣은 것을 먼저 꺼내는 후입선출 자료구조입니다. 함수 호출 기록에 쓰입니다."},
+    {"page": 2, "text": "큐는 먼저 넣은 것을 먼저 꺼내는 선입선출 자료구조입니다. 작업 대기열에 쓰입니다."},
+]
+
+@pytest.fixture
+def client():
+    return chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+
+@pytest.fixture
+def rag(client, hash_embedder):
+    return RAGSystem(storage_mode="shared", shard_count=2, client=client, embedder=hash_embedder)
+
+def test_cached_search_does_not_touch_chroma(rag, monkeypatch):
+    rag.index_document("room-1", "doc-1", doc_hash="h1", pages=PAGES)
+    first = rag.search("room-1", "후입선출 스택")
+    assert first
+
+    calls = []
+    original = rag.client.get_collection
+    monkeypatch.setattr(rag.client, "get_collection", lambda *args, **kwargs: calls.append(args) or original(*args, **kwargs))
+    assert rag.search("room-1", "후입선출 스택") == first
+    assert calls == []
+
+def test_empty_room_is_rechecked_after_another_worker_uploads(rag, client, hash_embedder):
+    assert rag.search("room-2", "스택") == []
+    other_worker = RAGSystem(storage_mode="shared", shard_count=2, client=client, embedder=hash_embedder)
+    other_worker.index_document("room-2", "doc-1", doc_hash="h1", pages=PAGES)
+    assert rag.search("room-2", "스택")
+
+def test_reupload_with_extra_page_only_embeds_new_chunks(rag):
+    first = rag.index_document("room-3", "doc-1", doc_hash="h1", pages=PAGES)
+    assert first["added"] == first["chunks"]
+    revised = PAGES + [{"page": 3, "text": "그래프는 정점과 간선으로 이루어진 자료구조입니다."}]
+    second = rag.index_document("room-3", "doc-1", doc_hash="h2", pages=revised)
+    assert second["added"] == 1
+    assert second["updated"] == 0
+    assert second["unchanged"] == first["chunks"]
+    assert second["doc_hash"] == "h2"
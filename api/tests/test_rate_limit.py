@@ -0,0 +1,68 @@
+# backend/tests/test_rate_limit.py
+import pytest
+
+from rate_limit import RateLimiter, TokenBucket, check_all, parse_rate, worker_concurrency
+
+def test_parse_rate():
+    assert parse_rate("6/60") == (0.1, 6.0)
+    assert parse_rate("5") == (5.0, 5.0)
+    assert parse_rate(" 10/600 ") == (10 / 600, 10.0)
+
+@pytest.mark.parametrize("spec", [None, "", " ", "0", "0/60", "0.0/1"])
+def test_zero_or_empty_rate_disables_limit(spec):
+    assert parse_rate(spec) is None
+    limiter = RateLimiter("test", spec)
+    assert not limiter.enabled
+    assert limiter.check("key") == 0.0
+
+@pytest.mark.parametrize("spec", ["abc", "6/", "6/0", "-1/60", "6/-5", "6/60/2", "inf/60", "nan"])
+def test_malformed_rate_is_rejected(spec):
+    with pytest.raises(ValueError):
+        parse_rate(spec)
+    with pytest.raises(ValueError, match="test"):
+        RateLimiter("test", spec)
+
+def test_token_bucket_take_and_retry_after():
+    bucket = TokenBucket(rate=1 / 60, capacity=2)
+    # 확인만 하면 토큰이 줄지 않음
+    assert bucket.wait_time() == 0.0
+    assert bucket.take() == 0.0
+    assert bucket.take() == 0.0
+    retry_after = bucket.take()
+    assert 59.0 < retry_after <= 60.0
+    assert bucket.tokens < 1.0
+
+def test_rejected_room_does_not_charge_ip_bucket():
+    ip_limiter = RateLimiter("ip", "2/3600")
+    room_limiter = RateLimiter("room", "1/3600")
+
+    assert check_all([(ip_limiter, "1.2.3.4"), (room_limiter, "room-a")]) == (None, 0.0)
+    limiter, retry_after = check_all([(ip_limiter, "1.2.3.4"), (room_limiter, "room-a")])
+    assert limiter is room_limiter and retry_after > 0
+    # 채팅방 제한에 걸린 메시지는 IP 한도를 쓰지 않았으므로 다른 방에는 아직 보낼 수 있음
+    assert check_all([(ip_limiter, "1.2.3.4"), (room_limiter, "room-b")]) == (None, 0.0)
+    limiter, _ = check_all([(ip_limiter, "1.2.3.4"), (room_limiter, "room-c")])
+    assert limiter is ip_limiter
+
+def test_disabled_limiter_is_skipped():
+    off = RateLimiter("off", "0")
+    on = RateLimiter("on", "1/3600")
+    assert check_all([(off, "k"), (on, "k")]) == (None, 0.0)
+    assert check_all([(off, "k"), (on, "k")])[0] is on
+
+def test_worker_concurrency_divides_by_cluster_workers(monkeypatch):
+    monkeypatch.setenv("OLLAMA_CONCURRENCY", "4")
+    monkeypatch.delenv("CLUSTER_WORKERS", raising=False)
+    assert worker_concurrency() == 4
+    monkeypatch.setenv("CLUSTER_WORKERS", "2")
+    assert worker_concurrency() == 2
+    monkeypatch.setenv("CLUSTER_WORKERS", "8")
+    assert worker_concurrency() == 1
+
+def test_ip_limit_is_split_across_cluster_workers():
+    limiter = RateLimiter("ip", "20/60", shards=4)
+    rate, capacity = limiter.limit
+    assert capacity == 5.0
+    assert rate == pytest.approx(20 / 60 / 4)
+    # 버스트는 최소 1
+    assert RateLimiter("ip", "2/60", shards=4).limit[1] == 1.0
@@ -0,0 +1,64 @@
+# backend/tests/test_room_hub.py
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from room_hub import RoomHub
+
+class StalledSocket:
+    """보내기가 끝나지 않는 WebSocket 대역 (큐가 차는 느린 연결)"""
+
+    def __init__(self):
+        self.closed_with = None
+
+    async def send_text(self, frame):
+        await asyncio.Event().wait()
+
+    async def send_bytes(self, frame):
+        await asyncio.Event().wait()
+
+    async def close(self, code=None):
+        self.closed_with = code
+
+def test_room_lock_is_released_after_last_connection_leaves_mid_generation():
+    async def scenario():
+        hub = RoomHub()
+        subscriber = hub.subscribe("room", StalledSocket())
+        lock = hub.generation_lock("room")
+        await lock.acquire()
+        # 생성 중에 마지막 구독자가 빠져도 잠금은 연결이 돌려줄 때 정리됨
+        await hub.unsubscribe(subscriber)
+        assert hub.hub_stats()["room_locks"] == 1
+        lock.release()
+        hub.release_generation_lock("room")
+        assert hub.hub_stats()["room_locks"] == 0
+    asyncio.run(scenario())
+
+def test_room_lock_is_shared_until_every_connection_releases_it():
+    hub = RoomHub()
+    first = hub.generation_lock("room")
+    second = hub.generation_lock("room")
+    assert first is second
+    hub.release_generation_lock("room")
+    assert hub.generation_lock("room") is first
+    hub.release_generation_lock("room")
+    hub.release_generation_lock("room")
+    assert hub.hub_stats()["room_locks"] == 0
+
+def test_direct_send_overflow_drops_subscriber_with_1013():
+    async def scenario():
+        hub = RoomHub()
+        socket = StalledSocket()
+        subscriber = hub.subscribe("room", socket)
+        subscriber.queue = asyncio.Queue(maxsize=1)
+        for _ in range(3):
+            await subscriber.send({"type": "stream", "content": "x"})
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert subscriber.dropped
+        assert hub.stats["dropped_subscribers"] == 1
+        assert socket.closed_with == 1013
+        assert hub.hub_stats()["subscribers"] == 0
+    asyncio.run(scenario())
@@ -0,0 +1,42 @@
+# backend/tests/test_serialization.py
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import WebSocketDisconnect
+
+from serialization import InvalidFrame, dumps_json, receive_event
+
+class FrameSource:
+    """receive()로 미리 정한 ASGI 메시지를 돌려주는 WebSocket 대역"""
+
+    def __init__(self, message):
+        self.message = message
+
+    async def receive(self):
+        return self.message
+
+def receive(message):
+    return asyncio.run(receive_event(FrameSource(message)))
+
+def test_receive_event_decodes_json_object():
+    event = {"type": "message", "message": "안녕"}
+    assert receive({"type": "websocket.receive", "text": dumps_json(event)}) == event
+
+@pytest.mark.parametrize("text", ["not json", "[1, 2]", '"text"', "", None])
+def test_receive_event_rejects_malformed_or_non_object_json(text):
+    with pytest.raises(InvalidFrame):
+        receive({"type": "websocket.receive", "text": text})
+
+def test_receive_event_rejects_malformed_msgpack():
+    msgpack = pytest.importorskip("msgpack")
+    with pytest.raises(InvalidFrame):
+        receive({"type": "websocket.receive", "bytes": b"\xc1"})
+    with pytest.raises(InvalidFrame):
+        receive({"type": "websocket.receive", "bytes": msgpack.packb([1, 2])})
+
+def test_receive_event_raises_disconnect():
+    with pytest.raises(WebSocketDisconnect):
+        receive({"type": "websocket.disconnect", "code": 1001})
@@ -0,0 +1,34 @@
+# backend/tests/test_stream_buffer.py
+import pytest
+
+from stream_buffer import StreamBuffer, StreamRegistry, StreamTruncated
+
+def test_read_from_offset_and_truncation():
+    buffer = StreamBuffer("room", "ai_explanation", max_chars=5)
+    buffer.append("abc")
+    buffer.append("de")
+    assert buffer.read_from(1) == "bcde"
+    buffer.append("fgh")
+    assert buffer.read_from(5) == "fgh"
+    with pytest.raises(StreamTruncated):
+        buffer.read_from(0)
+
+def test_registry_evicts_finished_streams_before_active_ones():
+    registry = StreamRegistry(max_messages=2)
+    active = registry.begin("room-a", "ai_explanation")
+    finished = registry.begin("room-b", "ai_explanation")
+    finished.finish()
+
+    newest = registry.begin("room-c", "ai_explanation")
+    # 가장 오래된 스트림이라도 아직 생성 중이면 남김
+    assert registry.get("room-a", active.message_id) is active
+    assert registry.get("room-b", finished.message_id) is None
+    assert registry.get("room-c") is newest
+
+def test_registry_evicts_oldest_when_all_active():
+    registry = StreamRegistry(max_messages=1)
+    first = registry.begin("room-a", "ai_explanation")
+    second = registry.begin("room-b", "ai_explanation")
+    assert registry.get("room-a", first.message_id) is None
+    assert registry.get("room-a") is None
+    assert registry.get("room-b") is second
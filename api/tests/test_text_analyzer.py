@@ -0,0 +1,71 @@
+# backend/tests/test_text_analyzer.py
+# TextAnalyzer는 성능 변경이므로 기존(베이스라인) 점수 계산과 결과가 같아야 함
+import pytest
+
+from text_analyzer import ANALOGY_MARKERS, CONFUSION_MARKERS, TextAnalyzer
+
+def baseline_complexity_length(text: str) -> float:
+    sentences = text.split('.')
+    return sum(len(s.split()) for s in sentences) / max(len(sentences), 1)
+
+def baseline_analogies(text: str) -> list:
+    analogies = []
+    for marker in ANALOGY_MARKERS:
+        if marker in text:
+            for sent in text.split('.'):
+                if marker in sent:
+                    analogies.append(sent.strip())
+    return analogies
+
+def baseline_confusion(text: str) -> list:
+    return [m for m in CONFUSION_MARKERS if m in text]
+
+SAMPLES = [
+    "스택은 접시를 쌓는 것처럼 마지막에 넣은 것을 먼저 꺼냅니다. 예를 들어 함수 호출이 그렇습니다.",
+    "큐는 줄서기 같이 동작합니다! 먼저 온 사람이 먼저 나가요? 아마도 그런 것 같습니다.",
+    "여러 줄로\n쓴 설명입니다. 마치 은행 창구처럼요.\n끝.",
+    "문장 부호가 없는 설명",
+    "마침표로 끝나는 설명.",
+    "",
+]
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_matches_baseline_scores(text):
+    features = TextAnalyzer().analyze(text)
+    assert features.average_sentence_length == pytest.approx(baseline_complexity_length(text))
+    # 비유 문장은 표지어마다 중복되던 것만 제거 (순서는 문장 순서)
+    assert set(features.marker_sentences("analogy")) == set(baseline_analogies(text))
+    assert len(features.marker_sentences("analogy")) == len(set(baseline_analogies(text)))
+    assert features.marker_words("confusion") == baseline_confusion(text)
+
+def test_trailing_period_counts_empty_segment():
+    """'a b c.' → ['a b c', ''] 두 조각이므로 평균 1.5 (예전 기준 그대로)"""
+    assert TextAnalyzer().analyze("a b c.").average_sentence_length == 1.5
+
+def test_sentences_split_on_all_boundaries_for_embeddings():
+    features = TextAnalyzer().analyze("첫 문장! 둘째 문장?\n셋째 문장.")
+    assert features.sentences == ["첫 문장", "둘째 문장", "셋째 문장"]
+
+def test_overlapping_and_prefix_markers_found_in_one_pass():
+    # 접두사/겹치는 표지어도 기존 `marker in text` 방식과 같은 결과
+    marker_sets = {"analogy": ["같이", "같이하", "이하"], "confusion": ["모르", "모르겠"]}
+    analyzer = TextAnalyzer(marker_sets)
+    text = "함께 같이하면. 잘 모르겠다. 이하 생략"
+    features = analyzer.analyze(text)
+    assert features.marker_words("analogy") == ["같이", "같이하", "이하"]
+    assert features.marker_words("confusion") == ["모르", "모르겠"]
+    assert features.marker_sentences("analogy") == ["함께 같이하면", "이하 생략"]
+
+def test_matches_baseline_on_random_texts():
+    import random
+    rng = random.Random(0)
+    pieces = ANALOGY_MARKERS + CONFUSION_MARKERS + ["스택", "큐", ".", " ", "!", "\n", "..", "설명"]
+    analyzer = TextAnalyzer()
+    for _ in range(300):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 30)))
+        features = analyzer.analyze(text)
+        assert features.average_sentence_length == pytest.approx(baseline_complexity_length(text))
+        assert features.marker_sentences("analogy") == list(dict.fromkeys(
+            sent.strip() for sent in text.split('.') if any(marker in sent for marker in ANALOGY_MARKERS)
+        ))
+        assert features.marker_words("confusion") == baseline_confusion(text)
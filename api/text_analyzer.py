@@ -0,0 +1,124 @@
+# backend/text_analyzer.py
+# 설명 텍스트 분석 엔진: 표지어 사전을 미리 컴파일해 두고 텍스트 특징을 한 번만 계산해 공유
+# 표지어와 '.' 위치는 합친 정규식 하나로 한 번에 찾고, 비유 문장은 표지어 위치로 조각을 바로 찾음
+import re
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+# 문장 경계 문자 (임베딩 일관성/커버리지 점수의 문장 단위)
+# 복잡도/비유 문장은 기존 점수와 같도록 예전처럼 '.'로만 나눔 (TextFeatures.period_offsets)
+SENTENCE_BOUNDARY_RE = re.compile(r"[.!?。\n]")
+
+ANALOGY_MARKERS = ['처럼', '같이', '마치', '예를 들어', '비유하자면']
+CONFUSION_MARKERS = ['잘 모르겠', '확실하지 않', '아마도', '것 같습니다']
+
+# 약어([A-Z]{2,}), -tion, -ity 로 끝나는 단어
+TECHNICAL_TERM_RE = re.compile(r"\b(?:[A-Z]{2,}|\w+(?:tion|ity))\b")
+
+def compile_markers(markers: List[str]) -> re.Pattern:
+    """표지어 목록을 정규식 하나로 컴파일 (접두사가 겹치면 긴 표지어가 우선)
+
+    순수 파이썬 Aho-Corasick보다 C로 구현된 정규식 엔진의 단일 순회가 훨씬 빠름
+    """
+    ordered = sorted(markers, key=len, reverse=True)
+    return re.compile("|".join(re.escape(marker) for marker in ordered))
+
+def compile_scanner(markers: List[str]) -> re.Pattern:
+    """'.' 위치와 모든 범주의 표지어 시작 위치를 한 번의 순회로 찾는 정규식
+
+    표지어는 폭 0 전방 탐색으로 찾으므로 겹쳐 있는 표지어의 시작 위치도 빠지지 않음
+    """
+    return re.compile(r"\.|(?=" + compile_markers(markers).pattern + ")")
+
+class TextFeatures:
+    """한 번의 분석으로 얻은 설명 텍스트 특징"""
+
+    def __init__(self, text: str):
+        self.text = text
+        # '.' 위치 (text.split('.')의 조각 경계 - 복잡도/비유 문장은 이 기준)
+        self.period_offsets: List[int] = []
+        self.technical_terms: List[str] = []
+        # 범주 → 들어 있는 표지어 (표지어 사전 순서)
+        self.markers: Dict[str, List[str]] = {}
+        # 범주 → 표지어가 시작하는 위치
+        self.marker_offsets: Dict[str, List[int]] = {}
+        self._sentences: Optional[List[str]] = None
+
+    @property
+    def sentences(self) -> List[str]:
+        """문장 경계 문자로 나눈 빈 조각 없는 문장 (임베딩 점수에서만 쓰므로 처음 사용할 때 계산)"""
+        if self._sentences is None:
+            self._sentences = [
+                sentence.strip() for sentence in SENTENCE_BOUNDARY_RE.split(self.text)
+                if sentence and not sentence.isspace()
+            ]
+        return self._sentences
+
+    @property
+    def word_count(self) -> int:
+        return len(self.text.split())
+
+    def segment_at(self, offset: int) -> str:
+        """offset이 속한 '.' 단위 조각 (text.split('.')의 해당 조각과 같음)"""
+        index = bisect_right(self.period_offsets, offset)
+        start = self.period_offsets[index - 1] + 1 if index else 0
+        end = self.period_offsets[index] if index < len(self.period_offsets) else len(self.text)
+        return self.text[start:end]
+
+    def marker_sentences(self, category: str) -> List[str]:
+        """범주의 표지어가 들어 있는 '.' 단위 문장 (중복 없이 등장 순서대로, 표지어 위치로 조각을 바로 찾음)"""
+        return list(dict.fromkeys(self.segment_at(offset).strip() for offset in self.marker_offsets.get(category, [])))
+
+    def marker_words(self, category: str) -> List[str]:
+        return self.markers.get(category, [])
+
+    @property
+    def average_sentence_length(self) -> float:
+        """'.' 단위 조각당 평균 단어 수 (빈 조각도 분모에 포함 - 기존 복잡도 기준과 동일)
+
+        조각별 단어 수의 합 = '.'을 공백으로 바꾼 텍스트의 단어 수, 조각 수 = '.' 개수 + 1
+        """
+        return len(self.text.replace('.', ' ').split()) / (len(self.period_offsets) + 1)
+
+class TextAnalyzer:
+    """표지어 사전을 미리 컴파일해 두고 텍스트를 선형 시간에 분석"""
+
+    def __init__(self, marker_sets: Optional[Dict[str, List[str]]] = None):
+        marker_sets = marker_sets or {"analogy": ANALOGY_MARKERS, "confusion": CONFUSION_MARKERS}
+        self.marker_sets = marker_sets
+        # 모든 범주의 표지어를 합친 스캐너 하나 + 시작 위치에서 확인할 표지어 (첫 글자별)
+        self.scanner = compile_scanner([marker for markers in marker_sets.values() for marker in markers])
+        self.markers_by_first_char: Dict[str, List[Tuple[str, str]]] = {}
+        for category, markers in marker_sets.items():
+            for marker in markers:
+                self.markers_by_first_char.setdefault(marker[0], []).append((category, marker))
+
+    def analyze(self, text: str) -> TextFeatures:
+        features = TextFeatures(text)
+        found: Dict[str, set] = {category: set() for category in self.marker_sets}
+        offsets: Dict[str, List[int]] = {category: [] for category in self.marker_sets}
+
+        # 한 번의 순회로 '.' 위치와 표지어 시작 위치를 모음 (대부분의 위치는 C 정규식 엔진이 건너뜀)
+        for match in self.scanner.finditer(text):
+            position = match.start()
+            if match.end() > position:
+                features.period_offsets.append(position)
+                continue
+            # 같은 위치에서 시작하는 표지어는 모두 수집 (다른 표지어의 접두사인 표지어 포함)
+            for category, marker in self.markers_by_first_char.get(text[position], ()):
+                if text.startswith(marker, position):
+                    if not offsets[category] or offsets[category][-1] != position:
+                        offsets[category].append(position)
+                    found[category].add(marker)
+
+        # 표지어 목록은 기존과 같이 사전 순서
+        for category, markers in self.marker_sets.items():
+            features.markers[category] = [marker for marker in markers if marker in found[category]]
+            features.marker_offsets[category] = offsets[category]
+
+        # 전문 용어 (약어/-tion/-ity 패턴을 하나로 합친 정규식, 단어 경계 기준이라 별도 순회)
+        features.technical_terms = list(dict.fromkeys(TECHNICAL_TERM_RE.findall(text)))
+
+        return features
+
+text_analyzer = TextAnalyzer()
@@ -0,0 +1,275 @@
+# backend/tracing.py
+# 프로세스 내 트레이스: 턴/요청 하나를 단계별 구간(span)으로 나눠 기록하고 가장 느린 N개를 보관
+#
+# - 현재 트레이스/구간은 contextvars로 전달되므로 asyncio.to_thread로 넘긴 작업 안의 구간도 같은 트레이스에 붙음
+# - 트레이스가 없을 때 span()은 아무것도 하지 않음 (비용 거의 없음)
+# - GET /debug/traces 로 느린 트레이스의 단계별 폭포(waterfall)를 확인
+# - TRACING_OTEL=1 이고 opentelemetry가 설치되어 있으면 같은 구간을 OpenTelemetry span으로도 내보냄
+# - TRACE_PROFILE_MS를 지정하면 샘플링 프로파일러가 트레이스 스레드의 스택을 주기적으로 모아
+#   그 시간보다 오래 걸린 트레이스에만 붙임 (같은 이벤트 루프에서 동시에 돈 다른 턴의 스택이 섞일 수 있음)
+import contextvars
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+TRACE_SLOWEST = int(os.getenv("TRACE_SLOWEST", "50"))
+TRACE_PROFILE_MS = float(os.getenv("TRACE_PROFILE_MS", "0"))  # 0이면 프로파일러 끔
+TRACE_PROFILE_INTERVAL_MS = float(os.getenv("TRACE_PROFILE_INTERVAL_MS", "10"))
+TRACING_OTEL = os.getenv("TRACING_OTEL", "0").lower() in ("1", "true", "yes") and otel_trace is not None
+
+current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    __slots__ = ("name", "start", "end", "parent", "depth", "attributes")
+
+    def __init__(self, name: str, start: float, parent: Optional["Span"], attributes: Dict):
+        self.name = name
+        self.start = start
+        self.end: Optional[float] = None
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.attributes = attributes
+
+class Trace:
+    _ids = itertools.count(1)
+
+    def __init__(self, name: str, attributes: Dict):
+        self.id = next(self._ids)
+        self.name = name
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.thread_id = threading.get_ident()
+        self.spans: List[Span] = []
+        self.samples: Dict[str, int] = {}
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def waterfall(self) -> Dict:
+        """단계별 시작 시점/길이 (ms)"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "attributes": self.attributes,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 1),
+            "spans": [
+                {
+                    "name": span.name,
+                    "depth": span.depth,
+                    "offset_ms": round((span.start - self.start) * 1000, 1),
+                    "duration_ms": round(((span.end or self.end or span.start) - span.start) * 1000, 1),
+                    "attributes": span.attributes,
+                }
+                for span in sorted(self.spans, key=lambda span: span.start)
+            ],
+            "profile": sorted(
+                ({"stack": stack, "samples": count} for stack, count in self.samples.items()),
+                key=lambda entry: -entry["samples"]
+            )[:20],
+        }
+
+    def render_text(self, width: int = 50) -> str:
+        """터미널용 폭포 그림"""
+        data = self.waterfall()
+        total = max(data["duration_ms"], 0.001)
+        lines = [f"#{data['id']} {data['name']} {data['duration_ms']}ms {data['attributes']}"]
+        for span in data["spans"]:
+            start = int(span["offset_ms"] / total * width)
+            length = max(1, int(span["duration_ms"] / total * width))
+            bar = " " * start + "█" * min(length, width - start)
+            lines.append(f"  {'  ' * span['depth']}{span['name']:<{28 - 2 * span['depth']}} |{bar:<{width}}| {span['duration_ms']}ms")
+        return "\n".join(lines)
+
+class SlowTraceBuffer:
+    """가장 느린 N개 트레이스 (최소 힙)"""
+
+    def __init__(self, capacity: int = TRACE_SLOWEST):
+        self.capacity = capacity
+        self._heap: List = []
+        self._lock = threading.Lock()
+        self.finished = 0
+
+    def offer(self, trace: Trace):
+        entry = (trace.duration, trace.id, trace)
+        with self._lock:
+            self.finished += 1
+            if len(self._heap) < self.capacity:
+                heapq.heappush(self._heap, entry)
+            elif entry > self._heap[0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def slowest(self, limit: Optional[int] = None, name: Optional[str] = None) -> List[Trace]:
+        with self._lock:
+            traces = [trace for _, _, trace in sorted(self._heap, reverse=True)]
+        if name:
+            traces = [trace for trace in traces if trace.name.startswith(name)]
+        return traces[:limit] if limit else traces
+
+class StackSampler:
+    """활성 트레이스의 스레드 스택을 주기적으로 수집하는 샘플링 프로파일러 (백그라운드 스레드 하나)"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._active: Dict[int, Trace] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, trace: Trace):
+        with self._lock:
+            self._active[trace.id] = trace
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-sampler", daemon=True)
+                self._thread.start()
+
+    def remove(self, trace: Trace):
+        with self._lock:
+            self._active.pop(trace.id, None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active.values())
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for trace in active:
+                frame = frames.get(trace.thread_id)
+                if frame is None:
+                    continue
+                stack = ";".join(
+                    f"{entry.name} ({os.path.basename(entry.filename)}:{entry.lineno})"
+                    for entry in traceback.extract_stack(frame, limit=30)
+                )
+                trace.samples[stack] = trace.samples.get(stack, 0) + 1
+
+class Tracer:
+    def __init__(self):
+        self.buffer = SlowTraceBuffer()
+        self.sampler = StackSampler(TRACE_PROFILE_INTERVAL_MS / 1000) if TRACE_PROFILE_MS > 0 else None
+        self._otel = otel_trace.get_tracer("feynman") if TRACING_OTEL else None
+
+    def start(self, name: str, **attributes) -> Trace:
+        """트레이스 시작 (현재 컨텍스트에 설정, finish로 종료)"""
+        trace = Trace(name, attributes)
+        current_trace.set(trace)
+        current_span.set(None)
+        if self.sampler is not None:
+            self.sampler.add(trace)
+        return trace
+
+    def finish(self, trace: Optional[Trace]):
+        if trace is None or trace.end is not None:
+            return
+        trace.end = time.perf_counter()
+        if current_trace.get() is trace:
+            current_trace.set(None)
+            current_span.set(None)
+        if self.sampler is not None:
+            self.sampler.remove(trace)
+            if trace.duration * 1000 < TRACE_PROFILE_MS:
+                trace.samples.clear()
+        if self._otel is not None:
+            self._export_otel(trace)
+        self.buffer.offer(trace)
+
+    @contextmanager
+    def trace(self, name: str, **attributes):
+        """블록 하나를 트레이스로 기록 (REST 요청 등)"""
+        token = current_trace.set(None)
+        trace = self.start(name, **attributes)
+        try:
+            yield trace
+        finally:
+            self.finish(trace)
+            current_trace.reset(token)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """현재 트레이스 안의 구간 (트레이스가 없으면 아무것도 안 함)"""
+        trace = current_trace.get()
+        if trace is None:
+            yield None
+            return
+        span = Span(name, time.perf_counter(), current_span.get(), attributes)
+        trace.spans.append(span)
+        token = current_span.set(span)
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            current_span.reset(token)
+
+    def record_span(self, name: str, start: float, end: float, **attributes):
+        """이미 끝난 구간을 현재 트레이스에 추가 (start/end는 perf_counter 값)"""
+        trace = current_trace.get()
+        if trace is None:
+            return
+        span = Span(name, start, current_span.get(), attributes)
+        span.end = end
+        trace.spans.append(span)
+
+    def _export_otel(self, trace: Trace):
+        """끝난 트레이스를 OpenTelemetry span으로 내보냄 (시각은 트레이스 시작 시각 기준으로 환산)"""
+        def to_ns(perf: float) -> int:
+            return int((trace.started_at + (perf - trace.start)) * 1e9)
+
+        root = self._otel.start_span(trace.name, start_time=to_ns(trace.start), attributes={
+            key: str(value) for key, value in trace.attributes.items()
+        })
+        otel_spans = {}
+        for span in sorted(trace.spans, key=lambda span: span.start):
+            parent = otel_spans.get(id(span.parent), root)
+            otel_span = self._otel.start_span(
+                span.name,
+                context=otel_trace.set_span_in_context(parent),
+                start_time=to_ns(span.start),
+                attributes={key: str(value) for key, value in span.attributes.items()}
+            )
+            otel_spans[id(span)] = otel_span
+        for span in trace.spans:
+            otel_spans[id(span)].end(end_time=to_ns(span.end or trace.end))
+        root.end(end_time=to_ns(trace.end))
+
+    def stats(self) -> Dict:
+        return {
+            "finished": self.buffer.finished,
+            "kept": len(self.buffer.slowest()),
+            "capacity": self.buffer.capacity,
+            "profile_threshold_ms": TRACE_PROFILE_MS or None,
+            "otel": self._otel is not None,
+        }
+
+tracer = Tracer()
+span = tracer.span
+
+def instrument_sessions(session_factory):
+    """세션 커밋을 현재 트레이스의 db.commit 구간으로 기록"""
+    from sqlalchemy import event
+
+    def before_commit(session):
+        session.info["trace_commit_started"] = time.perf_counter()
+
+    def after_commit(session):
+        started = session.info.pop("trace_commit_started", None)
+        if started is not None:
+            tracer.record_span("db.commit", started, time.perf_counter())
+
+    event.listen(session_factory, "before_commit", before_commit)
+    event.listen(session_factory, "after_commit", after_commit)
@@ -1,5 +1,6 @@
 // lib/services/api_service.dart
 import 'dart:convert';
+import 'dart:math';
 import 'package:http/http.dart' as http;
 import '../config/app_config.dart';
 import '../models/chat_models.dart';
@@ -8,17 +9,52 @@ import '../models/learning_models.dart';
 class ApiService {
   static final String baseUrl = AppConfig.baseUrl;
   
-  // 채팅방 목록 조회
+  // 증분 동기화 캐시 (ETag + 마지막으로 받은 목록)
+  static String? _roomsEtag;
+  static List<ChatRoom>? _roomsCache;
+  static final Map<String, String> _messagesEtag = {};
+  static final Map<String, List<Message>> _messagesCache = {};
+
+  // 채팅방 목록 조회 (캐시가 있으면 마지막 수정 시각 이후 바뀐 방만 받아 합침)
   static Future<List<ChatRoom>> getChatRooms() async {
     try {
+      final cached = _roomsCache;
+      String url = '$baseUrl/api/rooms';
+      if (cached != null && cached.isNotEmpty) {
+        final since = cached.map((room) => room.updatedAt).reduce((a, b) => a.isAfter(b) ? a : b);
+        url += '?updated_since=${Uri.encodeQueryComponent(since.toIso8601String())}';
+      }
       final response = await http.get(
-        Uri.parse('$baseUrl/api/rooms'),
-        headers: {'Content-Type': 'application/json'},
+        Uri.parse(url),
+        headers: {
+          'Content-Type': 'application/json',
+          if (cached != null && _roomsEtag != null) 'If-None-Match': _roomsEtag!,
+        },
       ).timeout(Duration(seconds: 10));
       
+      if (response.statusCode == 304 && cached != null) {
+        return List.of(cached);
+      }
       if (response.statusCode == 200) {
         List<dynamic> data = json.decode(response.body);
-        return data.map((json) => ChatRoom.fromJson(json)).toList();
+        final received = data.map((json) => ChatRoom.fromJson(json)).toList();
+        List<ChatRoom> rooms = received;
+        if (cached != null && cached.isNotEmpty) {
+          final merged = {for (final room in cached) room.id: room};
+          for (final room in received) {
+            merged[room.id] = room;
+          }
+          rooms = merged.values.toList()..sort((a, b) => b.updatedAt.compareTo(a.updatedAt));
+          // 다른 기기에서 삭제된 방이 있으면 개수가 달라지므로 전체를 다시 받음
+          final total = int.tryParse(response.headers['x-total-count'] ?? '');
+          if (total != null && total != rooms.length) {
+            _clearRoomsCache();
+            return getChatRooms();
+          }
+        }
+        _roomsCache = rooms;
+        _roomsEtag = response.headers['etag'];
+        return List.of(rooms);
       } else {
         throw Exception('Failed to load chat rooms: ${response.statusCode}');
       }
@@ -27,6 +63,16 @@ class ApiService {
       throw e;
     }
   }
+
+  static void _clearRoomsCache() {
+    _roomsCache = null;
+    _roomsEtag = null;
+  }
+
+  static void _clearMessagesCache(String roomId) {
+    _messagesCache.remove(roomId);
+    _messagesEtag.remove(roomId);
+  }
   
   // 채팅방 생성
   static Future<ChatRoom> createChatRoom(String title) async {
@@ -48,17 +94,40 @@ class ApiService {
     }
   }
   
-  // 메시지 조회
+  // 메시지 조회 (캐시가 있으면 마지막 메시지 다음 것만 받아 이어 붙임)
   static Future<List<Message>> getMessages(String roomId) async {
     try {
+      final cached = _messagesCache[roomId];
+      String url = '$baseUrl/api/rooms/$roomId/messages';
+      if (cached != null && cached.isNotEmpty) {
+        url += '?after_id=${Uri.encodeQueryComponent(cached.last.id)}';
+      }
       final response = await http.get(
-        Uri.parse('$baseUrl/api/rooms/$roomId/messages'),
-        headers: {'Content-Type': 'application/json'},
+        Uri.parse(url),
+        headers: {
+          'Content-Type': 'application/json',
+          if (cached != null && _messagesEtag[roomId] != null) 'If-None-Match': _messagesEtag[roomId]!,
+        },
       ).timeout(Duration(seconds: 10));
       
+      if (response.statusCode == 304 && cached != null) {
+        return List.of(cached);
+      }
+      if (response.statusCode == 404 && cached != null) {
+        // 기준 메시지가 사라졌으면 전체를 다시 받음
+        _clearMessagesCache(roomId);
+        return getMessages(roomId);
+      }
       if (response.statusCode == 200) {
         List<dynamic> data = json.decode(response.body);
-        return data.map((json) => Message.fromJson(json)).toList();
+        final received = data.map((json) => Message.fromJson(json)).toList();
+        final messages = cached != null && cached.isNotEmpty ? [...cached, ...received] : received;
+        _messagesCache[roomId] = messages;
+        final etag = response.headers['etag'];
+        if (etag != null) {
+          _messagesEtag[roomId] = etag;
+        }
+        return List.of(messages);
       } else {
         throw Exception('Failed to load messages: ${response.statusCode}');
       }
@@ -76,6 +145,7 @@ class ApiService {
         headers: {'Content-Type': 'application/json'},
       ).timeout(Duration(seconds: 10));
       
+      _clearMessagesCache(roomId);
       return response.statusCode == 200;
     } catch (e) {
       print('API Error (deleteChatRoom): $e');
@@ -94,6 +164,7 @@ class ApiService {
         }),
       ).timeout(Duration(seconds: 10));
       
+      roomIds.forEach(_clearMessagesCache);
       return response.statusCode == 200;
     } catch (e) {
       print('API Error (deleteMultipleChatRooms): $e');
@@ -147,23 +218,73 @@ class ApiService {
 
 
   // 메시지 저장 API (AI 응답 없이)
+  // 설명/성찰 화면은 제출마다 메시지 하나만 저장한 뒤 단계를 전환하므로 한 건짜리 일괄 저장으로 보냄
+  // (여러 메시지를 한 번에 저장할 때는 saveMessagesBulk를 직접 호출)
   static Future<void> saveMessage(String roomId, String content, String phase) async {
     try {
-      await http.post(
-        Uri.parse('$baseUrl/api/rooms/$roomId/messages'),
-        headers: {'Content-Type': 'application/json'},
-        body: json.encode({
+      await saveMessagesBulk([
+        {
+          'room_id': roomId,
           'content': content,
           'role': 'user',
           'phase': phase,
-        }),
-      ).timeout(Duration(seconds: 10));
+        },
+      ]);
     } catch (e) {
       print('API Error (saveMessage): $e');
       throw e;
     }
   }
 
+  // 재시도 중복 방지용 메시지 키
+  static String newClientMessageId() {
+    final random = Random.secure();
+    return List.generate(16, (_) => random.nextInt(256).toRadixString(16).padLeft(2, '0')).join();
+  }
+
+  // 여러 메시지를 한 번에 저장 (여러 채팅방 가능, 요청 순서대로 저장된 id 목록 반환)
+  // 각 메시지에 client_msg_id를 붙여 두므로 네트워크 오류로 다시 보내도 중복 저장되지 않음
+  static Future<List<String>> saveMessagesBulk(
+    List<Map<String, dynamic>> messages, {
+    int retries = 2,
+  }) async {
+    final payload = messages
+        .map((message) => {
+              ...message,
+              'client_msg_id': message['client_msg_id'] ?? newClientMessageId(),
+            })
+        .toList();
+
+    for (var attempt = 0; ; attempt++) {
+      http.Response? response;
+      try {
+        response = await http.post(
+          Uri.parse('$baseUrl/api/messages/bulk'),
+          headers: {'Content-Type': 'application/json'},
+          body: json.encode({'messages': payload}),
+        ).timeout(Duration(seconds: 10));
+      } catch (e) {
+        // 네트워크 오류/시간 초과: 같은 키로 다시 보냄
+        if (attempt >= retries) {
+          print('API Error (saveMessagesBulk): $e');
+          rethrow;
+        }
+      }
+
+      if (response != null) {
+        if (response.statusCode == 200) {
+          final data = json.decode(response.body);
+          return (data['messages'] as List).map((result) => result['id'] as String).toList();
+        }
+        // 4xx는 다시 보내도 같은 결과
+        if (response.statusCode < 500 || attempt >= retries) {
+          throw Exception('Failed to save messages: ${response.statusCode}');
+        }
+      }
+      await Future.delayed(Duration(milliseconds: 500 * (attempt + 1)));
+    }
+  }
+
   // PDF 업로드
   static Future<bool> uploadPdf(String roomId, String filePath) async {
     try {
@@ -1,4 +1,5 @@
 // lib/services/websocket_service.dart
+import 'dart:async';
 import 'dart:convert';
 import 'package:web_socket_channel/web_socket_channel.dart';
 import '../config/app_config.dart';
@@ -8,6 +9,15 @@ class WebSocketService {
   String? _currentRoomId;
   bool _isConnected = false;
   
+  // 받는 중인 AI 응답 (연결이 끊기면 이 id와 받은 글자 수로 이어받기)
+  String? _streamMessageId;
+  int _streamReceived = 0;
+  
+  // 응답을 받는 중에 끊기면 자동 재연결 (1, 2, 4, 8, 16초 간격으로 최대 5번)
+  static const int _maxReconnectAttempts = 5;
+  Timer? _reconnectTimer;
+  int _reconnectAttempts = 0;
+  
   // 연결 상태 확인
   bool get isConnected => _isConnected;
   String? get currentRoomId => _currentRoomId;
@@ -26,26 +36,31 @@ class WebSocketService {
       final wsUrl = '${AppConfig.wsUrl}/ws/chat/$roomId';
       print('WebSocket URL: $wsUrl');
       
-      _channel = WebSocketChannel.connect(Uri.parse(wsUrl));
+      final channel = WebSocketChannel.connect(Uri.parse(wsUrl));
+      _channel = channel;
       _isConnected = true;
       
-      _channel!.stream.listen(
+      channel.stream.listen(
         (data) {
+          // 프레임을 받았으면 연결 성공으로 보고 재시도 횟수 초기화
+          _reconnectAttempts = 0;
           try {
-            final decoded = json.decode(data);
-            onMessage(decoded);
+            final decoded = _trackStream(json.decode(data));
+            if (decoded != null) {
+              onMessage(decoded);
+            }
           } catch (e) {
             print('❌ Error decoding message: $e');
           }
         },
         onError: (error) {
           print('❌ WebSocket Error: $error');
-          _isConnected = false;
           onMessage({'type': 'error', 'content': 'Connection error: $error'});
+          _handleDisconnect(channel, roomId, onMessage);
         },
         onDone: () {
           print('🔌 WebSocket connection closed for room: $roomId');
-          _isConnected = false;
+          _handleDisconnect(channel, roomId, onMessage);
         },
         cancelOnError: false,
       );
@@ -58,6 +73,83 @@ class WebSocketService {
     }
   }
   
+  // 연결이 끊김 (받던 응답이 있으면 백오프 후 재연결해 이어받음)
+  void _handleDisconnect(WebSocketChannel channel, String roomId, Function(Map<String, dynamic>) onMessage) {
+    // dispose()/재연결로 이미 교체된 이전 연결 (onError 뒤의 onDone 포함)
+    if (!identical(channel, _channel)) {
+      return;
+    }
+    _isConnected = false;
+    if (_streamMessageId == null) {
+      return;
+    }
+    if (_reconnectAttempts >= _maxReconnectAttempts) {
+      print('❌ Reconnect gave up after $_reconnectAttempts attempts');
+      onMessage({'type': 'error', 'content': 'Connection lost while receiving a response'});
+      return;
+    }
+    final delay = Duration(seconds: 1 << _reconnectAttempts);
+    _reconnectAttempts++;
+    print('🔁 Reconnecting in ${delay.inSeconds}s (attempt $_reconnectAttempts)');
+    reconnect(roomId, onMessage, delay: delay);
+  }
+  
+  // stream 프레임을 offset 기준으로 정리 (재접속 후 중복/순서 뒤바뀐 프레임 처리)
+  // offset 단위는 서버와 같은 유니코드 코드 포인트(runes)
+  Map<String, dynamic>? _trackStream(Map<String, dynamic> data) {
+    final messageId = data['message_id'];
+    if (messageId == null) {
+      return data;
+    }
+    
+    if (data['type'] == 'stream') {
+      if (messageId != _streamMessageId) {
+        _streamMessageId = messageId;
+        _streamReceived = 0;
+      }
+      final int offset = data['offset'] ?? _streamReceived;
+      final content = (data['content'] ?? '') as String;
+      final runes = content.runes.toList();
+      
+      // 앞부분이 빠진 프레임은 버림 (이어받기 응답에 포함되어 옴)
+      if (offset > _streamReceived) {
+        return null;
+      }
+      // 이미 받은 부분은 잘라냄
+      final skip = _streamReceived - offset;
+      if (skip >= runes.length) {
+        return null;
+      }
+      _streamReceived = offset + runes.length;
+      return {
+        ...data,
+        'content': skip > 0 ? String.fromCharCodes(runes.sublist(skip)) : content,
+      };
+    }
+    
+    if (data['type'] == 'complete' || data['type'] == 'resume_failed' || data['type'] == 'error') {
+      if (messageId == _streamMessageId) {
+        _streamMessageId = null;
+        _streamReceived = 0;
+      }
+    }
+    return data;
+  }
+  
+  // 끊긴 AI 응답 이어받기 요청
+  void _resumeStream(String messageId, int offset) {
+    if (_channel != null && _isConnected) {
+      _streamMessageId = messageId;
+      _streamReceived = offset;
+      _channel!.sink.add(json.encode({
+        'type': 'resume',
+        'message_id': messageId,
+        'offset': offset,
+      }));
+      print('🔁 Resume requested: $messageId @ $offset');
+    }
+  }
+  
   // 메시지 전송
   void sendMessage(String message) {
     if (_channel != null && _isConnected) {
@@ -75,20 +167,37 @@ class WebSocketService {
   
   // 연결 종료
   void dispose() {
+    _reconnectTimer?.cancel();
+    _reconnectTimer = null;
+    _reconnectAttempts = 0;
     if (_channel != null) {
       _channel!.sink.close();
       _channel = null;
     }
     _currentRoomId = null;
     _isConnected = false;
+    _streamMessageId = null;
+    _streamReceived = 0;
     print('🔌 WebSocket disposed');
   }
   
-  // 재연결
-  void reconnect(String roomId, Function(Map<String, dynamic>) onMessage) {
+  // 재연결 (받던 응답이 있으면 이어서 받음)
+  void reconnect(
+    String roomId,
+    Function(Map<String, dynamic>) onMessage, {
+    Duration delay = const Duration(seconds: 1),
+  }) {
+    final messageId = _streamMessageId;
+    final received = _streamReceived;
+    final attempts = _reconnectAttempts;
     dispose();
-    Future.delayed(Duration(seconds: 1), () {
+    _reconnectAttempts = attempts;
+    _reconnectTimer = Timer(delay, () {
+      _reconnectTimer = null;
       connectToRoom(roomId, onMessage);
+      if (messageId != null) {
+        _resumeStream(messageId, received);
+      }
     });
   }
 }
\ No newline at end of file